@@ -0,0 +1,566 @@
+# =============================================================================
+# CareConnect v5.0 - AI Inference Benchmarks
+# =============================================================================
+
+import torch
+import torch.nn.functional as F
+import json
+import os
+import io
+import gc
+import time
+import logging
+import argparse
+import multiprocessing
+from typing import List, Dict, Any, Optional
+import psutil
+
+from model import CareConnectTransformer, ModelConfig
+from sampling import build_logits_processors, sample_next_tokens
+from resources import available_cpus, configure_worker_resources
+
+# =============================================================================
+# Helpers
+# =============================================================================
+
+def build_benchmark_config(args: argparse.Namespace) -> ModelConfig:
+    """Build a model configuration from command line overrides."""
+    config = ModelConfig()
+    config.num_layers = args.layers
+    config.hidden_size = args.hidden_size
+    config.num_attention_heads = args.heads
+    config.intermediate_size = args.hidden_size * 4
+    config.dropout = 0.0
+    return config
+
+def random_prompt(config: ModelConfig, length: int, batch_size: int = 1) -> torch.Tensor:
+    """Create a random prompt of token IDs avoiding special tokens."""
+    return torch.randint(4, config.vocab_size, (batch_size, length), dtype=torch.long)
+
+def print_results(title: str, rows: List[Dict[str, Any]]):
+    """Print benchmark rows as an aligned table."""
+    print(f"\n{title}")
+    print("-" * 60)
+    if not rows:
+        print("No results")
+        return
+    
+    columns = list(rows[0].keys())
+    widths = [max(len(col), *(len(f"{row[col]:.3f}" if isinstance(row[col], float) else str(row[col])) for row in rows))
+              for col in columns]
+    print("  ".join(col.rjust(width) for col, width in zip(columns, widths)))
+    for row in rows:
+        cells = [f"{row[col]:.3f}" if isinstance(row[col], float) else str(row[col]) for col in columns]
+        print("  ".join(cell.rjust(width) for cell, width in zip(cells, widths)))
+
+def process_rss_mb() -> float:
+    """Resident set size of this process in MB."""
+    gc.collect()
+    return psutil.Process(os.getpid()).memory_info().rss / (1024 * 1024)
+
+def state_dict_size_mb(model: torch.nn.Module) -> float:
+    """Serialized size of a model's weights in MB."""
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell() / (1024 * 1024)
+
+def perplexity(model: CareConnectTransformer, input_ids: torch.Tensor) -> float:
+    """Next-token perplexity of a batch of sequences."""
+    with torch.no_grad():
+        logits = model(input_ids)
+    loss = F.cross_entropy(logits[:, :-1].reshape(-1, logits.size(-1)), input_ids[:, 1:].reshape(-1))
+    return float(torch.exp(loss))
+
+# =============================================================================
+# Benchmarks
+# =============================================================================
+
+def benchmark_kv_cache(model: CareConnectTransformer, lengths: List[int] = (50, 200, 1000),
+                       prompt_length: int = 16, repeats: int = 1) -> List[Dict[str, Any]]:
+    """Compare tokens/sec of cached incremental decoding against full recompute."""
+    model.eval()
+    prompt = random_prompt(model.config, prompt_length).to(model.device)
+    results = []
+    
+    for length in lengths:
+        row = {'new_tokens': length}
+        for mode, use_cache in (('recompute', False), ('kv_cache', True)):
+            timings = []
+            for _ in range(repeats):
+                torch.manual_seed(0)
+                start_time = time.perf_counter()
+                output_ids = model.generate_ids(prompt, max_new_tokens=length, use_cache=use_cache, stop_at_eos=False)
+                timings.append(time.perf_counter() - start_time)
+            
+            generated = output_ids.size(1) - prompt.size(1)
+            row[f'{mode}_tok_per_s'] = generated / min(timings)
+        
+        row['speedup'] = row['kv_cache_tok_per_s'] / row['recompute_tok_per_s']
+        results.append(row)
+        logging.info(f"KV cache benchmark: {row}")
+    
+    return results
+
+def benchmark_batch_generation(model: CareConnectTransformer, batch_sizes: List[int] = (1, 4, 8, 16),
+                               new_tokens: int = 32, prompt_length: int = 16,
+                               repeats: int = 1) -> List[Dict[str, Any]]:
+    """Compare batched multi-prompt generation against one call per prompt."""
+    model.eval()
+    results = []
+    
+    for batch_size in batch_sizes:
+        prompts = random_prompt(model.config, prompt_length, batch_size).tolist()
+        row = {'batch_size': batch_size}
+        
+        timings = []
+        for _ in range(repeats):
+            torch.manual_seed(0)
+            start_time = time.perf_counter()
+            for prompt in prompts:
+                prompt_ids = torch.tensor([prompt], dtype=torch.long, device=model.device)
+                model.generate_ids(prompt_ids, max_new_tokens=new_tokens, stop_at_eos=False)
+            timings.append(time.perf_counter() - start_time)
+        row['sequential_tok_per_s'] = batch_size * new_tokens / min(timings)
+        
+        timings = []
+        for _ in range(repeats):
+            torch.manual_seed(0)
+            start_time = time.perf_counter()
+            model.generate_ids_batch(prompts, [new_tokens] * batch_size,
+                                     [model.config.temperature] * batch_size,
+                                     [model.config.top_k] * batch_size, stop_at_eos=False)
+            timings.append(time.perf_counter() - start_time)
+        row['batched_tok_per_s'] = batch_size * new_tokens / min(timings)
+        
+        row['speedup'] = row['batched_tok_per_s'] / row['sequential_tok_per_s']
+        results.append(row)
+        logging.info(f"Batch generation benchmark: {row}")
+    
+    return results
+
+def benchmark_quantization(config: ModelConfig, prompt_length: int = 128, new_tokens: int = 64,
+                           eval_sequences: int = 8, repeats: int = 1) -> List[Dict[str, Any]]:
+    """Compare fp32 and dynamic int8 inference on CPU.
+    
+    Both variants share the same weights; perplexity is measured on the same
+    sequences so the int8 row shows the drift introduced by quantization.
+    """
+    torch.manual_seed(0)
+    prompt = random_prompt(config, prompt_length)
+    eval_ids = random_prompt(config, prompt_length, eval_sequences)
+    baseline_rss = process_rss_mb()
+    
+    fp32_model = CareConnectTransformer(config)
+    fp32_model.device = torch.device('cpu')
+    fp32_model.eval()
+    weights = fp32_model.state_dict()
+    
+    results = []
+    for mode in ('fp32', 'int8'):
+        if mode == 'int8':
+            model = CareConnectTransformer(config)
+            model.load_state_dict(weights)
+            model.quantize('int8')
+            del fp32_model, weights
+        else:
+            model = fp32_model
+        rss = process_rss_mb() - baseline_rss
+        
+        latencies = []
+        throughputs = []
+        for _ in range(repeats):
+            with torch.no_grad():
+                start_time = time.perf_counter()
+                model(prompt)
+                latencies.append(time.perf_counter() - start_time)
+            
+            torch.manual_seed(0)
+            start_time = time.perf_counter()
+            output_ids = model.generate_ids(prompt, max_new_tokens=new_tokens, stop_at_eos=False)
+            throughputs.append((output_ids.size(1) - prompt.size(1)) / (time.perf_counter() - start_time))
+        
+        row = {
+            'mode': mode,
+            'prefill_ms': min(latencies) * 1000,
+            'tok_per_s': max(throughputs),
+            'weights_mb': state_dict_size_mb(model),
+            'rss_mb': rss,
+            'perplexity': perplexity(model, eval_ids)
+        }
+        results.append(row)
+        logging.info(f"Quantization benchmark: {row}")
+    
+    fp32_row, int8_row = results
+    int8_row['ppl_drift_pct'] = (int8_row['perplexity'] / fp32_row['perplexity'] - 1.0) * 100
+    fp32_row['ppl_drift_pct'] = 0.0
+    return results
+
+def benchmark_speculative(model: CareConnectTransformer, draft_layers: List[int], draft_hidden_sizes: List[int],
+                          num_draft_tokens: List[int], new_tokens: int = 128, prompt_length: int = 16,
+                          repeats: int = 1, draft_path: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Compare speculative decoding at several draft sizes against plain cached decoding.
+    
+    Random weights give a low acceptance rate; pass trained checkpoints for
+    representative numbers.
+    """
+    model.eval()
+    prompt = random_prompt(model.config, prompt_length).to(model.device)
+    
+    def best_time(**kwargs) -> float:
+        timings = []
+        for _ in range(repeats):
+            torch.manual_seed(0)
+            start_time = time.perf_counter()
+            output_ids = model.generate_ids(prompt, max_new_tokens=new_tokens, stop_at_eos=False, **kwargs)
+            timings.append(time.perf_counter() - start_time)
+        return (output_ids.size(1) - prompt.size(1)) / min(timings)
+    
+    baseline = best_time()
+    results = [{'draft': 'none', 'k': 0, 'tok_per_s': baseline, 'speedup': 1.0, 'acceptance_rate': 0.0}]
+    logging.info(f"Speculative benchmark baseline: {baseline:.1f} tok/s")
+    
+    for layers in draft_layers:
+        for hidden_size in draft_hidden_sizes:
+            torch.manual_seed(0)
+            draft = CareConnectTransformer(model.config.draft_config(layers, hidden_size)).to(model.device)
+            draft.device = model.device
+            if draft_path:
+                draft.load_model(draft_path)
+            draft.eval()
+            
+            for k in num_draft_tokens:
+                model.speculative_stats.update({'rounds': 0, 'proposed': 0, 'accepted': 0})
+                tok_per_s = best_time(draft_model=draft, num_draft_tokens=k)
+                stats = model.get_speculative_stats()
+                row = {
+                    'draft': f"{layers}x{hidden_size}",
+                    'k': k,
+                    'tok_per_s': tok_per_s,
+                    'speedup': tok_per_s / baseline,
+                    'acceptance_rate': stats['acceptance_rate']
+                }
+                results.append(row)
+                logging.info(f"Speculative benchmark: {row}")
+    
+    return results
+
+def benchmark_sampling(model: CareConnectTransformer, batch_sizes: List[int], history_length: int = 256,
+                       num_beams: int = 4, new_tokens: int = 32, repeats: int = 3) -> List[Dict[str, Any]]:
+    """Per-step logits-processor cost relative to one cached decode step.
+    
+    Each processor pipeline runs on the logits of a real decode step after
+    its state has seen history_length tokens. A final row compares beam
+    search throughput with sampling.
+    """
+    model.eval()
+    config = model.config
+    pipelines = {
+        'top-k': dict(top_k=config.top_k),
+        'top-k+top-p': dict(top_k=config.top_k, top_p=config.top_p),
+        'repetition': dict(repetition_penalty=1.1),
+        'no-repeat-3gram': dict(no_repeat_ngram_size=3),
+        'all': dict(top_k=config.top_k, top_p=config.top_p, repetition_penalty=1.1, no_repeat_ngram_size=3)
+    }
+    
+    results = []
+    for batch_size in batch_sizes:
+        history = random_prompt(config, history_length, batch_size).to(model.device)
+        with torch.no_grad():
+            logits, past_key_values = model.decode_step(history)
+            next_tokens = sample_next_tokens(logits.clone())
+            
+            timings = []
+            for _ in range(repeats):
+                start_time = time.perf_counter()
+                model.decode_step(next_tokens, past_key_values)
+                timings.append(time.perf_counter() - start_time)
+            step_ms = min(timings) * 1000
+            
+            for name, options in pipelines.items():
+                processors = build_logits_processors(
+                    torch.full((batch_size,), config.temperature, device=model.device),
+                    torch.full((batch_size,), options.get('top_k', 0), dtype=torch.long, device=model.device),
+                    torch.full((batch_size,), options.get('top_p', 1.0), device=model.device),
+                    options.get('repetition_penalty', 1.0),
+                    options.get('no_repeat_ngram_size', 0)
+                )
+                processors.start(history)
+                
+                timings = []
+                for _ in range(repeats):
+                    step_logits = logits.clone()
+                    start_time = time.perf_counter()
+                    sampled = sample_next_tokens(processors(step_logits))
+                    processors.update(sampled)
+                    timings.append(time.perf_counter() - start_time)
+                
+                row = {
+                    'batch_size': batch_size,
+                    'pipeline': name,
+                    'step_ms': step_ms,
+                    'process_ms': min(timings) * 1000,
+                    'overhead_pct': min(timings) * 1000 / step_ms * 100
+                }
+                results.append(row)
+                logging.info(f"Sampling benchmark: {row}")
+    
+    prompt = random_prompt(config, 16).to(model.device)
+    for beams in (1, num_beams):
+        timings = []
+        for _ in range(repeats):
+            torch.manual_seed(0)
+            start_time = time.perf_counter()
+            output_ids = model.generate_ids(prompt, max_new_tokens=new_tokens, num_beams=beams,
+                                            early_stopping=False, stop_at_eos=False)
+            timings.append(time.perf_counter() - start_time)
+        row = {
+            'batch_size': 1,
+            'pipeline': f"beams={beams}",
+            'step_ms': min(timings) * 1000 / max(output_ids.size(1) - prompt.size(1), 1),
+            'process_ms': 0.0,
+            'overhead_pct': 0.0
+        }
+        results.append(row)
+        logging.info(f"Sampling benchmark: {row}")
+    
+    return results
+
+def benchmark_compile(config: ModelConfig, prompt_lengths: List[int] = (16, 128), new_tokens: int = 64,
+                      repeats: int = 1, backend: str = 'inductor') -> List[Dict[str, Any]]:
+    """Compare eager and torch.compile decoding latency on CPU.
+    
+    First-token latency is the prefill of a prompt; per-token latency is the
+    mean cached single-token step after it. The compiled model is warmed up
+    on the same prompt lengths, so compile_s is the one-off startup cost.
+    """
+    torch.manual_seed(0)
+    eager_model = CareConnectTransformer(config)
+    eager_model.device = torch.device('cpu')
+    eager_model.eval()
+    
+    compiled_model = CareConnectTransformer(config)
+    compiled_model.device = torch.device('cpu')
+    compiled_model.load_state_dict(eager_model.state_dict())
+    start_time = time.perf_counter()
+    if not compiled_model.compile_for_inference(warmup_lengths=list(prompt_lengths), backend=backend):
+        logging.warning(f"Compilation unavailable: {compiled_model.compile_stats.get('error')}")
+    compile_seconds = time.perf_counter() - start_time
+    
+    results = []
+    for prompt_length in prompt_lengths:
+        prompt = random_prompt(config, prompt_length)
+        for mode, model in (('eager', eager_model), ('compiled', compiled_model)):
+            first_token = []
+            per_token = []
+            for _ in range(repeats):
+                with torch.no_grad():
+                    start_time = time.perf_counter()
+                    logits, past_key_values = model.decode_step(prompt)
+                    first_token.append(time.perf_counter() - start_time)
+                    
+                    start_time = time.perf_counter()
+                    for _ in range(new_tokens):
+                        logits, past_key_values = model.decode_step(logits.argmax(dim=-1, keepdim=True), past_key_values)
+                    per_token.append((time.perf_counter() - start_time) / new_tokens)
+            
+            row = {
+                'prompt_length': prompt_length,
+                'mode': model.compile_stats['mode'] if mode == 'compiled' else mode,
+                'first_token_ms': min(first_token) * 1000,
+                'per_token_ms': min(per_token) * 1000,
+                'compile_s': compile_seconds if mode == 'compiled' else 0.0
+            }
+            results.append(row)
+            logging.info(f"Compile benchmark: {row}")
+    
+    return results
+
+def _thread_worker(config: ModelConfig, threads: int, cpus: Optional[List[int]], prompt_length: int,
+                   new_tokens: int, repeats: int) -> Dict[str, float]:
+    """One inference worker process: size its thread pools, then time prefill and decoding."""
+    settings = configure_worker_resources(threads, 1, cpus)
+    torch.manual_seed(0)
+    model = CareConnectTransformer(config)
+    model.device = torch.device('cpu')
+    model.eval()
+    prompt = random_prompt(config, prompt_length)
+    model.generate_ids(prompt, max_new_tokens=2, stop_at_eos=False)
+    
+    prefill = []
+    start_time = time.time()
+    for _ in range(repeats):
+        with torch.no_grad():
+            step_start = time.perf_counter()
+            model(prompt)
+            prefill.append(time.perf_counter() - step_start)
+        model.generate_ids(prompt, max_new_tokens=new_tokens, stop_at_eos=False)
+    return {
+        'start': start_time,
+        'end': time.time(),
+        'tokens': new_tokens * repeats,
+        'prefill_ms': min(prefill) * 1000,
+        'intra_op_threads': settings['intra_op_threads']
+    }
+
+def benchmark_threads(config: ModelConfig, thread_counts: List[int], worker_counts: List[int] = (1,),
+                      prompt_length: int = 64, new_tokens: int = 32, repeats: int = 1,
+                      pin: bool = False) -> List[Dict[str, Any]]:
+    """Throughput and latency of concurrent worker processes over intra-op thread counts.
+    
+    Each (workers, threads) pair runs in fresh spawned processes, since the
+    inter-op pool cannot be resized once used. With pin, worker i is bound
+    to its own block of `threads` CPUs. Rows where workers * threads exceeds
+    the available CPUs show the cost of oversubscription.
+    """
+    cpus = available_cpus()
+    context = multiprocessing.get_context('spawn')
+    results = []
+    for workers in worker_counts:
+        for threads in thread_counts:
+            affinities = [None] * workers
+            if pin:
+                if workers * threads > len(cpus):
+                    logging.warning(f"Skipping pinned {workers}x{threads}: only {len(cpus)} CPUs available")
+                    continue
+                affinities = [cpus[i * threads:(i + 1) * threads] for i in range(workers)]
+            
+            with context.Pool(workers) as pool:
+                runs = pool.starmap(_thread_worker, [
+                    (config, threads, affinity, prompt_length, new_tokens, repeats) for affinity in affinities
+                ])
+            
+            wall = max(run['end'] for run in runs) - min(run['start'] for run in runs)
+            row = {
+                'workers': workers,
+                'threads': threads,
+                'oversubscribed': workers * threads > len(cpus),
+                'prefill_ms': sum(run['prefill_ms'] for run in runs) / workers,
+                'worker_tok_per_s': sum(run['tokens'] / (run['end'] - run['start']) for run in runs) / workers,
+                'total_tok_per_s': sum(run['tokens'] for run in runs) / wall
+            }
+            results.append(row)
+            logging.info(f"Thread benchmark: {row}")
+    
+    return results
+
+# =============================================================================
+# Main Functions
+# =============================================================================
+
+def main():
+    """Main benchmark execution."""
+    
+    parser = argparse.ArgumentParser(description='CareConnect v5.0 AI Inference Benchmarks')
+    parser.add_argument('--layers', type=int, default=12, help='Number of decoder layers')
+    parser.add_argument('--hidden-size', type=int, default=768, help='Hidden size')
+    parser.add_argument('--heads', type=int, default=12, help='Number of attention heads')
+    parser.add_argument('--repeats', type=int, default=1, help='Repetitions per measurement (best is kept)')
+    parser.add_argument('--output', type=str, help='Optional JSON file for results')
+    
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+    
+    kv_parser = subparsers.add_parser('kv-cache', help='Incremental KV-cache decoding vs full recompute')
+    kv_parser.add_argument('--lengths', type=int, nargs='+', default=[50, 200, 1000], help='Generated token counts')
+    kv_parser.add_argument('--prompt-length', type=int, default=16, help='Prompt length in tokens')
+    
+    batch_parser = subparsers.add_parser('batch', help='Batched multi-prompt generation vs one call per prompt')
+    batch_parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 4, 8, 16], help='Prompts per batch')
+    batch_parser.add_argument('--new-tokens', type=int, default=32, help='Generated tokens per prompt')
+    batch_parser.add_argument('--prompt-length', type=int, default=16, help='Prompt length in tokens')
+    
+    quant_parser = subparsers.add_parser('quantize', help='Dynamic int8 quantization vs fp32 on CPU')
+    quant_parser.add_argument('--prompt-length', type=int, default=128, help='Prompt length in tokens')
+    quant_parser.add_argument('--new-tokens', type=int, default=64, help='Generated tokens per run')
+    quant_parser.add_argument('--eval-sequences', type=int, default=8, help='Sequences used for perplexity')
+    
+    spec_parser = subparsers.add_parser('speculative', help='Speculative decoding with draft models vs plain decoding')
+    spec_parser.add_argument('--draft-layers', type=int, nargs='+', default=[1, 2, 4], help='Draft model layer counts')
+    spec_parser.add_argument('--draft-hidden-sizes', type=int, nargs='+', default=[256], help='Draft model hidden sizes')
+    spec_parser.add_argument('--num-draft-tokens', type=int, nargs='+', default=[2, 4, 8], help='Tokens proposed per round')
+    spec_parser.add_argument('--new-tokens', type=int, default=128, help='Generated tokens per run')
+    spec_parser.add_argument('--prompt-length', type=int, default=16, help='Prompt length in tokens')
+    spec_parser.add_argument('--model-path', type=str, help='Optional trained main model checkpoint')
+    spec_parser.add_argument('--draft-path', type=str, help='Optional trained draft model checkpoint')
+    
+    sampling_parser = subparsers.add_parser('sampling', help='Logits-processor overhead per decode step and beam search')
+    sampling_parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8], help='Rows per decode step')
+    sampling_parser.add_argument('--history-length', type=int, default=256, help='Tokens seen by the processors')
+    sampling_parser.add_argument('--num-beams', type=int, default=4, help='Beams for the beam search row')
+    sampling_parser.add_argument('--new-tokens', type=int, default=32, help='Generated tokens for beam search')
+    
+    compile_parser = subparsers.add_parser('compile', help='torch.compile decode step vs eager latency')
+    compile_parser.add_argument('--prompt-lengths', type=int, nargs='+', default=[16, 128], help='Prompt lengths in tokens')
+    compile_parser.add_argument('--new-tokens', type=int, default=64, help='Decode steps timed per prompt')
+    compile_parser.add_argument('--backend', type=str, default='inductor', help='torch.compile backend')
+    
+    threads_parser = subparsers.add_parser('threads', help='Intra-op thread counts for concurrent CPU workers')
+    threads_parser.add_argument('--thread-counts', type=int, nargs='+', default=[1, 2, 4, 8], help='Intra-op threads per worker')
+    threads_parser.add_argument('--workers', type=int, nargs='+', default=[1, 4], help='Concurrent worker processes')
+    threads_parser.add_argument('--prompt-length', type=int, default=64, help='Prompt length in tokens')
+    threads_parser.add_argument('--new-tokens', type=int, default=32, help='Generated tokens per run')
+    threads_parser.add_argument('--pin', action='store_true', help='Pin each worker to its own CPUs')
+    
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    torch.manual_seed(0)
+    
+    config = build_benchmark_config(args)
+    results: Dict[str, Any] = {'config': config.__dict__, 'torch_threads': torch.get_num_threads()}
+    
+    if args.benchmark == 'kv-cache':
+        model = CareConnectTransformer(config).to(torch.device('cpu'))
+        model.device = torch.device('cpu')
+        rows = benchmark_kv_cache(model, args.lengths, args.prompt_length, args.repeats)
+        print_results('Generation throughput (tokens/sec)', rows)
+        results['kv_cache'] = rows
+    
+    if args.benchmark == 'batch':
+        model = CareConnectTransformer(config).to(torch.device('cpu'))
+        model.device = torch.device('cpu')
+        rows = benchmark_batch_generation(model, args.batch_sizes, args.new_tokens, args.prompt_length, args.repeats)
+        print_results('Batched generation throughput (tokens/sec)', rows)
+        results['batch'] = rows
+    
+    if args.benchmark == 'speculative':
+        model = CareConnectTransformer(config).to(torch.device('cpu'))
+        model.device = torch.device('cpu')
+        if args.model_path:
+            model.load_model(args.model_path)
+        rows = benchmark_speculative(model, args.draft_layers, args.draft_hidden_sizes, args.num_draft_tokens,
+                                     args.new_tokens, args.prompt_length, args.repeats, args.draft_path)
+        print_results('Speculative decoding throughput (tokens/sec)', rows)
+        results['speculative'] = rows
+    
+    if args.benchmark == 'sampling':
+        model = CareConnectTransformer(config).to(torch.device('cpu'))
+        model.device = torch.device('cpu')
+        rows = benchmark_sampling(model, args.batch_sizes, args.history_length, args.num_beams,
+                                  args.new_tokens, args.repeats)
+        print_results('Logits-processor overhead per decode step', rows)
+        results['sampling'] = rows
+    
+    if args.benchmark == 'quantize':
+        rows = benchmark_quantization(config, args.prompt_length, args.new_tokens, args.eval_sequences, args.repeats)
+        print_results('fp32 vs int8 dynamic quantization (CPU)', rows)
+        results['quantize'] = rows
+    
+    if args.benchmark == 'compile':
+        rows = benchmark_compile(config, args.prompt_lengths, args.new_tokens, args.repeats, args.backend)
+        print_results('Eager vs compiled decoding latency (CPU)', rows)
+        results['compile'] = rows
+    
+    if args.benchmark == 'threads':
+        rows = benchmark_threads(config, args.thread_counts, args.workers, args.prompt_length, args.new_tokens,
+                                 args.repeats, args.pin)
+        print_results('Worker throughput by intra-op thread count (CPU)', rows)
+        results['threads'] = rows
+    
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
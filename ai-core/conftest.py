@@ -0,0 +1,31 @@
+"""
+Shared pytest fixtures for the ai-core model, run with `python -m pytest ai-core`.
+"""
+
+import pytest
+
+from model import CareConnectModel, ModelConfig
+
+# Large enough for the untrained byte-level tokenizer (260 IDs)
+TINY_CONFIG = dict(vocab_size=288, hidden_size=64, num_layers=2, num_attention_heads=2,
+                   intermediate_size=128, max_position_embeddings=256)
+
+@pytest.fixture
+def tiny_config():
+    """Config for a tiny untrained transformer that runs quickly on CPU."""
+    return ModelConfig(**TINY_CONFIG)
+
+@pytest.fixture
+def make_care_model(tmp_path):
+    """Build a CareConnectModel over the tiny config with paths under tmp_path."""
+    def make(**overrides):
+        config = ModelConfig(**{
+            **TINY_CONFIG,
+            'model_path': str(tmp_path / 'missing.pt'),
+            'draft_model_path': str(tmp_path / 'missing-draft.pt'),
+            'tokenizer_path': str(tmp_path / 'tokenizer'),
+            **overrides
+        })
+        return CareConnectModel(config)
+    
+    return make
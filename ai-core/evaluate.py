@@ -18,7 +18,7 @@ from sklearn.manifold import TSNE
 import pandas as pd
 from datetime import datetime
 
-from model import CareConnectModel, ModelConfig, SimpleTokenizer
+from model import CareConnectModel, ModelConfig
 
 # =============================================================================
 # Configuration
@@ -186,6 +186,10 @@ def evaluate_model(model: CareConnectModel, test_data: List[Dict[str, str]],
     metrics = EvaluationMetrics()
     device = model.device
     
+    # Same shared tokenizer the model generates with
+    tokenizer = model.tokenizer
+    encoded_targets = tokenizer.encode_batch([item.get('target', '') for item in test_data])
+    
     print(f"Evaluating model on {len(test_data)} samples...")
     
     for i, item in enumerate(tqdm(test_data, desc="Evaluating")):
@@ -203,13 +207,11 @@ def evaluate_model(model: CareConnectModel, test_data: List[Dict[str, str]],
             # Calculate loss if possible
             loss = None
             try:
-                # Tokenize for loss calculation
-                tokenizer = model.tokenizer
-                input_ids = tokenizer.encode(input_text, return_tensors='pt').to(device)
-                target_ids = tokenizer.encode(target_text, return_tensors='pt').to(device)
+                # Teacher-forced loss on the target tokens
+                target_ids = torch.tensor([encoded_targets[i]], dtype=torch.long, device=device)
                 
                 with torch.no_grad():
-                    outputs = model.transformer(input_ids)
+                    outputs = model.transformer(target_ids)
                     loss_fct = nn.CrossEntropyLoss(ignore_index=-100)
                     
                     # Create labels for loss calculation
@@ -21,6 +21,7 @@ try:
     from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
     from sentence_transformers import SentenceTransformer
     import openai
+    from resources import configure_worker_resources
 except ImportError as e:
     print(f"Warning: Some AI libraries not available: {e}", file=sys.stderr)
 
@@ -37,11 +38,21 @@ class LocalAIInference:
         self.embedding_model = None
         self.text_generation_pipeline = None
         self.sentiment_pipeline = None
+        self.worker_resources = {}
+        self.requests_processed = 0
         self.is_ready = False
         
     def initialize(self):
         """Initialize the AI models"""
         try:
+            # Size thread pools before any model work so they are not
+            # fixed at the PyTorch defaults
+            self.worker_resources = configure_worker_resources(
+                intra_op_threads=self.config.get('intraOpThreads'),
+                inter_op_threads=self.config.get('interOpThreads'),
+                cpu_affinity=self.config.get('cpuAffinity')
+            )
+            
             logger.info(f"Loading model from {self.model_path}")
             
             # Load tokenizer and model
@@ -256,6 +267,15 @@ class LocalAIInference:
             logger.error(f"Recommendation generation failed: {e}")
             return []
     
+    def get_stats(self) -> Dict[str, Any]:
+        """Service status with the effective worker resource settings"""
+        return {
+            'is_ready': self.is_ready,
+            'model': self.config.get('model', 'local'),
+            'requests_processed': self.requests_processed,
+            'worker_resources': self.worker_resources
+        }
+    
     def process_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
         """Process an AI request"""
         start_time = time.time()
@@ -266,7 +286,10 @@ class LocalAIInference:
             context = request.get('context', {})
             options = request.get('options', {})
             
-            if request_type == 'search':
+            if request_type == 'stats':
+                data = self.get_stats()
+            
+            elif request_type == 'search':
                 documents = context.get('documents', [])
                 results = self.search(prompt, documents)
                 data = results
@@ -306,6 +329,7 @@ class LocalAIInference:
                 data = self.generate_text(prompt, options.get('maxTokens', 2048), options.get('temperature', 0.7))
             
             latency = time.time() - start_time
+            self.requests_processed += 1
             
             return {
                 'success': True,
@@ -335,12 +359,21 @@ def main():
     parser = argparse.ArgumentParser(description='CareConnect v5.0 AI Inference Service')
     parser.add_argument('--model', required=True, help='Path to the AI model')
     parser.add_argument('--config', default='{}', help='JSON configuration')
+    parser.add_argument('--intra-op-threads', type=int, help='PyTorch intra-op threads (default: pinned CPUs or all cores)')
+    parser.add_argument('--inter-op-threads', type=int, help='PyTorch inter-op threads')
+    parser.add_argument('--cpu-affinity', type=str, help="CPUs to pin this worker to, e.g. '0-3,8'")
     
     args = parser.parse_args()
     
     try:
-        # Parse config
+        # Parse config; command line resource flags take precedence
         config = json.loads(args.config)
+        if args.intra_op_threads is not None:
+            config['intraOpThreads'] = args.intra_op_threads
+        if args.inter_op_threads is not None:
+            config['interOpThreads'] = args.inter_op_threads
+        if args.cpu_affinity:
+            config['cpuAffinity'] = args.cpu_affinity
         
         # Initialize AI service
         ai_service = LocalAIInference(args.model, config)
@@ -5,12 +5,15 @@ Consolidates data, builds embeddings, and updates Personal Knowledge Graph
 """
 
 import os
+import re
 import json
+import uuid
 import asyncio
 import logging
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any, Union
-from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional, Any, Union, Tuple, Set
+from dataclasses import dataclass, asdict, field
+from collections import Counter, OrderedDict, defaultdict, deque
 from pathlib import Path
 import hashlib
 import pickle
@@ -50,8 +53,6 @@ from elasticsearch import Elasticsearch
 import psutil
 import schedule
 import time
-from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
 import zmq
 import msgpack
 
@@ -115,6 +116,618 @@ class MemoryRelationship:
         if self.metadata is None:
             self.metadata = {}
 
+@dataclass
+class SearchSession:
+    """Ranked hits for one query, extended on demand as cursors page deeper"""
+    query: str
+    embedding: np.ndarray
+    filters: Optional[Dict[str, Any]] = None
+    hits: List[Tuple[str, float]] = field(default_factory=list)
+    seen: Set[str] = field(default_factory=set)
+    exhausted: bool = False
+    last_used: float = field(default_factory=time.time)
+
+@dataclass
+class SearchHit:
+    """Lightweight search result; content and metadata are read on access"""
+    id: str
+    similarity: float
+    rank: int
+    cursor: str
+    engine: Any = field(default=None, repr=False)
+    
+    @property
+    def node(self) -> Optional[MemoryNode]:
+        return self.engine.memory_nodes.get(self.id)
+    
+    @property
+    def content(self) -> Optional[str]:
+        node = self.node
+        return node.content if node else None
+    
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        node = self.node
+        return node.metadata if node else {}
+    
+    def to_dict(self, include_content: bool = False, include_metadata: bool = False) -> Dict[str, Any]:
+        """Materialize the hit in the same shape as MemoryEngine.search results"""
+        node = self.node
+        result = {
+            'id': self.id,
+            'rank': self.rank,
+            'cursor': self.cursor,
+            'similarity': self.similarity
+        }
+        if node is None:
+            return result
+        
+        result.update({
+            'type': node.type,
+            'summary': node.summary,
+            'keywords': node.keywords,
+            'tags': node.tags,
+            'created_at': node.created_at.isoformat()
+        })
+        if include_content:
+            result['content'] = node.content[:200] + '...' if len(node.content) > 200 else node.content
+        if include_metadata:
+            result['metadata'] = node.metadata
+        return result
+
+class SimHashIndex:
+    """64-bit SimHash fingerprint index for near-duplicate detection at ingest.
+    
+    Fingerprints are split into ``max_distance + 1`` bands; by the pigeonhole
+    principle any two fingerprints within ``max_distance`` bits share at least
+    one band exactly, so lookups only compare against bucket candidates.
+    """
+    
+    FINGERPRINT_BITS = 64
+    
+    def __init__(self, max_distance: int = 3):
+        self.max_distance = max_distance
+        num_bands = max_distance + 1
+        band_bits = self.FINGERPRINT_BITS // num_bands
+        self.bands: List[Tuple[int, int]] = []
+        for band in range(num_bands):
+            shift = band * band_bits
+            width = band_bits if band < num_bands - 1 else self.FINGERPRINT_BITS - shift
+            self.bands.append((shift, (1 << width) - 1))
+        self.buckets: Dict[Tuple[str, int, int], Set[str]] = defaultdict(set)
+        self.fingerprints: Dict[str, Tuple[str, int]] = {}
+    
+    @staticmethod
+    def tokenize(text: str) -> List[str]:
+        """Cheap word tokenization used for fingerprinting"""
+        return re.findall(r'\w+', text.lower())
+    
+    @classmethod
+    def fingerprint(cls, tokens: List[str]) -> int:
+        """Compute the SimHash of unigram and bigram features weighted by count"""
+        if not tokens:
+            return 0
+        
+        features = Counter(tokens)
+        features.update(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+        
+        digests = b''.join(
+            hashlib.blake2b(feature.encode('utf-8'), digest_size=cls.FINGERPRINT_BITS // 8).digest()
+            for feature in features
+        )
+        bits = np.unpackbits(
+            np.frombuffer(digests, dtype=np.uint8).reshape(len(features), -1),
+            axis=1, bitorder='little'
+        )
+        weights = np.fromiter(features.values(), dtype=np.float64, count=len(features))
+        votes = weights @ (bits.astype(np.float64) * 2.0 - 1.0)
+        
+        return int.from_bytes(np.packbits(votes > 0, bitorder='little').tobytes(), 'little')
+    
+    @staticmethod
+    def distance(a: int, b: int) -> int:
+        """Hamming distance between two fingerprints"""
+        return bin(a ^ b).count('1')
+    
+    def _band_keys(self, namespace: str, fingerprint: int) -> List[Tuple[str, int, int]]:
+        return [
+            (namespace, band, (fingerprint >> shift) & mask)
+            for band, (shift, mask) in enumerate(self.bands)
+        ]
+    
+    def add(self, node_id: str, namespace: str, fingerprint: int):
+        """Register a node fingerprint"""
+        self.remove(node_id)
+        self.fingerprints[node_id] = (namespace, fingerprint)
+        for key in self._band_keys(namespace, fingerprint):
+            self.buckets[key].add(node_id)
+    
+    def remove(self, node_id: str):
+        """Forget a node fingerprint"""
+        entry = self.fingerprints.pop(node_id, None)
+        if entry is None:
+            return
+        for key in self._band_keys(*entry):
+            bucket = self.buckets.get(key)
+            if bucket is not None:
+                bucket.discard(node_id)
+                if not bucket:
+                    del self.buckets[key]
+    
+    def find(self, namespace: str, fingerprint: int) -> Optional[Tuple[str, int]]:
+        """Return the closest indexed node within max_distance, if any"""
+        candidates = set()
+        for key in self._band_keys(namespace, fingerprint):
+            candidates.update(self.buckets.get(key, ()))
+        
+        best = None
+        for node_id in candidates:
+            dist = self.distance(fingerprint, self.fingerprints[node_id][1])
+            if dist <= self.max_distance and (best is None or dist < best[1]):
+                best = (node_id, dist)
+        return best
+    
+    def __len__(self) -> int:
+        return len(self.fingerprints)
+
+class MinHashIndex:
+    """MinHash signature index for near-duplicate detection of short texts.
+    
+    SimHash distances are too coarse for short texts, where one changed word
+    flips a large share of the features, so short texts are compared by the
+    estimated Jaccard similarity of their unigram and bigram sets instead.
+    Signatures are split into bands of rows; only nodes sharing a whole band
+    with the query are compared, which keeps pairs above ``min_similarity``
+    as candidates with high probability.
+    """
+    
+    NUM_PERMUTATIONS = 64
+    
+    # Multiply-shift hash family over 64-bit feature hashes, fixed so
+    # signatures stored in node metadata stay comparable across restarts
+    _MULTIPLIERS = (
+        np.random.RandomState(1).randint(0, 2 ** 63, NUM_PERMUTATIONS, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+    )
+    _OFFSETS = np.random.RandomState(2).randint(0, 2 ** 63, NUM_PERMUTATIONS, dtype=np.uint64)
+    
+    def __init__(self, min_similarity: float = 0.7, num_bands: int = 16):
+        if self.NUM_PERMUTATIONS % num_bands:
+            raise ValueError(f"num_bands must divide {self.NUM_PERMUTATIONS}")
+        self.min_similarity = min_similarity
+        self.rows = self.NUM_PERMUTATIONS // num_bands
+        self.num_bands = num_bands
+        self.buckets: Dict[Tuple[str, int, bytes], Set[str]] = defaultdict(set)
+        self.signatures: Dict[str, Tuple[str, np.ndarray]] = {}
+    
+    @classmethod
+    def signature(cls, tokens: List[str]) -> np.ndarray:
+        """Compute the MinHash signature of the unigram and bigram feature set"""
+        features = set(tokens)
+        features.update(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+        
+        hashes = np.frombuffer(
+            b''.join(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest() for feature in features),
+            dtype=np.uint64
+        )
+        permuted = (hashes[:, None] * cls._MULTIPLIERS + cls._OFFSETS) >> np.uint64(32)
+        return permuted.min(axis=0).astype(np.uint32)
+    
+    @staticmethod
+    def to_hex(signature: np.ndarray) -> str:
+        return signature.astype('>u4').tobytes().hex()
+    
+    @staticmethod
+    def from_hex(value: str) -> np.ndarray:
+        return np.frombuffer(bytes.fromhex(value), dtype='>u4').astype(np.uint32)
+    
+    @staticmethod
+    def similarity(a: np.ndarray, b: np.ndarray) -> float:
+        """Estimated Jaccard similarity of two signatures"""
+        return float(np.mean(a == b))
+    
+    def _band_keys(self, namespace: str, signature: np.ndarray) -> List[Tuple[str, int, bytes]]:
+        return [
+            (namespace, band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+            for band in range(self.num_bands)
+        ]
+    
+    def add(self, node_id: str, namespace: str, signature: np.ndarray):
+        """Register a node signature"""
+        self.remove(node_id)
+        self.signatures[node_id] = (namespace, signature)
+        for key in self._band_keys(namespace, signature):
+            self.buckets[key].add(node_id)
+    
+    def remove(self, node_id: str):
+        """Forget a node signature"""
+        entry = self.signatures.pop(node_id, None)
+        if entry is None:
+            return
+        for key in self._band_keys(*entry):
+            bucket = self.buckets.get(key)
+            if bucket is not None:
+                bucket.discard(node_id)
+                if not bucket:
+                    del self.buckets[key]
+    
+    def find(self, namespace: str, signature: np.ndarray) -> Optional[Tuple[str, float]]:
+        """Return the most similar indexed node at or above min_similarity, if any"""
+        candidates = set()
+        for key in self._band_keys(namespace, signature):
+            candidates.update(self.buckets.get(key, ()))
+        
+        best = None
+        for node_id in candidates:
+            similarity = self.similarity(signature, self.signatures[node_id][1])
+            if similarity >= self.min_similarity and (best is None or similarity > best[1]):
+                best = (node_id, similarity)
+        return best
+    
+    def __len__(self) -> int:
+        return len(self.signatures)
+
+class VectorIndexManager:
+    """FAISS index that picks Flat, HNSW or IVF-PQ by corpus size and recall target.
+    
+    New vectors are added to the active index immediately. When the corpus
+    outgrows the active index type (or accumulates too many deletions) a
+    replacement is trained from the stored embeddings on a background thread,
+    tuned against a held-out query sample and swapped in under the lock.
+    """
+    
+    HNSW_EF_SEARCH = [16, 32, 64, 128, 256, 512]
+    IVF_NPROBE = [1, 2, 4, 8, 16, 32, 64, 128, 256]
+    
+    def __init__(self, dimension: int, config: Dict[str, Any] = None):
+        config = config or {}
+        self.dimension = dimension
+        self.flat_max_size = config.get('flat_max_size', 20000)
+        self.ivfpq_min_size = config.get('ivfpq_min_size', 1000000)
+        self.recall_target = config.get('recall_target', 0.95)
+        self.eval_k = config.get('eval_k', 10)
+        self.eval_queries = config.get('eval_queries', 100)
+        self.rebuild_growth_factor = config.get('rebuild_growth_factor', 2.0)
+        self.max_deleted_ratio = config.get('max_deleted_ratio', 0.2)
+        self.hnsw_m = config.get('hnsw_m', 32)
+        self.hnsw_ef_construction = config.get('hnsw_ef_construction', 80)
+        self.max_train_size = config.get('max_train_size', 131072)
+        
+        self.lock = threading.RLock()
+        
+        # Stored embeddings used for rebuilds
+        self._ids: List[Optional[str]] = []
+        self._vectors: List[Optional[np.ndarray]] = []
+        self._positions: Dict[str, int] = {}
+        
+        # Active index and its row -> node ID mapping
+        self._index = faiss.IndexFlatIP(dimension)
+        self._index_kind = 'flat'
+        self._search_param = None
+        self._index_ids: List[str] = []
+        self._index_rows: Dict[str, int] = {}
+        self._dead_rows: Set[int] = set()
+        self._built_size = 0
+        
+        # Changes made while a rebuild is in progress
+        self._pending: Optional[List[Tuple[str, Optional[np.ndarray]]]] = None
+        self._rebuild_thread: Optional[threading.Thread] = None
+        
+        self._query_sample = deque(maxlen=config.get('query_sample_size', 256))
+        self.last_evaluation: Dict[str, Any] = {}
+        self.rebuild_count = 0
+    
+    def select_index_type(self, size: int) -> str:
+        """Choose an index type for a corpus of the given size"""
+        if size < self.flat_max_size:
+            return 'flat'
+        if size < self.ivfpq_min_size or self.recall_target > 0.98:
+            return 'hnsw'
+        return 'ivfpq'
+    
+    def add(self, node_id: str, vector: np.ndarray):
+        """Add or replace the embedding for a node"""
+        self.add_batch([node_id], [vector])
+    
+    def add_batch(self, node_ids: List[str], vectors: List[np.ndarray]):
+        """Add or replace embeddings for several nodes at once"""
+        if not node_ids:
+            return
+        
+        vectors = [np.asarray(v, dtype=np.float32).reshape(-1) for v in vectors]
+        with self.lock:
+            for node_id, vector in zip(node_ids, vectors):
+                position = self._positions.get(node_id)
+                if position is None:
+                    self._positions[node_id] = len(self._ids)
+                    self._ids.append(node_id)
+                    self._vectors.append(vector)
+                else:
+                    self._vectors[position] = vector
+                
+                old_row = self._index_rows.get(node_id)
+                if old_row is not None:
+                    self._dead_rows.add(old_row)
+                self._index_rows[node_id] = len(self._index_ids)
+                self._index_ids.append(node_id)
+                
+                if self._pending is not None:
+                    self._pending.append((node_id, vector))
+            
+            self._index.add(np.vstack(vectors))
+        
+        self._maybe_rebuild()
+    
+    def remove(self, node_id: str):
+        """Remove a node's embedding"""
+        with self.lock:
+            position = self._positions.pop(node_id, None)
+            if position is not None:
+                self._ids[position] = None
+                self._vectors[position] = None
+            
+            row = self._index_rows.pop(node_id, None)
+            if row is not None:
+                self._dead_rows.add(row)
+            
+            if self._pending is not None:
+                self._pending.append((node_id, None))
+        
+        self._maybe_rebuild()
+    
+    def search(self, vector: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        """Return up to k (node_id, score) pairs ranked by inner product"""
+        query = np.asarray(vector, dtype=np.float32).reshape(1, -1)
+        
+        with self.lock:
+            self._query_sample.append(query[0])
+            
+            total_rows = len(self._index_ids)
+            if total_rows == 0 or k <= 0:
+                return []
+            
+            fetch = min(total_rows, k + len(self._dead_rows))
+            scores, rows = self._index.search(query, fetch)
+            
+            results = []
+            for score, row in zip(scores[0], rows[0]):
+                if row < 0 or row in self._dead_rows:
+                    continue
+                results.append((self._index_ids[row], float(score)))
+                if len(results) >= k:
+                    break
+            
+            return results
+    
+    def evaluate(self) -> Dict[str, Any]:
+        """Measure recall@k versus latency of the active index on the query sample"""
+        with self.lock:
+            vectors = [v for v in self._vectors if v is not None]
+            matrix = np.vstack(vectors) if vectors else np.empty((0, self.dimension), dtype=np.float32)
+            self.last_evaluation = self._tune(self._index, self._index_kind, matrix)
+            self._search_param = self.last_evaluation.get('search_param')
+            return self.last_evaluation
+    
+    def _maybe_rebuild(self):
+        """Start a background rebuild when the active index no longer fits the corpus"""
+        with self.lock:
+            if self._rebuild_thread is not None and self._rebuild_thread.is_alive():
+                return
+            
+            live_size = len(self._positions)
+            kind = self.select_index_type(live_size)
+            dead_ratio = len(self._dead_rows) / max(len(self._index_ids), 1)
+            grown = kind == 'ivfpq' and live_size >= max(self._built_size, 1) * self.rebuild_growth_factor
+            
+            if kind == self._index_kind and not grown and dead_ratio <= self.max_deleted_ratio:
+                return
+            
+            # Snapshot under the same lock that starts recording pending
+            # changes, so every later change is replayed exactly once
+            self._pending = []
+            ids = [node_id for node_id in self._ids if node_id is not None]
+            vectors = [v for v in self._vectors if v is not None]
+            self._rebuild_thread = threading.Thread(
+                target=self._rebuild, args=(ids, vectors), name='vector-index-rebuild', daemon=True
+            )
+            self._rebuild_thread.start()
+    
+    def _rebuild(self, ids: List[str], vectors: List[np.ndarray]):
+        """Train a replacement index from a snapshot of stored embeddings and swap it in"""
+        try:
+            matrix = np.vstack(vectors) if vectors else np.empty((0, self.dimension), dtype=np.float32)
+            kind = self.select_index_type(len(ids))
+            
+            start_time = time.time()
+            index = self._build_index(kind, matrix)
+            evaluation = self._tune(index, kind, matrix)
+            evaluation['build_seconds'] = time.time() - start_time
+            
+            with self.lock:
+                # Replay changes made while the new index was being trained
+                index_ids = list(ids)
+                index_rows = {node_id: row for row, node_id in enumerate(ids)}
+                dead_rows = set()
+                pending_vectors = []
+                for node_id, vector in self._pending:
+                    old_row = index_rows.pop(node_id, None)
+                    if old_row is not None:
+                        dead_rows.add(old_row)
+                    if vector is not None:
+                        index_rows[node_id] = len(index_ids)
+                        index_ids.append(node_id)
+                        pending_vectors.append(vector)
+                if pending_vectors:
+                    index.add(np.vstack(pending_vectors))
+                
+                # Swap in the new index
+                self._index = index
+                self._index_kind = kind
+                self._search_param = evaluation.get('search_param')
+                self._index_ids = index_ids
+                self._index_rows = index_rows
+                self._dead_rows = dead_rows
+                self._built_size = len(ids)
+                self.last_evaluation = evaluation
+                self.rebuild_count += 1
+                
+                # Compact stored embeddings
+                live = [(i, v) for i, v in zip(self._ids, self._vectors) if i is not None]
+                self._ids = [i for i, _ in live]
+                self._vectors = [v for _, v in live]
+                self._positions = {node_id: position for position, node_id in enumerate(self._ids)}
+            
+            logger.info(
+                f"Rebuilt vector index as {kind} over {len(ids)} vectors in "
+                f"{evaluation['build_seconds']:.2f}s (recall@{evaluation.get('k')}: "
+                f"{evaluation.get('recall_at_k', 1.0):.3f})"
+            )
+        
+        except Exception as e:
+            logger.error(f"Error rebuilding vector index: {e}")
+        finally:
+            with self.lock:
+                self._pending = None
+    
+    def _build_index(self, kind: str, matrix: np.ndarray):
+        """Build and populate an index of the given type"""
+        if kind == 'hnsw':
+            index = faiss.IndexHNSWFlat(self.dimension, self.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efConstruction = self.hnsw_ef_construction
+        elif kind == 'ivfpq':
+            # FAISS wants roughly 39 training points per centroid
+            nlist = int(max(16, min(4 * np.sqrt(len(matrix)), len(matrix) // 39)))
+            quantizer = faiss.IndexFlatIP(self.dimension)
+            index = faiss.IndexIVFPQ(
+                quantizer, self.dimension, nlist, self._pq_subquantizers(), 8, faiss.METRIC_INNER_PRODUCT
+            )
+            if len(matrix) > self.max_train_size:
+                sample = np.random.default_rng().choice(len(matrix), self.max_train_size, replace=False)
+                index.train(matrix[sample])
+            else:
+                index.train(matrix)
+        else:
+            index = faiss.IndexFlatIP(self.dimension)
+        
+        if len(matrix):
+            index.add(matrix)
+        return index
+    
+    def _pq_subquantizers(self) -> int:
+        """Largest common PQ sub-quantizer count dividing the embedding dimension"""
+        for m in (64, 48, 32, 24, 16, 12, 8, 4, 2):
+            if self.dimension % m == 0:
+                return m
+        return 1
+    
+    def _search_params(self, index, kind: str) -> List[Optional[int]]:
+        if kind == 'hnsw':
+            return self.HNSW_EF_SEARCH
+        if kind == 'ivfpq':
+            return [p for p in self.IVF_NPROBE if p <= index.nlist]
+        return [None]
+    
+    @staticmethod
+    def _set_search_param(index, kind: str, value: Optional[int]):
+        if kind == 'hnsw':
+            index.hnsw.efSearch = value
+        elif kind == 'ivfpq':
+            index.nprobe = value
+    
+    def _sample_queries(self, matrix: np.ndarray) -> np.ndarray:
+        """Held-out query sample: recent real queries, topped up from the corpus"""
+        with self.lock:
+            queries = list(self._query_sample)[-self.eval_queries:]
+        missing = self.eval_queries - len(queries)
+        if missing > 0 and len(matrix):
+            rows = np.random.default_rng().choice(len(matrix), min(missing, len(matrix)), replace=False)
+            queries.extend(matrix[rows])
+        if not queries:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        return np.vstack(queries).astype(np.float32)
+    
+    @staticmethod
+    def _exact_top_k(queries: np.ndarray, matrix: np.ndarray, k: int, block_size: int = 65536) -> np.ndarray:
+        """Brute-force top-k row indices, computed block-wise to bound memory"""
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        for start in range(0, len(matrix), block_size):
+            block = matrix[start:start + block_size]
+            scores = np.concatenate([best_scores, queries @ block.T], axis=1)
+            rows = np.concatenate([
+                best_rows,
+                np.broadcast_to(np.arange(start, start + len(block)), (len(queries), len(block)))
+            ], axis=1)
+            if scores.shape[1] > k:
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                scores = np.take_along_axis(scores, top, axis=1)
+                rows = np.take_along_axis(rows, top, axis=1)
+            best_scores, best_rows = scores, rows
+        return best_rows
+    
+    def _tune(self, index, kind: str, matrix: np.ndarray) -> Dict[str, Any]:
+        """Sweep search parameters, recording recall@k and latency, and keep the
+        cheapest setting that meets the recall target"""
+        queries = self._sample_queries(matrix)
+        k = min(self.eval_k, len(matrix))
+        evaluation = {
+            'index_type': kind,
+            'size': len(matrix),
+            'k': k,
+            'num_queries': len(queries),
+            'recall_target': self.recall_target,
+            'curve': [],
+            'evaluated_at': datetime.now().isoformat()
+        }
+        if k == 0 or len(queries) == 0:
+            return evaluation
+        
+        ground_truth = self._exact_top_k(queries, matrix, k)
+        
+        chosen = None
+        for value in self._search_params(index, kind):
+            self._set_search_param(index, kind, value)
+            start_time = time.perf_counter()
+            _, rows = index.search(queries, k)
+            latency_ms = (time.perf_counter() - start_time) * 1000 / len(queries)
+            
+            recall = float(np.mean([
+                len(set(found.tolist()) & set(expected.tolist())) / k
+                for found, expected in zip(rows, ground_truth)
+            ]))
+            evaluation['curve'].append({
+                'search_param': value,
+                'recall_at_k': recall,
+                'latency_ms': latency_ms
+            })
+            if chosen is None and recall >= self.recall_target:
+                chosen = evaluation['curve'][-1]
+        
+        if chosen is None:
+            chosen = evaluation['curve'][-1]
+        self._set_search_param(index, kind, chosen['search_param'])
+        evaluation.update(chosen)
+        return evaluation
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get index statistics"""
+        with self.lock:
+            return {
+                'index_type': self._index_kind,
+                'search_param': self._search_param,
+                'live_vectors': len(self._positions),
+                'index_rows': len(self._index_ids),
+                'dead_rows': len(self._dead_rows),
+                'rebuilding': self._rebuild_thread is not None and self._rebuild_thread.is_alive(),
+                'rebuild_count': self.rebuild_count,
+                'last_evaluation': self.last_evaluation
+            }
+    
+    def shutdown(self, timeout: float = 30.0):
+        """Wait for an in-flight rebuild to finish"""
+        thread = self._rebuild_thread
+        if thread is not None and thread.is_alive():
+            thread.join(timeout)
+
 class MemoryEngine:
     """AI Memory Engine for building and maintaining Personal Knowledge Graph"""
     
@@ -127,13 +740,28 @@ class MemoryEngine:
         self.stop_words = None
         self.knowledge_graph = nx.DiGraph()
         self.memory_nodes: Dict[str, MemoryNode] = {}
-        self.embeddings_index = None
+        self.vector_index = None
         self.db_session = None
         self.redis_client = None
         self.es_client = None
         self.executor = ThreadPoolExecutor(max_workers=4)
         self.lock = threading.RLock()
         
+        # Near-duplicate detection
+        dedup_config = self.config.get('dedup', {})
+        self.dedup_enabled = dedup_config.get('enabled', True)
+        self.dedup_min_tokens = dedup_config.get('min_tokens', 8)
+        self.simhash_index = SimHashIndex(dedup_config.get('max_hamming_distance', 3))
+        self.minhash_max_tokens = dedup_config.get('minhash_max_tokens', 64)
+        self.minhash_index = MinHashIndex(dedup_config.get('min_jaccard', 0.7))
+        self.node_aliases: Dict[str, str] = {}
+        self.duplicates_skipped = 0
+        
+        # Paginated search sessions keyed by cursor prefix
+        self.search_sessions: "OrderedDict[str, SearchSession]" = OrderedDict()
+        self.search_session_ttl = self.config.get('search_session_ttl', 600)
+        self.max_search_sessions = self.config.get('max_search_sessions', 1000)
+        
         # Initialize components
         self._initialize_nlp()
         self._initialize_embeddings()
@@ -192,9 +820,9 @@ class MemoryEngine:
                 ngram_range=(1, 2)
             )
             
-            # Initialize FAISS index
+            # Initialize FAISS index manager
             dimension = self.model.get_sentence_embedding_dimension()
-            self.embeddings_index = faiss.IndexFlatIP(dimension)
+            self.vector_index = VectorIndexManager(dimension, self.config.get('vector_index', {}))
             
             logger.info(f"Embedding models initialized with dimension {dimension}")
         except Exception as e:
@@ -307,6 +935,7 @@ class MemoryEngine:
     def _load_existing_memory(self):
         """Load existing memory nodes from database"""
         try:
+            indexed_ids, indexed_vectors = [], []
             with self.db_session.begin():
                 result = self.db_session.execute(text("SELECT * FROM memory_nodes"))
                 for row in result:
@@ -315,7 +944,7 @@ class MemoryEngine:
                         type=row.type,
                         content=row.content,
                         metadata=json.loads(row.metadata) if row.metadata else {},
-                        embeddings=np.frombuffer(row.embeddings) if row.embeddings else None,
+                        embeddings=np.frombuffer(row.embeddings, dtype=np.float32) if row.embeddings else None,
                         keywords=json.loads(row.keywords) if row.keywords else [],
                         summary=row.summary,
                         confidence=row.confidence,
@@ -328,6 +957,15 @@ class MemoryEngine:
                     )
                     self.memory_nodes[node.id] = node
                     self.knowledge_graph.add_node(node.id, **asdict(node))
+                    self._register_fingerprint(node)
+                    for alias_id in node.metadata.get('aliases', []):
+                        self.node_aliases[alias_id] = node.id
+                    if node.embeddings is not None:
+                        indexed_ids.append(node.id)
+                        indexed_vectors.append(node.embeddings)
+            
+            if self.vector_index is not None:
+                self.vector_index.add_batch(indexed_ids, indexed_vectors)
             
             logger.info(f"Loaded {len(self.memory_nodes)} memory nodes")
         except Exception as e:
@@ -361,6 +999,12 @@ class MemoryEngine:
                 tags=file_metadata.get('tags', [])
             )
             
+            # Skip embedding and summarization for near-duplicates
+            canonical_id = await self._check_near_duplicate(node)
+            if canonical_id:
+                logger.info(f"File {file_path} is a near-duplicate of {canonical_id}")
+                return canonical_id
+            
             # Process content
             await self._process_node_content(node)
             
@@ -384,10 +1028,16 @@ class MemoryEngine:
                 id=text_id,
                 type='text',
                 content=text,
-                metadata=metadata or {},
+                metadata=dict(metadata or {}),
                 tags=metadata.get('tags', []) if metadata else []
             )
             
+            # Skip embedding and summarization for near-duplicates
+            canonical_id = await self._check_near_duplicate(node)
+            if canonical_id:
+                logger.info(f"Text {text_id} is a near-duplicate of {canonical_id}")
+                return canonical_id
+            
             # Process content
             await self._process_node_content(node)
             
@@ -423,6 +1073,12 @@ class MemoryEngine:
                 tags=input_data.get('tags', [])
             )
             
+            # Skip embedding and summarization for near-duplicates
+            canonical_id = await self._check_near_duplicate(node)
+            if canonical_id:
+                logger.info(f"User input {input_id} is a near-duplicate of {canonical_id}")
+                return canonical_id
+            
             # Process content
             await self._process_node_content(node)
             
@@ -436,6 +1092,99 @@ class MemoryEngine:
             logger.error(f"Error processing user input: {e}")
             raise
     
+    def _dedup_namespace(self, node: MemoryNode) -> str:
+        """Scope duplicate matching to nodes of the same type and owner"""
+        return f"{node.type}:{node.metadata.get('user_id', '')}"
+    
+    def _register_fingerprint(self, node: MemoryNode):
+        """Add a node's SimHash fingerprint and MinHash signature to the near-duplicate indexes"""
+        namespace = self._dedup_namespace(node)
+        fingerprint = node.metadata.get('simhash')
+        if fingerprint is not None:
+            self.simhash_index.add(node.id, namespace, int(fingerprint, 16))
+        signature = node.metadata.get('minhash')
+        if signature is not None:
+            self.minhash_index.add(node.id, namespace, MinHashIndex.from_hex(signature))
+    
+    async def _check_near_duplicate(self, node: MemoryNode) -> Optional[str]:
+        """Fingerprint a new node and alias it to an existing near-duplicate.
+        
+        Texts shorter than dedup.minhash_max_tokens are matched on the
+        estimated Jaccard similarity of their MinHash signatures, longer ones
+        on SimHash Hamming distance. Signatures are also stored for texts up
+        to twice that length, so a short text still finds a slightly longer
+        original. Returns the canonical node ID when the node is a
+        near-duplicate, in which case it is not encoded, summarized or added
+        to the graph.
+        """
+        try:
+            if not self.dedup_enabled or not node.content:
+                return None
+            
+            tokens = SimHashIndex.tokenize(node.content)
+            if len(tokens) < self.dedup_min_tokens:
+                return None
+            
+            fingerprint = SimHashIndex.fingerprint(tokens)
+            node.metadata['simhash'] = f"{fingerprint:016x}"
+            signature = None
+            if len(tokens) < 2 * self.minhash_max_tokens:
+                signature = MinHashIndex.signature(tokens)
+                node.metadata['minhash'] = MinHashIndex.to_hex(signature)
+            
+            namespace = self._dedup_namespace(node)
+            with self.lock:
+                if len(tokens) < self.minhash_max_tokens:
+                    match = self.minhash_index.find(namespace, signature)
+                    if match is None:
+                        return None
+                    canonical_id, similarity = match
+                    match_metadata = {'jaccard_similarity': similarity}
+                else:
+                    match = self.simhash_index.find(namespace, fingerprint)
+                    if match is None:
+                        return None
+                    canonical_id, distance = match
+                    similarity = 1.0 - distance / SimHashIndex.FINGERPRINT_BITS
+                    match_metadata = {'hamming_distance': distance}
+                
+                if canonical_id != node.id:
+                    await self._record_duplicate(node, canonical_id, similarity, match_metadata)
+            
+            return canonical_id
+            
+        except Exception as e:
+            logger.error(f"Error checking near-duplicate: {e}")
+            return None
+    
+    async def _record_duplicate(self, node: MemoryNode, canonical_id: str, similarity: float,
+                                match_metadata: Dict[str, Any]):
+        """Record a near-duplicate as an alias of its canonical node"""
+        canonical = self.memory_nodes[canonical_id]
+        
+        self.node_aliases[node.id] = canonical_id
+        aliases = canonical.metadata.setdefault('aliases', [])
+        if node.id not in aliases:
+            aliases.append(node.id)
+        canonical.access_count += 1
+        canonical.last_accessed = datetime.now()
+        self.duplicates_skipped += 1
+        
+        relationship = MemoryRelationship(
+            id=f"{node.id}_{canonical_id}",
+            source_id=node.id,
+            target_id=canonical_id,
+            relationship_type='duplicate',
+            strength=similarity,
+            metadata={
+                **match_metadata,
+                'alias_metadata': {k: v for k, v in node.metadata.items() if k not in ('simhash', 'minhash')}
+            }
+        )
+        
+        await self._save_relationship_to_db(relationship)
+        await self._save_node_to_db(canonical)
+    
     async def _process_node_content(self, node: MemoryNode):
         """Process the content of a memory node"""
         try:
@@ -474,7 +1223,10 @@ class MemoryEngine:
                 
                 # Update embeddings index
                 if node.embeddings is not None:
-                    self.embeddings_index.add(node.embeddings.reshape(1, -1))
+                    self.vector_index.add(node.id, node.embeddings)
+                
+                # Update near-duplicate index
+                self._register_fingerprint(node)
                 
                 # Find relationships
                 await self._find_relationships(node)
@@ -492,15 +1244,16 @@ class MemoryEngine:
                     INSERT OR REPLACE INTO memory_nodes 
                     (id, type, content, metadata, embeddings, keywords, summary, 
                      confidence, created_at, updated_at, access_count, last_accessed, tags, relationships)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """), (
-                    node.id, node.type, node.content, json.dumps(node.metadata),
-                    node.embeddings.tobytes() if node.embeddings is not None else None,
-                    json.dumps(node.keywords), node.summary, node.confidence,
-                    node.created_at.isoformat(), node.updated_at.isoformat(),
-                    node.access_count, node.last_accessed.isoformat(),
-                    json.dumps(node.tags), json.dumps(node.relationships)
-                ))
+                    VALUES (:id, :type, :content, :metadata, :embeddings, :keywords, :summary,
+                            :confidence, :created_at, :updated_at, :access_count, :last_accessed, :tags, :relationships)
+                """), {
+                    'id': node.id, 'type': node.type, 'content': node.content, 'metadata': json.dumps(node.metadata),
+                    'embeddings': node.embeddings.tobytes() if node.embeddings is not None else None,
+                    'keywords': json.dumps(node.keywords), 'summary': node.summary, 'confidence': node.confidence,
+                    'created_at': node.created_at.isoformat(), 'updated_at': node.updated_at.isoformat(),
+                    'access_count': node.access_count, 'last_accessed': node.last_accessed.isoformat(),
+                    'tags': json.dumps(node.tags), 'relationships': json.dumps(node.relationships)
+                })
         except Exception as e:
             logger.error(f"Error saving node to database: {e}")
     
@@ -569,12 +1322,12 @@ class MemoryEngine:
                 self.db_session.execute(text("""
                     INSERT OR REPLACE INTO memory_relationships 
                     (id, source_id, target_id, relationship_type, strength, metadata, created_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """), (
-                    relationship.id, relationship.source_id, relationship.target_id,
-                    relationship.relationship_type, relationship.strength,
-                    json.dumps(relationship.metadata), relationship.created_at.isoformat()
-                ))
+                    VALUES (:id, :source_id, :target_id, :relationship_type, :strength, :metadata, :created_at)
+                """), {
+                    'id': relationship.id, 'source_id': relationship.source_id, 'target_id': relationship.target_id,
+                    'relationship_type': relationship.relationship_type, 'strength': relationship.strength,
+                    'metadata': json.dumps(relationship.metadata), 'created_at': relationship.created_at.isoformat()
+                })
         except Exception as e:
             logger.error(f"Error saving relationship to database: {e}")
     
@@ -585,14 +1338,12 @@ class MemoryEngine:
             query_embedding = self.model.encode(query)
             
             # Search in FAISS index
-            D, I = self.embeddings_index.search(query_embedding.reshape(1, -1), limit)
+            hits = self.vector_index.search(query_embedding, limit)
             
             results = []
-            for i, (distance, idx) in enumerate(zip(D[0], I[0])):
-                if idx < len(self.memory_nodes):
-                    node_id = list(self.memory_nodes.keys())[idx]
-                    node = self.memory_nodes[node_id]
-                    
+            for node_id, similarity in hits:
+                node = self.memory_nodes.get(node_id)
+                if node is not None:
                     # Apply filters
                     if filters and not self._apply_filters(node, filters):
                         continue
@@ -604,7 +1355,7 @@ class MemoryEngine:
                         'summary': node.summary,
                         'keywords': node.keywords,
                         'tags': node.tags,
-                        'similarity': float(distance),
+                        'similarity': similarity,
                         'metadata': node.metadata,
                         'created_at': node.created_at.isoformat()
                     })
@@ -619,9 +1370,102 @@ class MemoryEngine:
             logger.error(f"Error searching memory: {e}")
             return []
     
+    async def search_iter(self, query: Optional[str] = None, page_size: int = 10,
+                          cursor: Optional[str] = None, filters: Dict[str, Any] = None,
+                          limit: Optional[int] = None):
+        """Stream ranked search results, resumable from any hit's cursor.
+        
+        The query is encoded once per session; later pages extend the cached
+        ranking instead of re-encoding or recomputing earlier pages. Hits are
+        yielded as SearchHit objects whose content and metadata are looked up
+        only when accessed.
+        """
+        session_id, session, offset = await self._open_search_session(query, filters, cursor)
+        loop = asyncio.get_running_loop()
+        
+        yielded = 0
+        while limit is None or yielded < limit:
+            if offset >= len(session.hits):
+                if session.exhausted:
+                    break
+                await loop.run_in_executor(
+                    self.executor, self._extend_search_session, session, offset + page_size
+                )
+                if offset >= len(session.hits):
+                    break
+            
+            node_id, similarity = session.hits[offset]
+            offset += 1
+            session.last_used = time.time()
+            
+            node = self.memory_nodes.get(node_id)
+            if node is None:
+                continue
+            if session.filters and not self._apply_filters(node, session.filters):
+                continue
+            
+            yield SearchHit(
+                id=node_id,
+                similarity=similarity,
+                rank=offset - 1,
+                cursor=f"{session_id}:{offset}",
+                engine=self
+            )
+            yielded += 1
+    
+    async def _open_search_session(self, query: Optional[str], filters: Optional[Dict[str, Any]],
+                                   cursor: Optional[str]) -> Tuple[str, SearchSession, int]:
+        """Resume the session named by a cursor, or encode the query into a new one"""
+        self._prune_search_sessions()
+        
+        offset = 0
+        if cursor:
+            session_id, _, offset_str = cursor.rpartition(':')
+            offset = int(offset_str)
+            session = self.search_sessions.get(session_id)
+            if session is not None:
+                self.search_sessions.move_to_end(session_id)
+                return session_id, session, offset
+            if query is None:
+                raise ValueError(f"Search cursor {cursor} has expired")
+            logger.info("Search cursor expired, re-running query")
+        elif query is None:
+            raise ValueError("search_iter requires a query or a cursor")
+        
+        loop = asyncio.get_running_loop()
+        embedding = await loop.run_in_executor(self.executor, self.model.encode, query)
+        
+        session_id = uuid.uuid4().hex
+        session = SearchSession(query=query, embedding=embedding, filters=filters)
+        self.search_sessions[session_id] = session
+        return session_id, session, offset
+    
+    def _extend_search_session(self, session: SearchSession, count: int):
+        """Grow a session's ranking to at least count hits, appending only unseen nodes"""
+        k = max(count, 2 * len(session.hits))
+        hits = self.vector_index.search(session.embedding, k)
+        
+        for node_id, similarity in hits:
+            if node_id not in session.seen:
+                session.seen.add(node_id)
+                session.hits.append((node_id, similarity))
+        
+        if len(hits) < k:
+            session.exhausted = True
+    
+    def _prune_search_sessions(self):
+        """Drop expired and least recently used search sessions"""
+        cutoff = time.time() - self.search_session_ttl
+        for session_id in [sid for sid, s in self.search_sessions.items() if s.last_used < cutoff]:
+            del self.search_sessions[session_id]
+        
+        while len(self.search_sessions) > self.max_search_sessions:
+            self.search_sessions.popitem(last=False)
+    
     async def get_context(self, node_id: str, depth: int = 2) -> Dict[str, Any]:
         """Get context around a specific node"""
         try:
+            node_id = self.node_aliases.get(node_id, node_id)
             if node_id not in self.memory_nodes:
                 return {}
             
@@ -670,6 +1514,7 @@ class MemoryEngine:
     async def update_memory(self, node_id: str, updates: Dict[str, Any]):
         """Update a memory node"""
         try:
+            node_id = self.node_aliases.get(node_id, node_id)
             if node_id not in self.memory_nodes:
                 raise ValueError(f"Node {node_id} not found")
             
@@ -703,12 +1548,20 @@ class MemoryEngine:
             # Remove from in-memory storage
             del self.memory_nodes[node_id]
             self.knowledge_graph.remove_node(node_id)
+            self.simhash_index.remove(node_id)
+            self.minhash_index.remove(node_id)
+            if self.vector_index is not None:
+                self.vector_index.remove(node_id)
+            self.node_aliases = {
+                alias_id: canonical_id for alias_id, canonical_id in self.node_aliases.items()
+                if canonical_id != node_id
+            }
             
             # Remove from database
             with self.db_session.begin():
-                self.db_session.execute(text("DELETE FROM memory_nodes WHERE id = ?"), (node_id,))
-                self.db_session.execute(text("DELETE FROM memory_relationships WHERE source_id = ? OR target_id = ?"), 
-                                      (node_id, node_id))
+                self.db_session.execute(text("DELETE FROM memory_nodes WHERE id = :id"), {'id': node_id})
+                self.db_session.execute(text("DELETE FROM memory_relationships WHERE source_id = :id OR target_id = :id"),
+                                      {'id': node_id})
             
             # Remove from search index
             if self.es_client:
@@ -899,7 +1752,12 @@ class MemoryEngine:
                 'total_nodes': len(self.memory_nodes),
                 'total_relationships': self.knowledge_graph.number_of_edges(),
                 'nodes_by_type': self._count_nodes_by_type(),
-                'embeddings_index_size': self.embeddings_index.ntotal if self.embeddings_index else 0,
+                'embeddings_index_size': self.vector_index.get_stats()['live_vectors'] if self.vector_index else 0,
+                'vector_index': self.vector_index.get_stats() if self.vector_index else {},
+                'fingerprint_index_size': len(self.simhash_index),
+                'minhash_index_size': len(self.minhash_index),
+                'duplicates_skipped': self.duplicates_skipped,
+                'active_search_sessions': len(self.search_sessions),
                 'memory_usage_mb': psutil.Process().memory_info().rss / 1024 / 1024,
                 'last_updated': datetime.now().isoformat()
             }
@@ -907,6 +1765,14 @@ class MemoryEngine:
             logger.error(f"Error getting stats: {e}")
             return {}
     
+    def evaluate_vector_index(self) -> Dict[str, Any]:
+        """Measure recall@k versus latency of the active vector index"""
+        try:
+            return self.vector_index.evaluate() if self.vector_index else {}
+        except Exception as e:
+            logger.error(f"Error evaluating vector index: {e}")
+            return {}
+    
     def _count_nodes_by_type(self) -> Dict[str, int]:
         """Count nodes by type"""
         counts = {}
@@ -969,6 +1835,10 @@ class MemoryEngine:
             if self.es_client:
                 self.es_client.close()
             
+            # Wait for background index rebuilds
+            if self.vector_index:
+                self.vector_index.shutdown()
+            
             # Shutdown executor
             self.executor.shutdown(wait=True)
             
@@ -5,15 +5,22 @@
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
-from torch.nn import TransformerEncoder, TransformerEncoderLayer
 from transformers import AutoTokenizer, AutoModel
 import numpy as np
 from typing import Dict, List, Optional, Tuple, Any
 import json
 import os
-from dataclasses import dataclass
+import re
+import logging
+from collections import Counter, defaultdict, OrderedDict, deque
+from itertools import islice
+from dataclasses import dataclass, replace
 from abc import ABC, abstractmethod
 import time
+import sqlite3
+import threading
+
+from sampling import build_logits_processors, sample_next_tokens, beam_search
 
 # =============================================================================
 # Configuration
@@ -52,6 +59,10 @@ class ModelConfig:
     memory_size: int = 1000
     context_window: int = 4096
     max_conversation_length: int = 100
+    max_memory_users: int = 10000
+    memory_db_path: Optional[str] = None  # SQLite file for long-term history
+    context_recent_turns: int = 4  # Turns kept verbatim; older turns are summarized
+    context_summary_words: int = 32
     
     # Special tokens
     pad_token_id: int = 0
@@ -59,6 +70,17 @@ class ModelConfig:
     eos_token_id: int = 2
     unk_token_id: int = 3
     
+    # Inference
+    quantize: Optional[str] = None  # "int8" for CPU dynamic quantization
+    compile_inference: bool = False  # torch.compile the decode step at startup
+    compile_warmup_lengths: Tuple[int, ...] = (16, 128, 512)
+    
+    # Speculative decoding
+    num_draft_tokens: int = 4
+    draft_num_layers: int = 2
+    draft_hidden_size: int = 256
+    draft_model_path: str = "./checkpoints/steward-v5-draft.pt"
+    
     # Model paths
     model_path: str = "./checkpoints/steward-v5.pt"
     config_path: str = "./config/model_config.json"
@@ -69,6 +91,23 @@ class ModelConfig:
         with open(path, 'w') as f:
             json.dump(self.__dict__, f, indent=2)
     
+    def draft_config(self, num_layers: Optional[int] = None, hidden_size: Optional[int] = None) -> 'ModelConfig':
+        """Reduced configuration for a speculative-decoding draft model.
+        
+        The vocabulary, special tokens and tokenizer stay the same so draft
+        and main model agree on token IDs.
+        """
+        hidden_size = hidden_size or self.draft_hidden_size
+        return replace(
+            self,
+            num_layers=num_layers or self.draft_num_layers,
+            hidden_size=hidden_size,
+            num_attention_heads=max(hidden_size // 64, 1),
+            intermediate_size=hidden_size * 4,
+            model_path=self.draft_model_path,
+            quantize=None
+        )
+    
     @classmethod
     def load(cls, path: str) -> 'ModelConfig':
         """Load configuration from file."""
@@ -87,6 +126,7 @@ class BaseModel(ABC, nn.Module):
         super().__init__()
         self.config = config
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+        self.quantized: Optional[str] = None
         
     @abstractmethod
     def forward(self, input_ids: torch.Tensor, attention_mask: Optional[torch.Tensor] = None) -> torch.Tensor:
@@ -103,12 +143,214 @@ class BaseModel(ABC, nn.Module):
         torch.save(self.state_dict(), path)
         self.config.save(path.replace('.pt', '_config.json'))
     
-    def load_model(self, path: str):
-        """Load model weights."""
-        self.load_state_dict(torch.load(path, map_location=self.device))
+    def load_model(self, path: str, quantize: Optional[str] = None):
+        """Load model weights, optionally quantizing them after loading.
+        
+        Checkpoints saved from a quantized model are loaded directly into a
+        quantized copy of the architecture.
+        """
         config_path = path.replace('.pt', '_config.json')
-        if os.path.exists(config_path):
-            self.config = ModelConfig.load(config_path)
+        saved_config = ModelConfig.load(config_path) if os.path.exists(config_path) else None
+        
+        if saved_config is not None and saved_config.quantize and not self.quantized:
+            self.quantize(saved_config.quantize)
+        self.load_state_dict(torch.load(path, map_location=self.device))
+        if saved_config is not None:
+            saved_config.quantize = self.quantized
+            self.config = saved_config
+        
+        if quantize and not self.quantized:
+            self.quantize(quantize)
+    
+    def quantize(self, mode: str = 'int8') -> 'BaseModel':
+        """Convert the model in place for quantized CPU inference."""
+        if self.quantized:
+            raise ValueError(f"Model is already quantized ({self.quantized})")
+        quantize_dynamic_model(self, mode)
+        if getattr(self, 'compiled_decode_step', None) is not None:
+            # The compiled graph captured the float modules
+            self.compiled_decode_step = None
+            self.compile_stats = {'mode': 'eager'}
+        self.quantized = mode
+        self.config.quantize = mode
+        self.device = torch.device('cpu')
+        return self
+
+# =============================================================================
+# Quantization
+# =============================================================================
+
+def quantize_dynamic_model(model: nn.Module, mode: str = 'int8') -> nn.Module:
+    """Apply CPU dynamic quantization to a model in place.
+    
+    Linear layers (including the attention projections) get int8 weights
+    with activations quantized on the fly; embeddings get weight-only int8.
+    Quantized kernels only run on CPU, so the model is moved there first.
+    """
+    if mode != 'int8':
+        raise ValueError(f"Unsupported quantization mode: {mode}")
+    
+    from torch.ao.quantization import (
+        quantize_dynamic, default_dynamic_qconfig, float_qparams_weight_only_qconfig
+    )
+    
+    model.to(torch.device('cpu'))
+    model.eval()
+    for module in model.modules():
+        if isinstance(module, CausalSelfAttention):
+            module.split_in_proj()
+    
+    return quantize_dynamic(
+        model,
+        {nn.Linear: default_dynamic_qconfig, nn.Embedding: float_qparams_weight_only_qconfig},
+        inplace=True
+    )
+
+# =============================================================================
+# Causal Decoder
+# =============================================================================
+
+# Per-layer (key, value) tensors of shape (batch, heads, seq, head_dim)
+KVCache = List[Tuple[torch.Tensor, torch.Tensor]]
+
+class CausalSelfAttention(nn.Module):
+    """Multi-head causal self-attention with an optional key/value cache.
+    
+    Parameter names match nn.MultiheadAttention so checkpoints trained with
+    the previous TransformerEncoder stack load unchanged.
+    """
+    
+    def __init__(self, config: ModelConfig):
+        super().__init__()
+        self.hidden_size = config.hidden_size
+        self.num_heads = config.num_attention_heads
+        self.head_dim = config.hidden_size // config.num_attention_heads
+        self.dropout = config.dropout
+        
+        self.in_proj_weight = nn.Parameter(torch.empty(3 * config.hidden_size, config.hidden_size))
+        self.in_proj_bias = nn.Parameter(torch.zeros(3 * config.hidden_size))
+        self.out_proj = nn.Linear(config.hidden_size, config.hidden_size)
+        self.in_proj: Optional[nn.Module] = None
+        nn.init.xavier_uniform_(self.in_proj_weight)
+    
+    def split_in_proj(self):
+        """Move the packed QKV weights into an nn.Linear so it can be quantized."""
+        if self.in_proj is not None:
+            return
+        in_proj = nn.Linear(self.hidden_size, 3 * self.hidden_size).to(self.in_proj_weight.device)
+        with torch.no_grad():
+            in_proj.weight.copy_(self.in_proj_weight)
+            in_proj.bias.copy_(self.in_proj_bias)
+        del self.in_proj_weight
+        del self.in_proj_bias
+        self.in_proj = in_proj
+    
+    def forward(self, x: torch.Tensor, attn_mask: Optional[torch.Tensor] = None, is_causal: bool = False,
+                past_key_value: Optional[Tuple[torch.Tensor, torch.Tensor]] = None,
+                use_cache: bool = False) -> Tuple[torch.Tensor, Optional[Tuple[torch.Tensor, torch.Tensor]]]:
+        """Attend from the new positions in x to cached and new keys."""
+        batch_size, seq_length, _ = x.shape
+        
+        if self.in_proj is not None:
+            qkv = self.in_proj(x)
+        else:
+            qkv = F.linear(x, self.in_proj_weight, self.in_proj_bias)
+        query, key, value = qkv.chunk(3, dim=-1)
+        query = query.view(batch_size, seq_length, self.num_heads, self.head_dim).transpose(1, 2)
+        key = key.view(batch_size, seq_length, self.num_heads, self.head_dim).transpose(1, 2)
+        value = value.view(batch_size, seq_length, self.num_heads, self.head_dim).transpose(1, 2)
+        
+        if past_key_value is not None:
+            key = torch.cat([past_key_value[0], key], dim=2)
+            value = torch.cat([past_key_value[1], value], dim=2)
+        present = (key, value) if use_cache else None
+        
+        attn_output = F.scaled_dot_product_attention(
+            query, key, value,
+            attn_mask=attn_mask,
+            dropout_p=self.dropout if self.training else 0.0,
+            is_causal=is_causal
+        )
+        attn_output = attn_output.transpose(1, 2).reshape(batch_size, seq_length, self.hidden_size)
+        
+        return self.out_proj(attn_output), present
+
+class DecoderLayer(nn.Module):
+    """Post-norm decoder layer laid out like nn.TransformerEncoderLayer."""
+    
+    def __init__(self, config: ModelConfig):
+        super().__init__()
+        self.self_attn = CausalSelfAttention(config)
+        self.linear1 = nn.Linear(config.hidden_size, config.intermediate_size)
+        self.dropout = nn.Dropout(config.dropout)
+        self.linear2 = nn.Linear(config.intermediate_size, config.hidden_size)
+        self.norm1 = nn.LayerNorm(config.hidden_size, eps=config.layer_norm_epsilon)
+        self.norm2 = nn.LayerNorm(config.hidden_size, eps=config.layer_norm_epsilon)
+        self.dropout1 = nn.Dropout(config.dropout)
+        self.dropout2 = nn.Dropout(config.dropout)
+    
+    def forward(self, x: torch.Tensor, attn_mask: Optional[torch.Tensor] = None, is_causal: bool = False,
+                past_key_value: Optional[Tuple[torch.Tensor, torch.Tensor]] = None,
+                use_cache: bool = False) -> Tuple[torch.Tensor, Optional[Tuple[torch.Tensor, torch.Tensor]]]:
+        attn_output, present = self.self_attn(x, attn_mask, is_causal, past_key_value, use_cache)
+        x = self.norm1(x + self.dropout1(attn_output))
+        ff_output = self.linear2(self.dropout(F.gelu(self.linear1(x))))
+        x = self.norm2(x + self.dropout2(ff_output))
+        return x, present
+
+class CausalDecoder(nn.Module):
+    """Stack of decoder layers with a final layer norm."""
+    
+    def __init__(self, config: ModelConfig):
+        super().__init__()
+        self.layers = nn.ModuleList([DecoderLayer(config) for _ in range(config.num_layers)])
+        self.norm = nn.LayerNorm(config.hidden_size, eps=config.layer_norm_epsilon)
+    
+    @staticmethod
+    def build_attention_mask(batch_size: int, query_length: int, past_length: int,
+                             attention_mask: Optional[torch.Tensor],
+                             device: torch.device) -> Tuple[Optional[torch.Tensor], bool]:
+        """Combine causal and key-padding masks into a boolean SDPA mask.
+        
+        Returns (mask, is_causal); the mask is omitted when the fused causal
+        kernel or no masking at all is sufficient.
+        """
+        if attention_mask is None:
+            if query_length == 1:
+                return None, False
+            if past_length == 0:
+                return None, True
+        
+        total_length = past_length + query_length
+        key_positions = torch.arange(total_length, device=device).unsqueeze(0)
+        query_positions = torch.arange(past_length, total_length, device=device).unsqueeze(1)
+        mask = (key_positions <= query_positions).view(1, 1, query_length, total_length)
+        
+        if attention_mask is not None:
+            mask = mask & attention_mask.bool().view(batch_size, 1, 1, total_length)
+            # Padding queries keep their own position so no row is fully masked
+            mask = mask | (key_positions == query_positions).view(1, 1, query_length, total_length)
+        
+        return mask, False
+    
+    def forward(self, x: torch.Tensor, attention_mask: Optional[torch.Tensor] = None,
+                past_key_values: Optional[KVCache] = None,
+                use_cache: bool = False) -> Tuple[torch.Tensor, Optional[KVCache]]:
+        """Run the stack; attention_mask covers cached and new positions."""
+        batch_size, query_length, _ = x.shape
+        past_length = past_key_values[0][0].size(2) if past_key_values is not None else 0
+        attn_mask, is_causal = self.build_attention_mask(
+            batch_size, query_length, past_length, attention_mask, x.device
+        )
+        
+        presents = [] if use_cache else None
+        for i, layer in enumerate(self.layers):
+            past = past_key_values[i] if past_key_values is not None else None
+            x, present = layer(x, attn_mask, is_causal, past, use_cache)
+            if use_cache:
+                presents.append(present)
+        
+        return self.norm(x), presents
 
 # =============================================================================
 # Transformer Architecture
@@ -128,25 +370,18 @@ class CareConnectTransformer(BaseModel):
         self.dropout = nn.Dropout(config.dropout)
         
         # Transformer layers
-        encoder_layer = TransformerEncoderLayer(
-            d_model=config.hidden_size,
-            nhead=config.num_attention_heads,
-            dim_feedforward=config.intermediate_size,
-            dropout=config.dropout,
-            activation='gelu',
-            layer_norm_eps=config.layer_norm_epsilon,
-            batch_first=True
-        )
-        
-        self.transformer = TransformerEncoder(
-            encoder_layer,
-            num_layers=config.num_layers,
-            norm=nn.LayerNorm(config.hidden_size, eps=config.layer_norm_epsilon)
-        )
+        self.transformer = CausalDecoder(config)
         
         # Output projection
         self.output_projection = nn.Linear(config.hidden_size, config.vocab_size, bias=False)
         
+        # Speculative decoding counters
+        self.speculative_stats = {'rounds': 0, 'proposed': 0, 'accepted': 0}
+        
+        # Compiled decode step, set by compile_for_inference
+        self.compiled_decode_step = None
+        self.compile_stats: Dict[str, Any] = {'mode': 'eager'}
+        
         # Initialize weights
         self.apply(self._init_weights)
         
@@ -162,13 +397,17 @@ class CareConnectTransformer(BaseModel):
             torch.nn.init.zeros_(module.bias)
             torch.nn.init.ones_(module.weight)
     
-    def forward(self, input_ids: torch.Tensor, attention_mask: Optional[torch.Tensor] = None) -> torch.Tensor:
-        """Forward pass through the transformer."""
+    def _decode(self, input_ids: torch.Tensor, attention_mask: Optional[torch.Tensor] = None,
+                past_key_values: Optional[KVCache] = None, position_ids: Optional[torch.Tensor] = None,
+                use_cache: bool = False) -> Tuple[torch.Tensor, Optional[KVCache]]:
+        """Embed new tokens and run them through the decoder stack."""
         batch_size, seq_length = input_ids.shape
+        past_length = past_key_values[0][0].size(2) if past_key_values is not None else 0
         
         # Create position indices
-        position_ids = torch.arange(seq_length, dtype=torch.long, device=input_ids.device)
-        position_ids = position_ids.unsqueeze(0).expand(batch_size, -1)
+        if position_ids is None:
+            position_ids = torch.arange(past_length, past_length + seq_length, dtype=torch.long, device=input_ids.device)
+            position_ids = position_ids.unsqueeze(0).repeat(batch_size, 1)
         
         # Get embeddings
         token_embeddings = self.token_embedding(input_ids)
@@ -178,69 +417,424 @@ class CareConnectTransformer(BaseModel):
         embeddings = token_embeddings + position_embeddings
         embeddings = self.dropout(embeddings)
         
-        # Create attention mask if not provided
-        if attention_mask is None:
-            attention_mask = torch.ones_like(input_ids)
-        
-        # Convert attention mask to transformer format
-        attention_mask = attention_mask.unsqueeze(1).unsqueeze(2)
-        attention_mask = (1.0 - attention_mask) * -10000.0
-        
-        # Pass through transformer
-        hidden_states = self.transformer(embeddings, src_key_padding_mask=attention_mask.squeeze(1))
+        return self.transformer(embeddings, attention_mask, past_key_values, use_cache)
+    
+    def forward(self, input_ids: torch.Tensor, attention_mask: Optional[torch.Tensor] = None) -> torch.Tensor:
+        """Forward pass through the transformer."""
+        hidden_states, _ = self._decode(input_ids, attention_mask)
         
         # Project to vocabulary
         logits = self.output_projection(hidden_states)
         
         return logits
     
-    def generate(self, prompt: str, max_length: int = 100, **kwargs) -> str:
-        """Generate text from a prompt."""
-        # This is a simplified generation method
-        # In production, you would implement more sophisticated generation logic
+    def decode_step(self, input_ids: torch.Tensor, past_key_values: Optional[KVCache] = None,
+                    attention_mask: Optional[torch.Tensor] = None,
+                    position_ids: Optional[torch.Tensor] = None) -> Tuple[torch.Tensor, KVCache]:
+        """Run new tokens against the key/value cache.
         
-        # Tokenize prompt
-        tokenizer = self._get_tokenizer()
-        input_ids = tokenizer.encode(prompt, return_tensors='pt').to(self.device)
+        Only the last position is projected to the vocabulary, so the
+        returned logits have shape (batch, vocab_size). Uses the compiled
+        graph after compile_for_inference.
+        """
+        if self.compiled_decode_step is not None and not self.training:
+            return self.compiled_decode_step(input_ids, past_key_values, attention_mask, position_ids)
+        return self._decode_step_eager(input_ids, past_key_values, attention_mask, position_ids)
+    
+    def _decode_step_eager(self, input_ids: torch.Tensor, past_key_values: Optional[KVCache] = None,
+                           attention_mask: Optional[torch.Tensor] = None,
+                           position_ids: Optional[torch.Tensor] = None) -> Tuple[torch.Tensor, KVCache]:
+        """Uncompiled decode_step."""
+        hidden_states, presents = self._decode(
+            input_ids, attention_mask, past_key_values, position_ids, use_cache=True
+        )
+        logits = self.output_projection(hidden_states[:, -1, :])
+        return logits, presents
+    
+    def compile_for_inference(self, warmup_lengths: Optional[List[int]] = None, backend: str = 'inductor') -> bool:
+        """Compile the prefill and single-token decode step and warm it up.
+        
+        The model is frozen (eval mode, no gradients) and decode_step is
+        compiled with dynamic shapes. Warmup runs a prefill per length in
+        warmup_lengths followed by cached single-token steps, for both the
+        single-prompt and the padded batch call signatures, so compilation
+        happens at startup instead of on the first request. Returns False
+        and stays in eager mode if torch.compile is unavailable or fails.
+        """
+        self.eval()
+        for param in self.parameters():
+            param.requires_grad_(False)
+        warmup_lengths = list(warmup_lengths or self.config.compile_warmup_lengths)
+        
+        if not hasattr(torch, 'compile'):
+            logging.warning("torch.compile is not available; using eager decoding")
+            return False
+        
+        start_time = time.perf_counter()
+        try:
+            self.compiled_decode_step = torch.compile(self._decode_step_eager, dynamic=True, backend=backend)
+            self._warmup_decode(warmup_lengths)
+        except Exception as e:
+            logging.warning(f"Compilation failed, falling back to eager decoding: {e}")
+            self.compiled_decode_step = None
+            self.compile_stats = {'mode': 'eager', 'error': str(e)}
+            return False
+        
+        self.compile_stats = {
+            'mode': f"compiled ({backend})",
+            'warmup_lengths': warmup_lengths,
+            'warmup_seconds': time.perf_counter() - start_time
+        }
+        logging.info(f"Decode step compiled in {self.compile_stats['warmup_seconds']:.1f}s")
+        return True
+    
+    def _warmup_decode(self, lengths: List[int], decode_steps: int = 2):
+        """Run representative prefill and decode shapes through decode_step."""
+        max_length = self.config.max_position_embeddings - decode_steps - 1
+        with torch.no_grad():
+            for length in lengths:
+                length = max(min(length, max_length), 1)
+                input_ids = torch.randint(4, self.config.vocab_size, (1, length), device=self.device)
+                logits, past_key_values = self.decode_step(input_ids)
+                for _ in range(decode_steps):
+                    logits, past_key_values = self.decode_step(logits.argmax(dim=-1, keepdim=True), past_key_values)
+                
+                # Batched path: left padding mask and explicit positions
+                input_ids = input_ids.repeat(2, 1)
+                attention_mask = torch.ones_like(input_ids)
+                attention_mask[1, 0] = 0
+                position_ids = (attention_mask.cumsum(dim=-1) - 1).clamp(min=0)
+                logits, past_key_values = self.decode_step(
+                    input_ids, attention_mask=attention_mask, position_ids=position_ids
+                )
+                for _ in range(decode_steps):
+                    attention_mask = torch.cat([attention_mask, attention_mask.new_ones((2, 1))], dim=1)
+                    position_ids = position_ids[:, -1:] + 1
+                    logits, past_key_values = self.decode_step(
+                        logits.argmax(dim=-1, keepdim=True), past_key_values,
+                        attention_mask=attention_mask, position_ids=position_ids
+                    )
+    
+    def _next_token_probs(self, logits: torch.Tensor, temperatures: torch.Tensor,
+                          top_ks: torch.Tensor, top_ps: Optional[torch.Tensor] = None) -> torch.Tensor:
+        """Sampling distribution for each row of (batch, vocab_size) logits.
+        
+        temperatures, top_ks and top_ps hold one value per row; a temperature
+        of 0 gives a one-hot greedy distribution, a top_k of 0 and a top_p of
+        1 disable filtering. The logits are edited in place.
+        """
+        greedy = temperatures <= 0
+        logits = build_logits_processors(temperatures, top_ks, top_ps)(logits)
+        
+        probs = F.softmax(logits, dim=-1)
+        if greedy.any():
+            one_hot = F.one_hot(logits.argmax(dim=-1), logits.size(-1)).to(probs.dtype)
+            probs = torch.where(greedy.unsqueeze(1), one_hot, probs)
+        return probs
+    
+    def generate_ids(self, input_ids: torch.Tensor, max_new_tokens: int = 100,
+                     temperature: Optional[float] = None, top_k: Optional[int] = None,
+                     top_p: Optional[float] = None, repetition_penalty: float = 1.0,
+                     no_repeat_ngram_size: int = 0, num_beams: int = 1,
+                     length_penalty: float = 1.0, early_stopping: bool = True,
+                     use_cache: bool = True, stop_at_eos: bool = True,
+                     draft_model: Optional['CareConnectTransformer'] = None,
+                     num_draft_tokens: Optional[int] = None) -> torch.Tensor:
+        """Generate continuation token IDs for a (1, seq) prompt.
+        
+        With use_cache the prompt is prefilled once and each step feeds only
+        the newest token through the decoder; without it the whole sequence
+        is recomputed every step (kept for benchmarking). num_beams > 1
+        switches to beam search, and passing a draft_model switches to
+        speculative decoding.
+        """
+        temperature = temperature if temperature is not None else self.config.temperature
+        top_k = top_k if top_k is not None else self.config.top_k
+        top_p = top_p if top_p is not None else self.config.top_p
+        temperatures = torch.tensor([temperature], dtype=torch.float, device=input_ids.device)
+        top_ks = torch.tensor([top_k], dtype=torch.long, device=input_ids.device)
+        top_ps = torch.tensor([top_p], dtype=torch.float, device=input_ids.device)
+        
+        if input_ids.size(1) == 0:
+            input_ids = torch.full((1, 1), self.config.bos_token_id, dtype=torch.long, device=self.device)
+        
+        # Keep prompt and continuation inside the position table
+        max_positions = self.config.max_position_embeddings
+        input_ids = input_ids[:, -(max_positions - 1):]
+        max_new_tokens = min(max_new_tokens, max_positions - input_ids.size(1))
+        
+        if num_beams > 1:
+            with torch.no_grad():
+                return beam_search(
+                    self.decode_step, input_ids, num_beams, max_new_tokens, self.config.eos_token_id,
+                    processors=build_logits_processors(
+                        repetition_penalty=repetition_penalty, no_repeat_ngram_size=no_repeat_ngram_size
+                    ),
+                    length_penalty=length_penalty, early_stopping=early_stopping
+                )
+        
+        processors = build_logits_processors(temperatures, top_ks, top_ps, repetition_penalty, no_repeat_ngram_size)
+        greedy = temperatures <= 0
+        
+        if draft_model is not None:
+            return self._generate_speculative(
+                input_ids, draft_model, max_new_tokens, temperatures, top_ks, top_ps,
+                num_draft_tokens or self.config.num_draft_tokens, stop_at_eos,
+                repetition_penalty, no_repeat_ngram_size
+            )
         
-        # Generate tokens
         with torch.no_grad():
-            for _ in range(max_length):
-                # Get model predictions
-                outputs = self.forward(input_ids)
-                next_token_logits = outputs[0, -1, :]
+            processors.start(input_ids)
+            if use_cache:
+                logits, past_key_values = self.decode_step(input_ids)
+            
+            for _ in range(max_new_tokens):
+                if not use_cache:
+                    logits = self.forward(input_ids)[:, -1, :]
                 
-                # Apply temperature and top-k sampling
-                temperature = kwargs.get('temperature', self.config.temperature)
-                top_k = kwargs.get('top_k', self.config.top_k)
+                next_token = sample_next_tokens(processors(logits), greedy)
+                input_ids = torch.cat([input_ids, next_token], dim=1)
                 
-                next_token_logits = next_token_logits / temperature
+                # Check for end of sequence
+                if stop_at_eos and next_token.item() == self.config.eos_token_id:
+                    break
+                
+                processors.update(next_token)
+                if use_cache:
+                    logits, past_key_values = self.decode_step(next_token, past_key_values)
+        
+        return input_ids
+    
+    def _generate_speculative(self, input_ids: torch.Tensor, draft_model: 'CareConnectTransformer',
+                              max_new_tokens: int, temperatures: torch.Tensor, top_ks: torch.Tensor,
+                              top_ps: torch.Tensor, num_draft_tokens: int, stop_at_eos: bool,
+                              repetition_penalty: float = 1.0, no_repeat_ngram_size: int = 0) -> torch.Tensor:
+        """Speculative decoding: the draft proposes, this model verifies.
+        
+        Each round the draft samples up to num_draft_tokens tokens from its
+        own distribution q, then one forward pass of this model scores all of
+        them at once to get p. Token i is kept with probability
+        min(1, p/q); the first rejected token is resampled from
+        max(0, p - q) and, if all are kept, one extra token is drawn from p.
+        The output is therefore distributed exactly as plain sampling from
+        this model. Both caches are cropped back to the accepted prefix.
+        
+        The repetition and n-gram penalties are applied to q and p alike:
+        the draft's logits see the history including its earlier proposals,
+        and the verified logits are replayed through the same processors
+        position by position, so p matches what plain penalized sampling
+        would use at each step.
+        """
+        if draft_model.config.vocab_size != self.config.vocab_size:
+            raise ValueError("Draft model must share the main model's vocabulary")
+        
+        max_positions = min(self.config.max_position_embeddings, draft_model.config.max_position_embeddings)
+        target_cache, draft_cache = None, None
+        target_length, draft_length = 0, 0
+        generated = 0
+        stats = self.speculative_stats
+        penalties = build_logits_processors(repetition_penalty=repetition_penalty,
+                                            no_repeat_ngram_size=no_repeat_ngram_size)
+        
+        with torch.no_grad():
+            while generated < max_new_tokens:
+                prefix_length = input_ids.size(1)
+                num_proposals = max(min(num_draft_tokens, max_new_tokens - generated - 1,
+                                        max_positions - prefix_length - 1), 0)
                 
-                if top_k > 0:
-                    top_k_logits, top_k_indices = torch.topk(next_token_logits, top_k)
-                    next_token_logits = torch.full_like(next_token_logits, float('-inf'))
-                    next_token_logits[top_k_indices] = top_k_logits
+                # Draft proposes tokens one at a time against its own cache
+                proposals, draft_probs = [], []
+                draft_input = input_ids[:, draft_length:]
+                penalties.start(input_ids)
+                for _ in range(num_proposals):
+                    logits, draft_cache = draft_model.decode_step(draft_input, draft_cache)
+                    probs = draft_model._next_token_probs(penalties(logits), temperatures, top_ks, top_ps)
+                    draft_input = torch.multinomial(probs, num_samples=1)
+                    penalties.update(draft_input)
+                    proposals.append(draft_input)
+                    draft_probs.append(probs[0])
                 
-                # Sample next token
-                probs = F.softmax(next_token_logits, dim=-1)
-                next_token = torch.multinomial(probs, num_samples=1)
+                # One forward pass scores every proposal plus the token after them
+                verify_input = torch.cat([input_ids[:, target_length:]] + proposals, dim=1)
+                hidden_states, target_cache = self._decode(verify_input, past_key_values=target_cache, use_cache=True)
+                logits = self.output_projection(hidden_states[0, -(num_proposals + 1):, :])
+                if penalties:
+                    # Position i is penalized against the prefix plus proposals[:i]
+                    penalties.start(input_ids)
+                    for i in range(num_proposals + 1):
+                        penalties(logits[i:i + 1])
+                        if i < num_proposals:
+                            penalties.update(proposals[i])
+                target_probs = self._next_token_probs(
+                    logits, temperatures.expand(num_proposals + 1), top_ks.expand(num_proposals + 1),
+                    top_ps.expand(num_proposals + 1)
+                )
                 
-                # Append to input
-                input_ids = torch.cat([input_ids, next_token.unsqueeze(0)], dim=1)
+                new_tokens = []
+                for i, proposal in enumerate(proposals):
+                    token = proposal.item()
+                    if torch.rand(()) * draft_probs[i][token] < target_probs[i, token]:
+                        new_tokens.append(token)
+                        continue
+                    residual = (target_probs[i] - draft_probs[i]).clamp(min=0)
+                    if residual.sum() <= 0:
+                        residual = target_probs[i]
+                    new_tokens.append(torch.multinomial(residual, num_samples=1).item())
+                    break
+                else:
+                    new_tokens.append(torch.multinomial(target_probs[num_proposals], num_samples=1).item())
+                accepted = len(new_tokens) - 1
                 
-                # Check for end of sequence
-                if next_token.item() == self.config.eos_token_id:
+                stats['rounds'] += 1
+                stats['proposed'] += num_proposals
+                stats['accepted'] += accepted
+                
+                if stop_at_eos and self.config.eos_token_id in new_tokens:
+                    new_tokens = new_tokens[:new_tokens.index(self.config.eos_token_id) + 1]
+                input_ids = torch.cat([input_ids, input_ids.new_tensor([new_tokens])], dim=1)
+                generated += len(new_tokens)
+                if stop_at_eos and new_tokens[-1] == self.config.eos_token_id:
+                    break
+                
+                # Keep only cache entries for the accepted prefix; the newest
+                # token is fed at the start of the next round
+                target_length = input_ids.size(1) - 1
+                target_cache = [(key[:, :, :target_length], value[:, :, :target_length]) for key, value in target_cache]
+                if num_proposals:
+                    draft_length = prefix_length + min(accepted, num_proposals - 1)
+                    draft_cache = [(key[:, :, :draft_length], value[:, :, :draft_length]) for key, value in draft_cache]
+        
+        return input_ids
+    
+    def get_speculative_stats(self) -> Dict[str, Any]:
+        """Draft proposal counts and acceptance rate since the model was created."""
+        stats = dict(self.speculative_stats)
+        stats['acceptance_rate'] = stats['accepted'] / stats['proposed'] if stats['proposed'] else 0.0
+        stats['tokens_per_round'] = (stats['accepted'] + stats['rounds']) / stats['rounds'] if stats['rounds'] else 0.0
+        return stats
+    
+    def generate_ids_batch(self, prompts: List[List[int]], max_new_tokens: List[int],
+                           temperatures: List[float], top_ks: List[int],
+                           top_ps: Optional[List[float]] = None, repetition_penalty: float = 1.0,
+                           no_repeat_ngram_size: int = 0, stop_at_eos: bool = True) -> List[List[int]]:
+        """Sample continuations for several prompts in one batch.
+        
+        Prompts are left-padded so every row's newest token sits in the last
+        column. Rows that emit EOS or reach their own token limit are dropped
+        from the batch (and from the key/value cache), so finished rows stop
+        costing compute; the logits processors drop the same rows. Returns
+        the generated token IDs for each prompt.
+        """
+        device = self.device
+        max_positions = self.config.max_position_embeddings
+        
+        prompts = [list(ids[-(max_positions - 1):]) or [self.config.bos_token_id] for ids in prompts]
+        limits = [min(limit, max_positions - len(ids)) for ids, limit in zip(prompts, max_new_tokens)]
+        outputs: List[List[int]] = [[] for _ in prompts]
+        
+        # Left-pad prompts and build masks and position IDs
+        max_prompt_length = max(len(ids) for ids in prompts)
+        input_ids = torch.full((len(prompts), max_prompt_length), self.config.pad_token_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(prompts), max_prompt_length), dtype=torch.long)
+        for row, ids in enumerate(prompts):
+            input_ids[row, max_prompt_length - len(ids):] = torch.tensor(ids, dtype=torch.long)
+            attention_mask[row, max_prompt_length - len(ids):] = 1
+        input_ids = input_ids.to(device)
+        attention_mask = attention_mask.to(device)
+        position_ids = (attention_mask.cumsum(dim=-1) - 1).clamp(min=0)
+        
+        active = torch.arange(len(prompts), device=device)
+        row_temperatures = torch.tensor(temperatures, dtype=torch.float, device=device)
+        processors = build_logits_processors(
+            row_temperatures,
+            torch.tensor(top_ks, dtype=torch.long, device=device),
+            torch.tensor(top_ps if top_ps is not None else [self.config.top_p] * len(prompts),
+                         dtype=torch.float, device=device),
+            repetition_penalty, no_repeat_ngram_size
+        )
+        greedy = row_temperatures <= 0
+        
+        with torch.no_grad():
+            processors.start(input_ids, attention_mask)
+            logits, past_key_values = self.decode_step(input_ids, attention_mask=attention_mask, position_ids=position_ids)
+            next_positions = position_ids[:, -1] + 1
+            
+            while active.numel() > 0:
+                next_tokens = sample_next_tokens(processors(logits), greedy)
+                
+                keep = []
+                for i, (row, token) in enumerate(zip(active.tolist(), next_tokens.squeeze(1).tolist())):
+                    outputs[row].append(token)
+                    finished = stop_at_eos and token == self.config.eos_token_id
+                    if not finished and len(outputs[row]) < limits[row]:
+                        keep.append(i)
+                
+                if not keep:
                     break
+                
+                # Drop finished rows from the batch and the cache
+                if len(keep) < active.numel():
+                    keep_index = torch.tensor(keep, dtype=torch.long, device=device)
+                    past_key_values = [
+                        (key.index_select(0, keep_index), value.index_select(0, keep_index))
+                        for key, value in past_key_values
+                    ]
+                    active = active.index_select(0, keep_index)
+                    next_tokens = next_tokens.index_select(0, keep_index)
+                    attention_mask = attention_mask.index_select(0, keep_index)
+                    next_positions = next_positions.index_select(0, keep_index)
+                    greedy = greedy.index_select(0, keep_index)
+                    processors.reorder(keep_index)
+                
+                processors.update(next_tokens)
+                attention_mask = torch.cat(
+                    [attention_mask, attention_mask.new_ones((attention_mask.size(0), 1))], dim=1
+                )
+                logits, past_key_values = self.decode_step(
+                    next_tokens, past_key_values,
+                    attention_mask=attention_mask,
+                    position_ids=next_positions.unsqueeze(1)
+                )
+                next_positions = next_positions + 1
+        
+        return outputs
+    
+    def generate(self, prompt: str, max_length: int = 100, **kwargs) -> str:
+        """Generate text from a prompt."""
+        # Tokenize prompt, unless token IDs were already built
+        tokenizer = self._get_tokenizer()
+        if kwargs.get('prompt_ids') is not None:
+            input_ids = torch.tensor([kwargs['prompt_ids']], dtype=torch.long, device=self.device)
+        else:
+            input_ids = tokenizer.encode(prompt, return_tensors='pt').to(self.device)
+        prompt_length = min(input_ids.size(1), self.config.max_position_embeddings - 1)
         
-        # Decode generated text
-        generated_text = tokenizer.decode(input_ids[0], skip_special_tokens=True)
+        # Generate tokens
+        output_ids = self.generate_ids(
+            input_ids,
+            max_new_tokens=max_length,
+            temperature=kwargs.get('temperature'),
+            top_k=kwargs.get('top_k'),
+            top_p=kwargs.get('top_p'),
+            repetition_penalty=kwargs.get('repetition_penalty', 1.0),
+            no_repeat_ngram_size=kwargs.get('no_repeat_ngram_size', 0),
+            num_beams=kwargs.get('num_beams', 1),
+            length_penalty=kwargs.get('length_penalty', 1.0),
+            early_stopping=kwargs.get('early_stopping', True),
+            use_cache=kwargs.get('use_cache', True),
+            draft_model=kwargs.get('draft_model'),
+            num_draft_tokens=kwargs.get('num_draft_tokens')
+        )
+        
+        # Decode generated text, optionally without the prompt
+        if not kwargs.get('return_full_text', True):
+            output_ids = output_ids[:, prompt_length:]
+        generated_text = tokenizer.decode(output_ids[0], skip_special_tokens=True)
         return generated_text
     
-    def _get_tokenizer(self):
-        """Get or create tokenizer."""
-        # In production, you would load a proper tokenizer
-        # For now, return a simple tokenizer
-        return SimpleTokenizer()
+    def _get_tokenizer(self) -> 'BPETokenizer':
+        """Get the shared tokenizer for this model's configuration."""
+        return load_tokenizer(self.config)
 
 # =============================================================================
 # Personality Engine
@@ -258,11 +852,11 @@ class PersonalityEngine:
     def _load_personality_traits(self) -> Dict[str, Any]:
         """Load personality traits from configuration."""
         return {
-            'empathy_level': config.empathy_level,
-            'creativity_level': config.creativity_level,
-            'analytical_level': config.analytical_level,
-            'humor_enabled': config.humor_enabled,
-            'formality_level': config.formality_level
+            'empathy_level': self.config.empathy_level,
+            'creativity_level': self.config.creativity_level,
+            'analytical_level': self.config.analytical_level,
+            'humor_enabled': self.config.humor_enabled,
+            'formality_level': self.config.formality_level
         }
     
     def adjust_response(self, response: str, context: Dict[str, Any]) -> str:
@@ -370,36 +964,141 @@ class PersonalityEngine:
 # =============================================================================
 
 class MemorySystem:
-    """Manages conversation memory and context."""
+    """Manages conversation memory and context.
+    
+    Each user gets a bounded window of recent interactions plus running
+    preference aggregates that are updated on insert, so context lookup
+    never scans history. At most max_memory_users users stay resident
+    (least recently active are evicted first); with memory_db_path set the
+    full history is also spilled to SQLite and evicted users are reloaded
+    from it on their next message.
+    """
+    
+    # Context keys produced by get_context; not stored with entries so
+    # memories do not nest previous memories
+    DERIVED_CONTEXT_KEYS = ('recent_interactions', 'user_preferences')
+    
+    # Token ID caches the context builder stores on entries
+    CACHE_KEYS = ('turn_ids', 'summary_ids')
     
     def __init__(self, config: ModelConfig):
         self.config = config
-        self.short_term_memory = []
-        self.long_term_memory = {}
-        self.max_memory_size = config.memory_size
+        self.window_size = config.max_conversation_length
+        self.max_users = config.max_memory_users
+        self.windows: 'OrderedDict[str, deque]' = OrderedDict()
+        self.aggregates: Dict[str, Dict[str, Any]] = {}
+        self.lock = threading.RLock()
         
+        self.db = None
+        if config.memory_db_path:
+            self._open_db(config.memory_db_path)
+    
+    def _open_db(self, path: str):
+        """Open (and create) the SQLite long-term history store."""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS memory_entries ('
+            'user_id TEXT NOT NULL, timestamp REAL NOT NULL, message TEXT, response TEXT, context TEXT, summary TEXT)'
+        )
+        self.db.execute('CREATE INDEX IF NOT EXISTS memory_entries_user ON memory_entries (user_id, timestamp)')
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS memory_aggregates ('
+            'user_id TEXT PRIMARY KEY, formal_count INTEGER, total_count INTEGER, topics TEXT)'
+        )
+        self.db.commit()
+    
+    def _new_aggregates(self) -> Dict[str, Any]:
+        """Empty running preference aggregates for one user."""
+        return {'formal_count': 0, 'total_count': 0, 'topics': {}}
+    
+    def _touch_user(self, user_id: str) -> Optional[deque]:
+        """Mark a user as recently active, loading them from SQLite if evicted."""
+        window = self.windows.get(user_id)
+        if window is not None:
+            self.windows.move_to_end(user_id)
+            return window
+        if self.db is None:
+            return None
+        
+        rows = self.db.execute(
+            'SELECT timestamp, message, response, context, summary FROM memory_entries '
+            'WHERE user_id = ? ORDER BY timestamp DESC LIMIT ?',
+            (user_id, self.window_size)
+        ).fetchall()
+        if not rows:
+            return None
+        
+        window = deque(
+            ({'timestamp': timestamp, 'user_id': user_id, 'message': message,
+              'response': response, 'context': json.loads(context), 'summary': summary}
+             for timestamp, message, response, context, summary in reversed(rows)),
+            maxlen=self.window_size
+        )
+        aggregates = self._new_aggregates()
+        row = self.db.execute(
+            'SELECT formal_count, total_count, topics FROM memory_aggregates WHERE user_id = ?', (user_id,)
+        ).fetchone()
+        if row is not None:
+            aggregates.update(formal_count=row[0], total_count=row[1], topics=dict.fromkeys(json.loads(row[2])))
+        self._make_resident(user_id, window, aggregates)
+        return window
+    
+    def _make_resident(self, user_id: str, window: deque, aggregates: Dict[str, Any]):
+        """Add a user's window and aggregates, evicting the least recently active users."""
+        self.windows[user_id] = window
+        self.aggregates[user_id] = aggregates
+        while len(self.windows) > self.max_users:
+            evicted, _ = self.windows.popitem(last=False)
+            self.aggregates.pop(evicted, None)
+    
     def add_to_memory(self, user_id: str, message: str, response: str, context: Dict[str, Any]):
         """Add interaction to memory."""
+        context = {key: value for key, value in context.items() if key not in self.DERIVED_CONTEXT_KEYS}
         memory_entry = {
-            'timestamp': torch.tensor(time.time()),
+            'timestamp': time.time(),
             'user_id': user_id,
             'message': message,
             'response': response,
-            'context': context
+            'context': context,
+            'summary': summarize_turn(message, response, self.config.context_summary_words)
         }
         
-        # Add to short-term memory
-        self.short_term_memory.append(memory_entry)
-        
-        # Maintain memory size
-        if len(self.short_term_memory) > self.max_memory_size:
-            self.short_term_memory.pop(0)
-        
-        # Update long-term memory (simplified)
-        if user_id not in self.long_term_memory:
-            self.long_term_memory[user_id] = []
-        
-        self.long_term_memory[user_id].append(memory_entry)
+        with self.lock:
+            window = self._touch_user(user_id)
+            if window is None:
+                window = deque(maxlen=self.window_size)
+                self._make_resident(user_id, window, self._new_aggregates())
+            window.append(memory_entry)
+            
+            # Update preference aggregates incrementally
+            aggregates = self.aggregates[user_id]
+            aggregates['total_count'] += 1
+            if 'formal' in context.get('style', ''):
+                aggregates['formal_count'] += 1
+            for topic in context.get('topics', []):
+                aggregates['topics'][topic] = None
+            
+            if self.db is not None:
+                self._spill(memory_entry, aggregates)
+    
+    def _spill(self, memory_entry: Dict[str, Any], aggregates: Dict[str, Any]):
+        """Write one entry and the user's aggregates to SQLite."""
+        user_id = memory_entry['user_id']
+        with self.db:
+            self.db.execute(
+                'INSERT INTO memory_entries (user_id, timestamp, message, response, context, summary) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (user_id, memory_entry['timestamp'], memory_entry['message'], memory_entry['response'],
+                 json.dumps(memory_entry['context'], default=str), memory_entry['summary'])
+            )
+            self.db.execute(
+                'INSERT OR REPLACE INTO memory_aggregates (user_id, formal_count, total_count, topics) '
+                'VALUES (?, ?, ?, ?)',
+                (user_id, aggregates['formal_count'], aggregates['total_count'],
+                 json.dumps(list(aggregates['topics']), default=str))
+            )
     
     def get_context(self, user_id: str, current_message: str) -> Dict[str, Any]:
         """Get relevant context for current interaction."""
@@ -409,45 +1108,66 @@ class MemorySystem:
             'conversation_theme': None
         }
         
-        # Get recent interactions
-        recent_memory = [entry for entry in self.short_term_memory if entry['user_id'] == user_id]
-        context['recent_interactions'] = recent_memory[-5:]  # Last 5 interactions
-        
-        # Extract user preferences from memory
-        context['user_preferences'] = self._extract_preferences(user_id)
+        with self.lock:
+            recent_memory = self._touch_user(user_id) or ()
+            
+            # Last 5 interactions
+            context['recent_interactions'] = [
+                {key: value for key, value in entry.items() if key not in self.CACHE_KEYS}
+                for entry in list(islice(reversed(recent_memory), 5))[::-1]
+            ]
+            
+            # Extract user preferences from memory
+            context['user_preferences'] = self._extract_preferences(user_id)
         
         # Determine conversation theme
-        context['conversation_theme'] = self._determine_theme(current_message, recent_memory)
+        context['conversation_theme'] = self._determine_theme(current_message, context['recent_interactions'])
         
         return context
     
+    def get_history(self, user_id: str) -> List[Dict[str, Any]]:
+        """The user's resident window of interactions, oldest first."""
+        with self.lock:
+            return list(self._touch_user(user_id) or ())
+    
     def _extract_preferences(self, user_id: str) -> Dict[str, Any]:
-        """Extract user preferences from memory."""
+        """Extract user preferences from the running aggregates."""
         preferences = {}
         
-        if user_id in self.long_term_memory:
-            user_memory = self.long_term_memory[user_id]
-            
+        aggregates = self.aggregates.get(user_id)
+        if aggregates is not None:
             # Analyze communication style
-            formal_count = sum(1 for entry in user_memory if 'formal' in entry.get('context', {}).get('style', ''))
-            casual_count = len(user_memory) - formal_count
+            formal_count = aggregates['formal_count']
+            casual_count = aggregates['total_count'] - formal_count
             
             if formal_count > casual_count:
                 preferences['communication_style'] = 'formal'
             else:
                 preferences['communication_style'] = 'casual'
             
-            # Extract topics of interest
-            topics = []
-            for entry in user_memory:
-                if 'topics' in entry.get('context', {}):
-                    topics.extend(entry['context']['topics'])
-            
-            if topics:
-                preferences['topics_of_interest'] = list(set(topics))
+            # Topics of interest
+            if aggregates['topics']:
+                preferences['topics_of_interest'] = list(aggregates['topics'])
         
         return preferences
     
+    def get_stats(self) -> Dict[str, Any]:
+        """Resident users and entries."""
+        with self.lock:
+            return {
+                'resident_users': len(self.windows),
+                'resident_entries': sum(len(window) for window in self.windows.values()),
+                'max_users': self.max_users,
+                'window_size': self.window_size,
+                'spill_enabled': self.db is not None
+            }
+    
+    def close(self):
+        """Close the SQLite store."""
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+    
     def _determine_theme(self, current_message: str, recent_memory: List[Dict]) -> str:
         """Determine the current conversation theme."""
         # Simple theme detection - in production, use NLP techniques
@@ -467,48 +1187,388 @@ class MemorySystem:
         return 'general'
 
 # =============================================================================
-# Simple Tokenizer
+# Byte-Level BPE Tokenizer
 # =============================================================================
 
-class SimpleTokenizer:
-    """Simple tokenizer for demonstration purposes."""
+# GPT-2 style pre-tokenization: contractions, letter runs, digit runs,
+# punctuation runs and whitespace, each optionally led by one space
+PRETOKENIZE_PATTERN = re.compile(r"'s|'t|'re|'ve|'m|'ll|'d| ?[^\W\d_]+| ?\d+| ?[^\s\w]+|\s+(?!\S)|\s+")
+
+class BPETokenizer:
+    """Byte-level BPE tokenizer with a persistent vocab/merges file.
     
-    def __init__(self):
-        self.vocab = {'<pad>': 0, '<bos>': 1, '<eos>': 2, '<unk>': 3}
-        self.reverse_vocab = {v: k for k, v in self.vocab.items()}
-        self.vocab_size = 4
+    IDs 0-3 are the special tokens from ModelConfig, IDs 4-259 are the raw
+    bytes and every learned merge adds one ID after that, so any text can be
+    encoded and every ID is below vocab_size.
+    """
     
-    def encode(self, text: str, return_tensors: str = 'pt') -> torch.Tensor:
-        """Encode text to token IDs."""
-        # Simple word-based tokenization
-        words = text.split()
-        token_ids = []
-        
-        for word in words:
-            if word not in self.vocab:
-                self.vocab[word] = self.vocab_size
-                self.reverse_vocab[self.vocab_size] = word
-                self.vocab_size += 1
+    SPECIAL_TOKENS = ['<pad>', '<bos>', '<eos>', '<unk>']
+    BYTE_OFFSET = len(SPECIAL_TOKENS)
+    BOS_TOKEN_ID = 1
+    EOS_TOKEN_ID = 2
+    FILE_NAME = 'tokenizer.json'
+    
+    # Pair (left, right) is looked up as left * PAIR_STRIDE + right
+    PAIR_STRIDE = 1 << 32
+    
+    def __init__(self, merges: Optional[List[Tuple[int, int]]] = None, cache_size: int = 50000):
+        self.cache_size = cache_size
+        self._cache: Dict[str, Tuple[int, ...]] = {}
+        self._set_merges(merges or [])
+    
+    def _set_merges(self, merges: List[Tuple[int, int]]):
+        """Rebuild the rank table and ID-to-bytes array from a merge list."""
+        self.merges = [tuple(pair) for pair in merges]
+        
+        # Sorted pair keys and their ranks for vectorized lookup in _encode_words
+        keys = np.array([left * self.PAIR_STRIDE + right for left, right in self.merges], dtype=np.int64)
+        order = np.argsort(keys)
+        self._pair_keys = keys[order]
+        self._pair_ranks = order.astype(np.int64)
+        
+        self._id_to_bytes: List[bytes] = [b''] * self.BYTE_OFFSET + [bytes([b]) for b in range(256)]
+        for left, right in self.merges:
+            self._id_to_bytes.append(self._id_to_bytes[left] + self._id_to_bytes[right])
+        
+        self._special_ids = set(range(self.BYTE_OFFSET))
+        self._cache.clear()
+    
+    @property
+    def vocab_size(self) -> int:
+        return len(self._id_to_bytes)
+    
+    @property
+    def is_trained(self) -> bool:
+        return bool(self.merges)
+    
+    # -------------------------------------------------------------------------
+    # Training
+    # -------------------------------------------------------------------------
+    
+    def train(self, texts: List[str], vocab_size: int, min_frequency: int = 2):
+        """Learn merges from a corpus until vocab_size IDs are in use."""
+        word_counts = Counter()
+        for text in texts:
+            word_counts.update(PRETOKENIZE_PATTERN.findall(text))
+        
+        words = [[b + self.BYTE_OFFSET for b in word.encode('utf-8')] for word in word_counts]
+        freqs = list(word_counts.values())
+        
+        # Pair frequencies plus an index of the words each pair occurs in,
+        # so a merge only revisits the words it can change
+        pair_counts = Counter()
+        pair_words = defaultdict(set)
+        for index, (word, freq) in enumerate(zip(words, freqs)):
+            for pair in zip(word, word[1:]):
+                pair_counts[pair] += freq
+                pair_words[pair].add(index)
+        
+        merges = []
+        next_id = self.BYTE_OFFSET + 256
+        while next_id < vocab_size and pair_counts:
+            # Ties go to the lowest pair so training is deterministic
+            best, count = max(pair_counts.items(), key=lambda item: (item[1], -item[0][0], -item[0][1]))
+            if count < min_frequency:
+                break
+            
+            merges.append(best)
+            for index in pair_words.pop(best, ()):
+                word, freq = words[index], freqs[index]
+                for pair in zip(word, word[1:]):
+                    pair_counts[pair] -= freq
+                    if pair_counts[pair] <= 0:
+                        del pair_counts[pair]
+                
+                word = self._merge_pair(word, best, next_id)
+                words[index] = word
+                for pair in zip(word, word[1:]):
+                    pair_counts[pair] += freq
+                    pair_words[pair].add(index)
+            
+            next_id += 1
+        
+        self._set_merges(merges)
+        logging.info(f"Trained BPE tokenizer with {len(merges)} merges ({self.vocab_size} tokens)")
+    
+    @staticmethod
+    def _merge_pair(word: List[int], pair: Tuple[int, int], new_id: int) -> List[int]:
+        """Replace every occurrence of pair in word with new_id."""
+        merged = []
+        i = 0
+        while i < len(word):
+            if i < len(word) - 1 and word[i] == pair[0] and word[i + 1] == pair[1]:
+                merged.append(new_id)
+                i += 2
+            else:
+                merged.append(word[i])
+                i += 1
+        return merged
+    
+    # -------------------------------------------------------------------------
+    # Encoding
+    # -------------------------------------------------------------------------
+    
+    def _encode_words(self, words: List[str]) -> List[Tuple[int, ...]]:
+        """Apply merges to many pre-tokens at once.
+        
+        All words are laid end to end in one array. Each round looks up the
+        rank of every adjacent pair with one searchsorted, finds each word's
+        lowest-rank pair and merges all its non-overlapping occurrences,
+        left to right, exactly like merging the words one by one. Finished
+        words leave the array, so a long word does not keep the rest busy.
+        """
+        byte_words = [word.encode('utf-8') for word in words]
+        lengths = np.array([len(word) for word in byte_words], dtype=np.int64)
+        ids = np.frombuffer(b''.join(byte_words), dtype=np.uint8).astype(np.int64) + self.BYTE_OFFSET
+        owner = np.repeat(np.arange(len(words)), lengths)
+        no_rank = len(self.merges)
+        finished_ids, finished_owner = [], []
+        
+        while ids.size:
+            # Rank of every pair inside a word; no_rank marks pairs without a merge
+            same_word = owner[:-1] == owner[1:]
+            keys = ids[:-1] * self.PAIR_STRIDE + ids[1:]
+            found = np.searchsorted(self._pair_keys, keys).clip(max=max(no_rank - 1, 0))
+            ranks = np.full(keys.shape, no_rank, dtype=np.int64)
+            if no_rank:
+                hit = same_word & (self._pair_keys[found] == keys)
+                ranks[hit] = self._pair_ranks[found[hit]]
+            
+            best = np.full(len(words), no_rank, dtype=np.int64)
+            np.minimum.at(best, owner[:-1], ranks)
+            
+            # Merge every occurrence of each word's best pair; in runs like
+            # (a, a, a) only every other position starts a merge
+            selected = (ranks < no_rank) & (ranks == best[owner[:-1]])
+            previous = np.concatenate(([False], selected[:-1]))
+            positions = np.arange(selected.size)
+            run_start = np.maximum.accumulate(np.where(selected & ~previous, positions, 0))
+            starts = np.flatnonzero(selected & ((positions - run_start) % 2 == 0))
             
-            token_ids.append(self.vocab[word])
+            ids[starts] = self.BYTE_OFFSET + 256 + ranks[starts]
+            ids = np.delete(ids, starts + 1)
+            owner = np.delete(owner, starts + 1)
+            
+            # Words that had nothing left to merge are done
+            done = best[owner] == no_rank
+            if done.any():
+                finished_ids.append(ids[done])
+                finished_owner.append(owner[done])
+                ids, owner = ids[~done], owner[~done]
+        
+        # Regroup the surviving IDs by word, keeping their order
+        ids = np.concatenate(finished_ids) if finished_ids else np.zeros(0, dtype=np.int64)
+        owner = np.concatenate(finished_owner) if finished_owner else np.zeros(0, dtype=np.int64)
+        order = np.argsort(owner, kind='stable')
+        ids, owner = ids[order].tolist(), owner[order]
+        bounds = np.searchsorted(owner, np.arange(len(words) + 1)).tolist()
+        return [tuple(ids[bounds[i]:bounds[i + 1]]) for i in range(len(words))]
+    
+    def encode_batch(self, texts: List[str], add_special_tokens: bool = False) -> List[List[int]]:
+        """Encode several texts, merging each distinct uncached pre-token once."""
+        pretokenized = [PRETOKENIZE_PATTERN.findall(text) for text in texts]
+        
+        cache = self._cache
+        missing = list(dict.fromkeys(word for words in pretokenized for word in words if word not in cache))
+        if missing:
+            for word, word_ids in zip(missing, self._encode_words(missing)):
+                cache[word] = word_ids
         
+        encoded = []
+        for words in pretokenized:
+            ids = [self.BOS_TOKEN_ID] if add_special_tokens else []
+            for word in words:
+                ids.extend(cache[word])
+            if add_special_tokens:
+                ids.append(self.EOS_TOKEN_ID)
+            encoded.append(ids)
+        
+        # Evict the oldest entries rather than clearing the whole cache
+        if len(cache) > self.cache_size:
+            for word in list(islice(cache, len(cache) - self.cache_size)):
+                del cache[word]
+        return encoded
+    
+    def encode(self, text: str, return_tensors: str = 'pt', add_special_tokens: bool = False):
+        """Encode text to token IDs."""
+        token_ids = self.encode_batch([text], add_special_tokens=add_special_tokens)[0]
         if return_tensors == 'pt':
-            return torch.tensor([token_ids])
+            return torch.tensor([token_ids], dtype=torch.long)
         return token_ids
     
-    def decode(self, token_ids: torch.Tensor, skip_special_tokens: bool = True) -> str:
+    def decode(self, token_ids, skip_special_tokens: bool = True) -> str:
         """Decode token IDs to text."""
         if isinstance(token_ids, torch.Tensor):
             token_ids = token_ids.tolist()
         
-        words = []
-        for token_id in token_ids:
-            if token_id in self.reverse_vocab:
-                word = self.reverse_vocab[token_id]
-                if not skip_special_tokens or not word.startswith('<'):
-                    words.append(word)
+        id_to_bytes = self._id_to_bytes
+        data = b''.join(
+            id_to_bytes[token_id] for token_id in token_ids
+            if 0 <= token_id < len(id_to_bytes) and token_id not in self._special_ids
+        )
+        return data.decode('utf-8', errors='replace')
+    
+    # -------------------------------------------------------------------------
+    # Persistence
+    # -------------------------------------------------------------------------
+    
+    def save(self, path: str):
+        """Save the vocab and merges to a tokenizer directory."""
+        os.makedirs(path, exist_ok=True)
+        data = {
+            'version': 1,
+            'special_tokens': self.SPECIAL_TOKENS,
+            'vocab_size': self.vocab_size,
+            'vocab': {token_bytes.hex(): token_id for token_id, token_bytes in enumerate(self._id_to_bytes)
+                      if token_id >= self.BYTE_OFFSET},
+            'merges': [list(pair) for pair in self.merges]
+        }
+        with open(os.path.join(path, self.FILE_NAME), 'w') as f:
+            json.dump(data, f)
+    
+    @classmethod
+    def load(cls, path: str) -> 'BPETokenizer':
+        """Load a tokenizer saved with save()."""
+        with open(os.path.join(path, cls.FILE_NAME), 'r') as f:
+            data = json.load(f)
+        return cls(merges=[tuple(pair) for pair in data['merges']])
+
+_shared_tokenizers: Dict[str, BPETokenizer] = {}
+
+def load_tokenizer(config: ModelConfig) -> BPETokenizer:
+    """Return the process-wide tokenizer for config.tokenizer_path.
+    
+    Generation, training and evaluation all go through this function so they
+    share one instance (and one merge cache). An untrained byte-level
+    tokenizer is used until a vocab file exists at the path.
+    """
+    path = config.tokenizer_path
+    tokenizer = _shared_tokenizers.get(path)
+    if tokenizer is None:
+        if os.path.exists(os.path.join(path, BPETokenizer.FILE_NAME)):
+            tokenizer = BPETokenizer.load(path)
+        else:
+            logging.warning(f"No tokenizer found at {path}, using untrained byte-level tokenizer")
+            tokenizer = BPETokenizer()
+        _shared_tokenizers[path] = tokenizer
+    
+    if tokenizer.vocab_size > config.vocab_size:
+        raise ValueError(f"Tokenizer at {path} has {tokenizer.vocab_size} tokens, "
+                         f"more than the model vocab_size of {config.vocab_size}")
+    return tokenizer
+
+# =============================================================================
+# Context Builder
+# =============================================================================
+
+SENTENCE_PATTERN = re.compile(r'[^.!?\n]+[.!?]*')
+SUMMARY_STOPWORDS = frozenset(
+    'a an the and or but if of to in on at for with is are was were be been am i you it '
+    'this that my your me we they he she do does did not no so as by from can will just'.split()
+)
+
+def summarize_turn(message: str, response: str, max_words: int = 32) -> str:
+    """Extractive summary of one conversation turn.
+    
+    Picks the highest-scoring sentence of the message and of the response,
+    scoring sentences by the in-turn frequency of their content words, and
+    caps the result at max_words words.
+    """
+    def key_sentence(text: str) -> str:
+        sentences = [sentence.strip() for sentence in SENTENCE_PATTERN.findall(text) if sentence.strip()]
+        if len(sentences) <= 1:
+            return sentences[0] if sentences else ''
+        
+        words_per_sentence = [
+            [word for word in re.findall(r"[a-z']+", sentence.lower()) if word not in SUMMARY_STOPWORDS]
+            for sentence in sentences
+        ]
+        frequencies = Counter(word for words in words_per_sentence for word in words)
+        scores = [sum(frequencies[word] for word in words) / (len(words) + 1) for words in words_per_sentence]
+        return sentences[max(range(len(sentences)), key=scores.__getitem__)]
+    
+    summary = f"User: {key_sentence(message)} Assistant: {key_sentence(response)}"
+    words = summary.split()
+    if len(words) > max_words:
+        summary = ' '.join(words[:max_words]) + ' ...'
+    return summary
+
+class ContextBuilder:
+    """Builds generation prompts from a user's history within a token budget.
+    
+    The newest context_recent_turns turns are kept verbatim and older turns
+    are folded into their extractive summaries (computed once, when the turn
+    is stored). Turns are added newest first until the budget
+    min(context_window, max_position_embeddings - 1) - max_new_tokens is
+    used up. Token IDs for each turn and summary are cached on the memory
+    entry, so each turn is tokenized once.
+    """
+    
+    def __init__(self, config: ModelConfig, tokenizer: 'BPETokenizer', memory_system: MemorySystem):
+        self.config = config
+        self.tokenizer = tokenizer
+        self.memory_system = memory_system
+        self.recent_turns = config.context_recent_turns
+        self.stats = {'prompts': 0, 'verbatim_turns': 0, 'summarized_turns': 0, 'dropped_turns': 0, 'prompt_tokens': 0}
+    
+    def _turn_ids(self, entry: Dict[str, Any]) -> List[int]:
+        if 'turn_ids' not in entry:
+            entry['turn_ids'] = self.tokenizer.encode_batch(
+                [f"User: {entry['message']}\nAssistant: {entry['response']}\n"]
+            )[0]
+        return entry['turn_ids']
+    
+    def _summary_ids(self, entry: Dict[str, Any]) -> List[int]:
+        if 'summary_ids' not in entry:
+            summary = entry.get('summary') or summarize_turn(entry['message'], entry['response'],
+                                                             self.config.context_summary_words)
+            entry['summary_ids'] = self.tokenizer.encode_batch([f"Earlier: {summary}\n"])[0]
+        return entry['summary_ids']
+    
+    def token_budget(self, max_new_tokens: int) -> int:
+        """Prompt tokens available when max_new_tokens are generated."""
+        budget = min(self.config.context_window, self.config.max_position_embeddings - 1) - max_new_tokens
+        return max(budget, 1)
+    
+    def build(self, user_id: str, message: str, max_new_tokens: int = 100) -> List[int]:
+        """Prompt token IDs for a new message, oldest context first."""
+        budget = self.token_budget(max_new_tokens)
+        current_ids = self.tokenizer.encode_batch([f"User: {message}\nAssistant:"])[0]
+        if len(current_ids) >= budget:
+            self.stats['prompts'] += 1
+            self.stats['prompt_tokens'] += budget
+            return current_ids[-budget:]
+        
+        remaining = budget - len(current_ids)
+        history = self.memory_system.get_history(user_id)
+        parts = []
+        verbatim, summarized = 0, 0
+        for turn, entry in enumerate(reversed(history)):
+            ids = self._turn_ids(entry) if turn < self.recent_turns else None
+            if ids is None or len(ids) > remaining:
+                ids = self._summary_ids(entry)
+                if len(ids) > remaining:
+                    break
+                summarized += 1
+            else:
+                verbatim += 1
+            parts.append(ids)
+            remaining -= len(ids)
+        
+        prompt_ids = [token for ids in reversed(parts) for token in ids] + current_ids
         
-        return ' '.join(words)
+        self.stats['prompts'] += 1
+        self.stats['verbatim_turns'] += verbatim
+        self.stats['summarized_turns'] += summarized
+        self.stats['dropped_turns'] += len(history) - verbatim - summarized
+        self.stats['prompt_tokens'] += len(prompt_ids)
+        return prompt_ids
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Prompt counts and how history turns were included."""
+        stats = dict(self.stats)
+        stats['avg_prompt_tokens'] = stats['prompt_tokens'] / stats['prompts'] if stats['prompts'] else 0.0
+        return stats
 
 # =============================================================================
 # Main CareConnect Model
@@ -525,14 +1585,38 @@ class CareConnectModel:
         self.transformer = CareConnectTransformer(config).to(self.device)
         self.personality_engine = PersonalityEngine(config)
         self.memory_system = MemorySystem(config)
-        self.tokenizer = SimpleTokenizer()
+        self.tokenizer = load_tokenizer(config)
+        self.context_builder = ContextBuilder(config, self.tokenizer, self.memory_system)
         
         # Load model if exists
         if os.path.exists(config.model_path):
-            self.load_model(config.model_path)
+            self.load_model(config.model_path, quantize=config.quantize)
+        elif config.quantize:
+            self.transformer.quantize(config.quantize)
+            self.device = self.transformer.device
+        
+        # Optional draft model for speculative decoding
+        self.draft_model = None
+        if os.path.exists(config.draft_model_path):
+            self.draft_model = CareConnectTransformer(config.draft_config()).to(self.device)
+            self.draft_model.device = self.device
+            self.draft_model.load_model(config.draft_model_path)
+            self.draft_model.eval()
+        
+        # Compile after loading and quantization so the graph sees final modules
+        if config.compile_inference:
+            self.transformer.compile_for_inference()
+            if self.draft_model is not None:
+                self.draft_model.compile_for_inference()
     
-    def generate_response(self, user_id: str, message: str, context: Dict[str, Any] = None) -> str:
-        """Generate a response to user message."""
+    def generate_response(self, user_id: str, message: str, context: Dict[str, Any] = None,
+                          **generation_kwargs) -> str:
+        """Generate a response to user message.
+        
+        generation_kwargs (max_length, temperature, top_k, top_p,
+        repetition_penalty, no_repeat_ngram_size, num_beams, length_penalty,
+        early_stopping) are passed through to the transformer.
+        """
         if context is None:
             context = {}
         
@@ -540,8 +1624,13 @@ class CareConnectModel:
         memory_context = self.memory_system.get_context(user_id, message)
         context.update(memory_context)
         
-        # Generate base response
-        base_response = self.transformer.generate(message, max_length=100)
+        # Generate base response from the message and budgeted history
+        generation_kwargs.setdefault('max_length', 100)
+        prompt_ids = self.context_builder.build(user_id, message, generation_kwargs['max_length'])
+        base_response = self.transformer.generate(
+            message, prompt_ids=prompt_ids, return_full_text=False,
+            draft_model=self.draft_model, **generation_kwargs
+        )
         
         # Apply personality adjustments
         response = self.personality_engine.adjust_response(base_response, context)
@@ -551,13 +1640,88 @@ class CareConnectModel:
         
         return response
     
+    def generate_batch(self, prompts: List[str], max_length: Any = 100,
+                       temperature: Any = None, top_k: Any = None, top_p: Any = None,
+                       repetition_penalty: float = 1.0, no_repeat_ngram_size: int = 0,
+                       prompt_ids: Optional[List[List[int]]] = None, return_full_text: bool = True) -> List[str]:
+        """Generate text for several prompts in a single batched decode.
+        
+        max_length, temperature, top_k and top_p accept either one value for
+        every prompt or a list with one value per prompt; the penalties apply
+        to the whole batch. prompt_ids skips tokenizing the prompts.
+        """
+        if not prompts:
+            return []
+        
+        def per_row(value, default):
+            if value is None:
+                value = default
+            return list(value) if isinstance(value, (list, tuple)) else [value] * len(prompts)
+        
+        tokenizer = self.tokenizer
+        if prompt_ids is None:
+            prompt_ids = tokenizer.encode_batch(prompts)
+        
+        generated_ids = self.transformer.generate_ids_batch(
+            prompt_ids,
+            max_new_tokens=per_row(max_length, 100),
+            temperatures=per_row(temperature, self.config.temperature),
+            top_ks=per_row(top_k, self.config.top_k),
+            top_ps=per_row(top_p, self.config.top_p),
+            repetition_penalty=repetition_penalty,
+            no_repeat_ngram_size=no_repeat_ngram_size
+        )
+        
+        return [
+            tokenizer.decode((ids + generated) if return_full_text else generated, skip_special_tokens=True)
+            for ids, generated in zip(prompt_ids, generated_ids)
+        ]
+    
+    def generate_response_batch(self, requests: List[Dict[str, Any]], **generation_kwargs) -> List[str]:
+        """Generate responses for several user messages in one batch.
+        
+        Each request holds 'user_id', 'message' and optional 'context',
+        'max_length', 'temperature', 'top_k' and 'top_p'. Batch-wide
+        generation_kwargs (repetition_penalty, no_repeat_ngram_size) are passed
+        to generate_batch. Prompts include each user's budgeted history.
+        """
+        contexts = []
+        for request in requests:
+            context = dict(request.get('context') or {})
+            context.update(self.memory_system.get_context(request['user_id'], request['message']))
+            contexts.append(context)
+        
+        max_lengths = [request.get('max_length', 100) for request in requests]
+        base_responses = self.generate_batch(
+            [request['message'] for request in requests],
+            max_length=max_lengths,
+            temperature=[request.get('temperature', self.config.temperature) for request in requests],
+            top_k=[request.get('top_k', self.config.top_k) for request in requests],
+            top_p=[request.get('top_p', self.config.top_p) for request in requests],
+            prompt_ids=[
+                self.context_builder.build(request['user_id'], request['message'], max_length)
+                for request, max_length in zip(requests, max_lengths)
+            ],
+            return_full_text=False,
+            **generation_kwargs
+        )
+        
+        responses = []
+        for request, context, base_response in zip(requests, contexts, base_responses):
+            response = self.personality_engine.adjust_response(base_response, context)
+            self.memory_system.add_to_memory(request['user_id'], request['message'], response, context)
+            responses.append(response)
+        
+        return responses
+    
     def save_model(self, path: str):
         """Save the complete model."""
         self.transformer.save_model(path)
     
-    def load_model(self, path: str):
-        """Load the complete model."""
-        self.transformer.load_model(path)
+    def load_model(self, path: str, quantize: Optional[str] = None):
+        """Load the complete model, optionally as int8 (quantize='int8')."""
+        self.transformer.load_model(path, quantize=quantize)
+        self.device = self.transformer.device
     
     def train(self, training_data: List[Tuple[str, str]], epochs: int = 10):
         """Train the model on provided data."""
@@ -14,7 +14,8 @@ import argparse
 from datetime import datetime
 import yaml
 
-from model import CareConnectModel, ModelConfig, SimpleTokenizer
+from model import CareConnectModel, ModelConfig
+from resources import configure_worker_resources, worker_resource_settings
 
 # =============================================================================
 # Configuration
@@ -40,7 +41,11 @@ def load_prediction_config(config_path: str = "config.yaml") -> Dict[str, Any]:
             'early_stopping': True,
             'pad_token_id': 0,
             'eos_token_id': 2,
-            'batch_size': 1
+            'batch_size': 1,
+            'max_batch_size': 8,
+            'intra_op_threads': None,
+            'inter_op_threads': 1,
+            'cpu_affinity': None
         }
 
 # =============================================================================
@@ -56,10 +61,28 @@ class PredictionEngine:
         self.device = model.device
         self.tokenizer = model.tokenizer
         
+        # Thread pools and CPU pinning are applied by main() before the
+        # model is built; record what is in effect
+        self.worker_resources = worker_resource_settings()
+        
         # Initialize prediction history
         self.prediction_history = []
         self.user_sessions = {}
         
+    def _generation_kwargs(self) -> Dict[str, Any]:
+        """Generation settings from the prediction config; do_sample=False means greedy."""
+        return {
+            'max_length': self.config.get('max_length', 100),
+            'temperature': self.config.get('temperature', 0.7) if self.config.get('do_sample', True) else 0.0,
+            'top_k': self.config.get('top_k', 50),
+            'top_p': self.config.get('top_p', 0.9),
+            'repetition_penalty': self.config.get('repetition_penalty', 1.0),
+            'no_repeat_ngram_size': self.config.get('no_repeat_ngram_size', 0),
+            'num_beams': self.config.get('num_beams', 1),
+            'length_penalty': self.config.get('length_penalty', 1.0),
+            'early_stopping': self.config.get('early_stopping', True)
+        }
+    
     def predict(self, user_id: str, message: str, context: Dict[str, Any] = None) -> Dict[str, Any]:
         """Generate a prediction for a user message."""
         
@@ -70,7 +93,8 @@ class PredictionEngine:
         
         try:
             # Generate response using the model
-            response = self.model.generate_response(user_id, message, context)
+            generation_kwargs = self._generation_kwargs()
+            response = self.model.generate_response(user_id, message, context, **generation_kwargs)
             
             # Calculate prediction time
             prediction_time = time.time() - start_time
@@ -83,28 +107,11 @@ class PredictionEngine:
                 'prediction_time': prediction_time,
                 'timestamp': datetime.now().isoformat(),
                 'context': context,
-                'model_config': {
-                    'temperature': self.config.get('temperature', 0.7),
-                    'max_length': self.config.get('max_length', 100),
-                    'top_p': self.config.get('top_p', 0.9),
-                    'top_k': self.config.get('top_k', 50)
-                }
+                'model_config': generation_kwargs
             }
             
             # Store in history
-            self.prediction_history.append(result)
-            
-            # Update user session
-            if user_id not in self.user_sessions:
-                self.user_sessions[user_id] = []
-            self.user_sessions[user_id].append(result)
-            
-            # Limit history size
-            if len(self.prediction_history) > 1000:
-                self.prediction_history = self.prediction_history[-1000:]
-            
-            if len(self.user_sessions[user_id]) > 100:
-                self.user_sessions[user_id] = self.user_sessions[user_id][-100:]
+            self._record_prediction(user_id, result)
             
             return result
             
@@ -120,18 +127,90 @@ class PredictionEngine:
                 'context': context
             }
     
+    def _record_prediction(self, user_id: str, result: Dict[str, Any]):
+        """Store a prediction in the global history and the user's session."""
+        self.prediction_history.append(result)
+        
+        # Update user session
+        if user_id not in self.user_sessions:
+            self.user_sessions[user_id] = []
+        self.user_sessions[user_id].append(result)
+        
+        # Limit history size
+        if len(self.prediction_history) > 1000:
+            self.prediction_history = self.prediction_history[-1000:]
+        
+        if len(self.user_sessions[user_id]) > 100:
+            self.user_sessions[user_id] = self.user_sessions[user_id][-100:]
+    
     def batch_predict(self, predictions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Generate predictions for multiple inputs in batch."""
         
         results = []
+        batch_size = max(int(self.config.get('max_batch_size', 8)), 1)
+        generation_kwargs = self._generation_kwargs()
+        
+        # Beam search decodes one prompt at a time
+        if generation_kwargs['num_beams'] > 1:
+            return [
+                self.predict(pred_request.get('user_id', 'batch_user'), pred_request.get('message', ''),
+                             pred_request.get('context', {}))
+                for pred_request in predictions
+            ]
         
-        for pred_request in predictions:
-            user_id = pred_request.get('user_id', 'batch_user')
-            message = pred_request.get('message', '')
-            context = pred_request.get('context', {})
+        for start in range(0, len(predictions), batch_size):
+            chunk = predictions[start:start + batch_size]
+            requests = [
+                {
+                    'user_id': pred_request.get('user_id', 'batch_user'),
+                    'message': pred_request.get('message', ''),
+                    'context': pred_request.get('context', {}),
+                    'max_length': pred_request.get('max_length', generation_kwargs['max_length']),
+                    'temperature': pred_request.get('temperature', generation_kwargs['temperature']),
+                    'top_k': pred_request.get('top_k', generation_kwargs['top_k']),
+                    'top_p': pred_request.get('top_p', generation_kwargs['top_p'])
+                }
+                for pred_request in chunk
+            ]
+            
+            start_time = time.time()
+            try:
+                responses = self.model.generate_response_batch(
+                    requests,
+                    repetition_penalty=generation_kwargs['repetition_penalty'],
+                    no_repeat_ngram_size=generation_kwargs['no_repeat_ngram_size']
+                )
+            except Exception as e:
+                logging.error(f"Batch prediction error, falling back to sequential: {e}")
+                results.extend(
+                    self.predict(request['user_id'], request['message'], request['context'])
+                    for request in requests
+                )
+                continue
             
-            result = self.predict(user_id, message, context)
-            results.append(result)
+            # Batch latency is shared by every request in the batch
+            prediction_time = time.time() - start_time
+            
+            for request, response in zip(requests, responses):
+                result = {
+                    'user_id': request['user_id'],
+                    'input_message': request['message'],
+                    'response': response,
+                    'prediction_time': prediction_time,
+                    'batch_size': len(requests),
+                    'timestamp': datetime.now().isoformat(),
+                    'context': request['context'],
+                    'model_config': {
+                        'temperature': request['temperature'],
+                        'max_length': request['max_length'],
+                        'top_p': request['top_p'],
+                        'top_k': request['top_k'],
+                        'repetition_penalty': generation_kwargs['repetition_penalty'],
+                        'no_repeat_ngram_size': generation_kwargs['no_repeat_ngram_size']
+                    }
+                }
+                self._record_prediction(request['user_id'], result)
+                results.append(result)
         
         return results
     
@@ -144,12 +223,13 @@ class PredictionEngine:
     def get_prediction_stats(self) -> Dict[str, Any]:
         """Get statistics about predictions."""
         if not self.prediction_history:
-            return {}
+            return {'total_predictions': 0, 'worker_resources': self.worker_resources}
         
         prediction_times = [pred['prediction_time'] for pred in self.prediction_history]
         response_lengths = [len(pred['response'].split()) for pred in self.prediction_history]
         
         return {
+            'worker_resources': self.worker_resources,
             'total_predictions': len(self.prediction_history),
             'unique_users': len(self.user_sessions),
             'avg_prediction_time': np.mean(prediction_times),
@@ -443,7 +523,10 @@ Just type your message to get an AI response!
     def _show_stats(self):
         """Show prediction statistics."""
         stats = self.engine.get_prediction_stats()
-        if stats:
+        resources = stats['worker_resources']
+        print(f"\nWorker: {resources['intra_op_threads']} intra-op / {resources['inter_op_threads']} inter-op threads "
+              f"on CPUs {resources['cpu_affinity']}")
+        if stats['total_predictions']:
             print("\nPrediction Statistics:")
             print(f"- Total predictions: {stats['total_predictions']}")
             print(f"- Unique users: {stats['unique_users']}")
@@ -507,6 +590,10 @@ def main():
     parser.add_argument('--message', type=str, help='Single message to predict')
     parser.add_argument('--user-id', type=str, default='default_user', help='User ID for prediction')
     parser.add_argument('--advanced', action='store_true', help='Use advanced prediction features')
+    parser.add_argument('--quantize', type=str, choices=['int8'], help='Quantize the model for CPU inference')
+    parser.add_argument('--intra-op-threads', type=int, help='PyTorch intra-op threads (default: pinned CPUs or all cores)')
+    parser.add_argument('--inter-op-threads', type=int, help='PyTorch inter-op threads')
+    parser.add_argument('--cpu-affinity', type=str, help="CPUs to pin this worker to, e.g. '0-3,8'")
     
     args = parser.parse_args()
     
@@ -522,11 +609,19 @@ def main():
     
     # Load configuration
     config = load_prediction_config(args.config)
+    for key in ('intra_op_threads', 'inter_op_threads', 'cpu_affinity'):
+        if getattr(args, key) is not None:
+            config[key] = getattr(args, key)
     logging.info(f"Prediction configuration: {config}")
     
+    # Size thread pools before the model is built
+    configure_worker_resources(config.get('intra_op_threads'), config.get('inter_op_threads'),
+                               config.get('cpu_affinity'))
+    
     # Create model
     model_config = ModelConfig()
     model_config.model_path = args.model_path
+    model_config.quantize = args.quantize
     model = CareConnectModel(model_config)
     logging.info(f"Model loaded on device: {model.device}")
     
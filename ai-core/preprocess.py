@@ -17,7 +17,6 @@ from tqdm import tqdm
 import pickle
 import hashlib
 
-from model import SimpleTokenizer
 
 # =============================================================================
 # Configuration
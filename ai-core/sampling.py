@@ -0,0 +1,326 @@
+# =============================================================================
+# CareConnect v5.0 - Logits Processors and Beam Search
+# =============================================================================
+
+import torch
+import torch.nn.functional as F
+from typing import List, Dict, Optional, Tuple, Set, Callable
+
+# =============================================================================
+# Logits Processors
+# =============================================================================
+
+class LogitsProcessor:
+    """Base class for processors that edit (batch, vocab_size) logits in place.
+    
+    Processors that depend on previously generated tokens keep their own
+    incremental state: start() sees the prompts, update() each new token
+    and reorder() follows rows being dropped or duplicated (finished
+    sequences, beam search).
+    """
+    
+    def start(self, input_ids: torch.Tensor, attention_mask: Optional[torch.Tensor] = None):
+        """Initialize state from (batch, seq) prompt IDs."""
+        pass
+    
+    def update(self, next_tokens: torch.Tensor):
+        """Record one new token per row."""
+        pass
+    
+    def reorder(self, indices: torch.Tensor):
+        """Keep only the given rows, in the given order."""
+        pass
+    
+    def __call__(self, logits: torch.Tensor) -> torch.Tensor:
+        raise NotImplementedError
+
+class TemperatureLogitsProcessor(LogitsProcessor):
+    """Divide logits by a per-row temperature."""
+    
+    def __init__(self, temperatures: torch.Tensor):
+        self.temperatures = temperatures.clamp(min=1e-5).unsqueeze(1)
+    
+    def reorder(self, indices: torch.Tensor):
+        self.temperatures = self.temperatures.index_select(0, indices)
+    
+    def __call__(self, logits: torch.Tensor) -> torch.Tensor:
+        return logits.div_(self.temperatures)
+
+class TopKLogitsProcessor(LogitsProcessor):
+    """Keep the top_k highest logits per row; a top_k of 0 disables filtering."""
+    
+    def __init__(self, top_ks: torch.Tensor):
+        self.top_ks = top_ks
+    
+    def reorder(self, indices: torch.Tensor):
+        self.top_ks = self.top_ks.index_select(0, indices)
+    
+    def __call__(self, logits: torch.Tensor) -> torch.Tensor:
+        max_k = min(int(self.top_ks.max()), logits.size(-1))
+        if max_k <= 0:
+            return logits
+        top_k_values = torch.topk(logits, max_k, dim=-1).values
+        kth_values = top_k_values.gather(1, (self.top_ks.clamp(1, max_k) - 1).unsqueeze(1))
+        kth_values.masked_fill_(self.top_ks.unsqueeze(1) <= 0, float('-inf'))
+        return logits.masked_fill_(logits < kth_values, float('-inf'))
+
+class TopPLogitsProcessor(LogitsProcessor):
+    """Nucleus filtering: keep the smallest set of tokens whose probability reaches top_p."""
+    
+    def __init__(self, top_ps: torch.Tensor):
+        self.top_ps = top_ps.unsqueeze(1)
+    
+    def reorder(self, indices: torch.Tensor):
+        self.top_ps = self.top_ps.index_select(0, indices)
+    
+    def __call__(self, logits: torch.Tensor) -> torch.Tensor:
+        sorted_logits, sorted_indices = torch.sort(logits, descending=True, dim=-1)
+        cumulative_probs = sorted_logits.softmax(dim=-1).cumsum_(dim=-1)
+        
+        # Drop tokens once the mass before them already reaches top_p, so the
+        # most likely token always survives
+        sorted_to_remove = (cumulative_probs - sorted_logits.softmax(dim=-1)) >= self.top_ps
+        to_remove = sorted_to_remove.scatter(1, sorted_indices, sorted_to_remove)
+        return logits.masked_fill_(to_remove, float('-inf'))
+
+class RepetitionPenaltyLogitsProcessor(LogitsProcessor):
+    """Penalize every token already present in a row (CTRL-style penalty).
+    
+    Only the logits of previously seen tokens are gathered, penalized and
+    scattered back, so the cost grows with sequence length, not vocab size.
+    """
+    
+    def __init__(self, penalty: float):
+        self.penalty = penalty
+        self.history: Optional[torch.Tensor] = None
+    
+    def start(self, input_ids: torch.Tensor, attention_mask: Optional[torch.Tensor] = None):
+        # Padding positions point at the pad token, which is never sampled
+        self.history = input_ids.clone()
+    
+    def update(self, next_tokens: torch.Tensor):
+        self.history = torch.cat([self.history, next_tokens.view(-1, 1)], dim=1)
+    
+    def reorder(self, indices: torch.Tensor):
+        self.history = self.history.index_select(0, indices)
+    
+    def __call__(self, logits: torch.Tensor) -> torch.Tensor:
+        if self.history is None or self.history.size(1) == 0:
+            return logits
+        scores = logits.gather(1, self.history)
+        scores = torch.where(scores > 0, scores / self.penalty, scores * self.penalty)
+        return logits.scatter_(1, self.history, scores)
+
+class NoRepeatNGramLogitsProcessor(LogitsProcessor):
+    """Block any token that would repeat an n-gram already in the row.
+    
+    Each row keeps a hash table from (n-1)-token prefixes to the tokens that
+    followed them, updated with one entry per generated token, so finding
+    the banned tokens is a single lookup per row.
+    """
+    
+    def __init__(self, ngram_size: int):
+        self.ngram_size = ngram_size
+        self.histories: List[List[int]] = []
+        self.tables: List[Dict[Tuple[int, ...], Set[int]]] = []
+    
+    def _add_last_ngram(self, row: int):
+        history = self.histories[row]
+        if len(history) >= self.ngram_size:
+            prefix = tuple(history[-self.ngram_size:-1])
+            self.tables[row].setdefault(prefix, set()).add(history[-1])
+    
+    def start(self, input_ids: torch.Tensor, attention_mask: Optional[torch.Tensor] = None):
+        rows = input_ids.tolist()
+        if attention_mask is not None:
+            rows = [
+                [token for token, keep in zip(row, mask) if keep]
+                for row, mask in zip(rows, attention_mask.tolist())
+            ]
+        self.histories = []
+        self.tables = []
+        for row, history in enumerate(rows):
+            self.histories.append([])
+            self.tables.append({})
+            for token in history:
+                self.histories[row].append(token)
+                self._add_last_ngram(row)
+    
+    def update(self, next_tokens: torch.Tensor):
+        for row, token in enumerate(next_tokens.view(-1).tolist()):
+            self.histories[row].append(token)
+            self._add_last_ngram(row)
+    
+    def reorder(self, indices: torch.Tensor):
+        # A row selected more than once (beam search) gets its own copy
+        histories, tables, seen = [], [], set()
+        for index in indices.tolist():
+            if index in seen:
+                histories.append(list(self.histories[index]))
+                tables.append({prefix: set(tokens) for prefix, tokens in self.tables[index].items()})
+            else:
+                histories.append(self.histories[index])
+                tables.append(self.tables[index])
+                seen.add(index)
+        self.histories, self.tables = histories, tables
+    
+    def __call__(self, logits: torch.Tensor) -> torch.Tensor:
+        prefix_length = self.ngram_size - 1
+        rows, tokens = [], []
+        for row, history in enumerate(self.histories):
+            if len(history) < prefix_length:
+                continue
+            prefix = tuple(history[len(history) - prefix_length:])
+            banned = self.tables[row].get(prefix)
+            if banned:
+                rows.extend([row] * len(banned))
+                tokens.extend(banned)
+        if rows:
+            logits[torch.tensor(rows, device=logits.device), torch.tensor(tokens, device=logits.device)] = float('-inf')
+        return logits
+
+class LogitsProcessorList(list):
+    """Apply processors in order and fan out state updates."""
+    
+    def start(self, input_ids: torch.Tensor, attention_mask: Optional[torch.Tensor] = None):
+        for processor in self:
+            processor.start(input_ids, attention_mask)
+    
+    def update(self, next_tokens: torch.Tensor):
+        for processor in self:
+            processor.update(next_tokens)
+    
+    def reorder(self, indices: torch.Tensor):
+        for processor in self:
+            processor.reorder(indices)
+    
+    def __call__(self, logits: torch.Tensor) -> torch.Tensor:
+        for processor in self:
+            logits = processor(logits)
+        return logits
+
+def build_logits_processors(temperatures: Optional[torch.Tensor] = None, top_ks: Optional[torch.Tensor] = None,
+                            top_ps: Optional[torch.Tensor] = None, repetition_penalty: float = 1.0,
+                            no_repeat_ngram_size: int = 0) -> LogitsProcessorList:
+    """Build the processor pipeline, skipping processors that would be no-ops.
+    
+    Penalties run on raw logits before temperature and the top-k/top-p
+    filters shape the sampling distribution.
+    """
+    processors = LogitsProcessorList()
+    if repetition_penalty and repetition_penalty != 1.0:
+        processors.append(RepetitionPenaltyLogitsProcessor(repetition_penalty))
+    if no_repeat_ngram_size and no_repeat_ngram_size > 0:
+        processors.append(NoRepeatNGramLogitsProcessor(no_repeat_ngram_size))
+    if temperatures is not None:
+        processors.append(TemperatureLogitsProcessor(temperatures))
+    if top_ks is not None and bool((top_ks > 0).any()):
+        processors.append(TopKLogitsProcessor(top_ks))
+    if top_ps is not None and bool((top_ps < 1.0).any()):
+        processors.append(TopPLogitsProcessor(top_ps))
+    return processors
+
+def sample_next_tokens(logits: torch.Tensor, greedy: Optional[torch.Tensor] = None) -> torch.Tensor:
+    """Sample one token per row from processed logits; greedy rows take the argmax."""
+    if greedy is not None and bool(greedy.all()):
+        return logits.argmax(dim=-1, keepdim=True)
+    next_tokens = torch.multinomial(logits.softmax(dim=-1), num_samples=1)
+    if greedy is not None and bool(greedy.any()):
+        next_tokens = torch.where(greedy.unsqueeze(1), logits.argmax(dim=-1, keepdim=True), next_tokens)
+    return next_tokens
+
+# =============================================================================
+# Beam Search
+# =============================================================================
+
+def beam_search(decode_step: Callable, input_ids: torch.Tensor, num_beams: int, max_new_tokens: int,
+                eos_token_id: int, processors: Optional[LogitsProcessorList] = None,
+                length_penalty: float = 1.0, early_stopping: bool = True) -> torch.Tensor:
+    """Batched beam search over a key/value-cached decoder for a (1, seq) prompt.
+    
+    decode_step(input_ids, past_key_values) must return (last-position
+    logits, presents). All beams advance in one (num_beams, 1) step; after
+    each step the cache and processor state are reordered to follow the
+    surviving beams. Finished hypotheses are ranked by
+    sum(log p) / new_tokens ** length_penalty.
+    """
+    processors = processors if processors is not None else LogitsProcessorList()
+    device = input_ids.device
+    
+    # Prefill once, then fan the prompt's cache out to every beam
+    logits, past_key_values = decode_step(input_ids)
+    beam_index = torch.zeros(num_beams, dtype=torch.long, device=device)
+    past_key_values = [(key.index_select(0, beam_index), value.index_select(0, beam_index))
+                       for key, value in past_key_values]
+    logits = logits.index_select(0, beam_index)
+    processors.start(input_ids.index_select(0, beam_index))
+    
+    sequences = input_ids.index_select(0, beam_index)
+    beam_scores = torch.full((num_beams,), float('-inf'), device=device)
+    beam_scores[0] = 0.0  # identical beams: only expand the first one at step 0
+    finished: List[Tuple[float, torch.Tensor]] = []
+    
+    for step in range(max_new_tokens):
+        log_probs = F.log_softmax(processors(logits.float()), dim=-1)
+        vocab_size = log_probs.size(-1)
+        candidate_scores, candidate_ids = (log_probs + beam_scores.unsqueeze(1)).view(-1).topk(2 * num_beams)
+        
+        next_beams, next_tokens, next_scores = [], [], []
+        for score, candidate in zip(candidate_scores.tolist(), candidate_ids.tolist()):
+            beam, token = divmod(candidate, vocab_size)
+            if score == float('-inf'):
+                break
+            if token == eos_token_id:
+                finished.append((score / (step + 1) ** length_penalty,
+                                 torch.cat([sequences[beam], sequences.new_tensor([token])])))
+            else:
+                next_beams.append(beam)
+                next_tokens.append(token)
+                next_scores.append(score)
+            if len(next_beams) == num_beams:
+                break
+        
+        finished.sort(key=lambda item: item[0], reverse=True)
+        finished = finished[:num_beams]
+        if not next_beams or (early_stopping and len(finished) >= num_beams):
+            break
+        
+        # Stop once no running beam can beat the worst kept hypothesis
+        if len(finished) >= num_beams:
+            best_running = max(next_scores) / (step + 1) ** length_penalty
+            if best_running <= finished[-1][0]:
+                break
+        
+        beam_index = torch.tensor(next_beams, device=device)
+        tokens = torch.tensor(next_tokens, device=device)
+        sequences = torch.cat([sequences.index_select(0, beam_index), tokens.unsqueeze(1)], dim=1)
+        beam_scores = torch.tensor(next_scores, device=device)
+        if len(next_beams) < num_beams:
+            # Fewer live candidates than beams: pad with dead beams
+            pad = num_beams - len(next_beams)
+            beam_index = torch.cat([beam_index, beam_index[:1].expand(pad)])
+            tokens = torch.cat([tokens, tokens[:1].expand(pad)])
+            sequences = torch.cat([sequences, sequences[:1].expand(pad, -1)])
+            beam_scores = torch.cat([beam_scores, beam_scores.new_full((pad,), float('-inf'))])
+        
+        past_key_values = [(key.index_select(0, beam_index), value.index_select(0, beam_index))
+                           for key, value in past_key_values]
+        processors.reorder(beam_index)
+        processors.update(tokens)
+        
+        if step + 1 < max_new_tokens:
+            logits, past_key_values = decode_step(tokens.unsqueeze(1), past_key_values)
+    
+    else:
+        # Running beams count as hypotheses when generation hits the length limit
+        generated = sequences.size(1) - input_ids.size(1)
+        for beam in range(num_beams):
+            score = float(beam_scores[beam])
+            if score > float('-inf'):
+                finished.append((score / max(generated, 1) ** length_penalty, sequences[beam]))
+    
+    if not finished:
+        return sequences[:1]
+    
+    best_score, best_sequence = max(finished, key=lambda item: item[0])
+    return best_sequence.unsqueeze(0)
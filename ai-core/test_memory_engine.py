@@ -0,0 +1,140 @@
+"""
+Tests for MemoryEngine near-duplicate detection and its vector index manager.
+"""
+
+import asyncio
+import os
+
+import numpy as np
+import pytest
+import yaml
+
+class CountingEncoder:
+    """Stand-in for SentenceTransformer that counts encode calls."""
+    
+    def __init__(self, model_name: str):
+        self.calls = 0
+    
+    def get_sentence_embedding_dimension(self) -> int:
+        return 8
+    
+    def encode(self, text: str) -> np.ndarray:
+        self.calls += 1
+        return np.random.RandomState(len(text)).rand(8).astype(np.float32)
+
+@pytest.fixture(scope='module')
+def memory_engine(tmp_path_factory):
+    """The memoryEngine module; it opens logs/memory_engine.log in the working directory on import."""
+    log_root = tmp_path_factory.mktemp('memory_engine')
+    (log_root / 'logs').mkdir()
+    cwd = os.getcwd()
+    os.chdir(log_root)
+    try:
+        return pytest.importorskip('memoryEngine')
+    finally:
+        os.chdir(cwd)
+
+@pytest.fixture
+def make_engine(memory_engine, tmp_path, monkeypatch):
+    """Build MemoryEngines over one SQLite file under tmp_path."""
+    monkeypatch.setattr(memory_engine, 'SentenceTransformer', CountingEncoder)
+    monkeypatch.setattr(memory_engine.nltk, 'download', lambda *args, **kwargs: None)
+    config_path = tmp_path / 'config.yaml'
+    config_path.write_text(yaml.safe_dump({'memory_engine': {
+        'database_path': str(tmp_path / 'data' / 'memory.db'),
+        'dedup': {'min_tokens': 4, 'minhash_max_tokens': 64, 'max_hamming_distance': 3, 'min_jaccard': 0.7}
+    }}))
+    engines = []
+    
+    def make():
+        engine = memory_engine.MemoryEngine(str(config_path))
+        engines.append(engine)
+        return engine
+    
+    yield make
+    for engine in engines:
+        engine.shutdown()
+
+SHORT_TEXT = 'Remind me to take my blood pressure pills at eight tonight'
+SHORT_EDIT = 'Remind me to take my blood pressure pills at nine tonight'
+
+# A fixed timestamp keeps text node IDs deterministic
+ALICE = {'user_id': 'alice', 'timestamp': '2026-01-01T09:00:00'}
+
+def test_short_near_duplicate_is_aliased_without_processing(memory_engine, make_engine, monkeypatch):
+    engine = make_engine()
+    canonical_id = asyncio.run(engine.process_text(SHORT_TEXT, ALICE))
+    
+    summaries = []
+    generate_summary = engine._generate_summary
+    monkeypatch.setattr(engine, '_generate_summary', lambda text: summaries.append(text) or generate_summary(text))
+    encode_calls = engine.model.calls
+    
+    duplicate_id = engine._generate_text_id(SHORT_EDIT, ALICE)
+    assert asyncio.run(engine.process_text(SHORT_EDIT, ALICE)) == canonical_id
+    
+    # One changed word is beyond the SimHash distance for a text this short
+    index = memory_engine.SimHashIndex
+    tokens = index.tokenize(SHORT_TEXT), index.tokenize(SHORT_EDIT)
+    assert index.distance(index.fingerprint(tokens[0]), index.fingerprint(tokens[1])) > 3
+    
+    assert engine.node_aliases == {duplicate_id: canonical_id}
+    assert engine.memory_nodes[canonical_id].metadata['aliases'] == [duplicate_id]
+    assert duplicate_id not in engine.memory_nodes
+    assert engine.model.calls == encode_calls and summaries == []
+    assert engine.duplicates_skipped == 1
+    assert asyncio.run(engine.get_context(duplicate_id))['node']['id'] == canonical_id
+
+def test_distinct_texts_and_other_users_are_kept(make_engine):
+    engine = make_engine()
+    first = asyncio.run(engine.process_text(SHORT_TEXT, ALICE))
+    other_text = asyncio.run(engine.process_text('What is the weather going to be like tomorrow morning', ALICE))
+    other_user = asyncio.run(engine.process_text(SHORT_EDIT, {'user_id': 'bob', 'timestamp': '2026-01-01T09:00:00'}))
+    
+    assert len({first, other_text, other_user}) == 3
+    assert engine.node_aliases == {} and engine.duplicates_skipped == 0
+
+def test_long_near_duplicate_uses_simhash(make_engine):
+    engine = make_engine()
+    words = [f'word{i}' for i in range(200)]
+    canonical_id = asyncio.run(engine.process_text(' '.join(words), {}))
+    words[100] = 'changed'
+    assert asyncio.run(engine.process_text(' '.join(words), {})) == canonical_id
+    
+    canonical = engine.memory_nodes[canonical_id]
+    assert 'simhash' in canonical.metadata and 'minhash' not in canonical.metadata
+    assert engine.duplicates_skipped == 1
+
+def test_indexes_and_aliases_are_rebuilt_on_load(make_engine):
+    engine = make_engine()
+    canonical_id = asyncio.run(engine.process_text(SHORT_TEXT, ALICE))
+    duplicate_id = engine._generate_text_id(SHORT_EDIT, ALICE)
+    asyncio.run(engine.process_text(SHORT_EDIT, ALICE))
+    engine.shutdown()
+    
+    reloaded = make_engine()
+    assert reloaded.node_aliases == {duplicate_id: canonical_id}
+    assert len(reloaded.simhash_index) == len(reloaded.minhash_index) == 1
+    assert asyncio.run(reloaded.get_context(duplicate_id))['node']['id'] == canonical_id
+    
+    text = 'Remind me to take my blood pressure pills at ten tonight'
+    assert asyncio.run(reloaded.process_text(text, ALICE)) == canonical_id
+    assert reloaded.model.calls == 0
+
+def test_vector_index_keeps_adds_made_during_rebuild(memory_engine):
+    # Frequent removals keep triggering compacting rebuilds of the exact flat index
+    manager = memory_engine.VectorIndexManager(16)
+    vectors = np.random.RandomState(0).rand(400, 16).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    for i, vector in enumerate(vectors):
+        manager.add(f'node{i}', vector)
+        if i % 3 == 0:
+            manager.remove(f'node{i}')
+    manager.shutdown()
+    
+    stats = manager.get_stats()
+    assert stats['rebuild_count'] >= 1
+    assert stats['live_vectors'] == stats['index_rows'] - stats['dead_rows'] == 266
+    for i, vector in enumerate(vectors):
+        if i % 3:
+            assert manager.search(vector, 1)[0][0] == f'node{i}'
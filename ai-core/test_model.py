@@ -0,0 +1,77 @@
+"""
+Tests for the ai-core transformer and the CareConnectModel wrapper.
+"""
+
+import math
+
+import torch
+
+from benchmark import perplexity
+from model import CareConnectTransformer
+
+def test_quantized_model_runs_batched_perplexity(tiny_config):
+    torch.manual_seed(0)
+    model = CareConnectTransformer(tiny_config)
+    model.eval()
+    input_ids = torch.randint(4, tiny_config.vocab_size, (3, 12))
+    fp32_ppl = perplexity(model, input_ids)
+    
+    model.quantize('int8')
+    logits = model(input_ids)
+    assert logits.shape == (3, 12, tiny_config.vocab_size)
+    int8_ppl = perplexity(model, input_ids)
+    assert math.isfinite(int8_ppl)
+    assert abs(int8_ppl / fp32_ppl - 1.0) < 0.05
+
+def test_generate_response_records_the_turn(make_care_model):
+    model = make_care_model()
+    response = model.generate_response('alice', 'Hello there.', max_length=4)
+    
+    assert isinstance(response, str)
+    history = model.memory_system.get_history('alice')
+    assert [(entry['message'], entry['response']) for entry in history] == [('Hello there.', response)]
+    assert model.memory_system.get_context('alice', 'Again.')['recent_interactions'][0]['message'] == 'Hello there.'
+
+def test_generate_response_batch_keeps_users_apart(make_care_model):
+    model = make_care_model()
+    responses = model.generate_response_batch([
+        {'user_id': 'alice', 'message': 'First question.', 'max_length': 3},
+        {'user_id': 'bob', 'message': 'Second question.', 'max_length': 5, 'temperature': 1.0}
+    ])
+    
+    assert len(responses) == 2 and all(isinstance(response, str) for response in responses)
+    assert [entry['message'] for entry in model.memory_system.get_history('alice')] == ['First question.']
+    assert [entry['message'] for entry in model.memory_system.get_history('bob')] == ['Second question.']
+
+def test_memory_window_and_resident_users_are_bounded(make_care_model):
+    memory = make_care_model(max_conversation_length=3, max_memory_users=2).memory_system
+    for i in range(5):
+        memory.add_to_memory('alice', f'message {i}', f'response {i}', {})
+    assert [entry['message'] for entry in memory.get_history('alice')] == ['message 2', 'message 3', 'message 4']
+    
+    memory.add_to_memory('bob', 'hi', 'hello', {})
+    memory.add_to_memory('carol', 'hi', 'hello', {})
+    assert list(memory.windows) == ['bob', 'carol']
+    assert memory.get_history('alice') == []
+
+def test_context_builder_truncates_history_to_budget(make_care_model):
+    model = make_care_model(context_window=256, context_recent_turns=1, context_summary_words=4)
+    for i in range(12):
+        model.memory_system.add_to_memory(
+            'alice', f'Tell me about topic number {i}, please.', f'Topic {i} is a long and detailed subject.', {}
+        )
+    
+    max_new_tokens = 16
+    prompt_ids = model.context_builder.build('alice', 'What next?', max_new_tokens)
+    current_ids = model.tokenizer.encode_batch(['User: What next?\nAssistant:'])[0]
+    assert len(prompt_ids) <= model.context_builder.token_budget(max_new_tokens) == 255 - max_new_tokens
+    assert prompt_ids[-len(current_ids):] == current_ids
+    
+    stats = model.context_builder.get_stats()
+    assert stats['verbatim_turns'] == 1 and stats['summarized_turns'] > 0
+    assert stats['dropped_turns'] > 0
+    assert stats['verbatim_turns'] + stats['summarized_turns'] + stats['dropped_turns'] == 12
+    
+    # A message longer than the budget keeps only its newest tokens
+    long_ids = model.context_builder.build('alice', 'word ' * 200, max_new_tokens)
+    assert len(long_ids) == 255 - max_new_tokens
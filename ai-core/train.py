@@ -17,7 +17,7 @@ import matplotlib.pyplot as plt
 from sklearn.model_selection import train_test_split
 import yaml
 
-from model import CareConnectModel, ModelConfig, SimpleTokenizer
+from model import CareConnectModel, ModelConfig, BPETokenizer
 
 # =============================================================================
 # Configuration
@@ -50,26 +50,21 @@ def load_training_config(config_path: str = "config.yaml") -> Dict[str, Any]:
 class CareConnectDataset(Dataset):
     """Dataset for CareConnect training data."""
     
-    def __init__(self, data: List[Dict[str, str]], tokenizer: SimpleTokenizer, max_length: int = 2048):
+    def __init__(self, data: List[Dict[str, str]], tokenizer: BPETokenizer, max_length: int = 2048):
         self.data = data
         self.tokenizer = tokenizer
         self.max_length = max_length
         
+        # Combine input and target for language modeling and tokenize up front
+        self.encoded = tokenizer.encode_batch(
+            [f"{item.get('input', '')} {item.get('target', '')}" for item in data]
+        )
+    
     def __len__(self):
         return len(self.data)
     
     def __getitem__(self, idx):
-        item = self.data[idx]
-        
-        # Combine input and target for language modeling
-        input_text = item.get('input', '')
-        target_text = item.get('target', '')
-        
-        # Create full sequence
-        full_text = f"{input_text} {target_text}"
-        
-        # Tokenize
-        input_ids = self.tokenizer.encode(full_text, return_tensors='pt').squeeze(0)
+        input_ids = torch.tensor(self.encoded[idx], dtype=torch.long)
         
         # Truncate if too long
         if len(input_ids) > self.max_length:
@@ -461,8 +456,15 @@ def main():
     training_data = load_training_data()
     logging.info(f"Loaded {len(training_data)} training samples")
     
-    # Create tokenizer
-    tokenizer = SimpleTokenizer()
+    # Use the model's shared tokenizer, training it on this corpus if no vocab exists yet
+    tokenizer = model.tokenizer
+    if not tokenizer.is_trained:
+        tokenizer.train(
+            [f"{item.get('input', '')} {item.get('target', '')}" for item in training_data],
+            model_config.vocab_size
+        )
+        tokenizer.save(model_config.tokenizer_path)
+        logging.info(f"Tokenizer saved to {model_config.tokenizer_path}")
     
     # Split data
     train_data, val_data = train_test_split(
@@ -0,0 +1,580 @@
+"""
+CareConnect v5.0 - The Steward AI Engine
+Inference benchmarks for the CareConnect model
+"""
+
+import torch
+import torch.nn.functional as F
+import json
+import os
+import io
+import gc
+import gzip
+import pickle
+import tempfile
+import threading
+import multiprocessing
+import logging
+import argparse
+import sys
+import time
+from dataclasses import replace
+from typing import Dict, List, Any
+import psutil
+from torch.utils.data import Dataset
+
+from model import CareConnectModel, ModelConfig, ModelManager, SelfAttention, VocabTokenizer, hash_state_dict
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def build_benchmark_config(args: argparse.Namespace) -> ModelConfig:
+    """Build a CPU model configuration from command line overrides"""
+    return ModelConfig(
+        vocab_size=args.vocab_size,
+        embedding_dim=args.embedding_dim,
+        hidden_dim=args.hidden_dim,
+        num_layers=args.layers,
+        num_heads=args.heads,
+        dropout=0.0,
+        differential_privacy=False,
+        device="cpu"
+    )
+
+def random_input_ids(config: ModelConfig, length: int, batch_size: int = 1) -> torch.Tensor:
+    """Create random token IDs"""
+    return torch.randint(0, config.vocab_size - 1, (batch_size, length), dtype=torch.long)
+
+def process_rss_mb() -> float:
+    """Resident set size of this process in MB"""
+    gc.collect()
+    return psutil.Process(os.getpid()).memory_info().rss / (1024 * 1024)
+
+def state_dict_size_mb(model: torch.nn.Module) -> float:
+    """Serialized size of a model's weights in MB"""
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell() / (1024 * 1024)
+
+def perplexity(model: CareConnectModel, input_ids: torch.Tensor) -> float:
+    """Next-token perplexity of a batch of sequences"""
+    with torch.no_grad():
+        logits = model(input_ids)["logits"]
+    loss = F.cross_entropy(logits[:, :-1].reshape(-1, logits.size(-1)), input_ids[:, 1:].reshape(-1))
+    return float(torch.exp(loss))
+
+def print_results(title: str, rows: List[Dict[str, Any]]):
+    """Print benchmark rows as an aligned table"""
+    print(f"\n{title}")
+    print("-" * 60)
+    if not rows:
+        print("No results")
+        return
+    
+    def fmt(value):
+        return f"{value:.3f}" if isinstance(value, float) else str(value)
+    
+    columns = list(rows[0].keys())
+    widths = [max(len(col), *(len(fmt(row.get(col, ""))) for row in rows)) for col in columns]
+    print("  ".join(col.rjust(width) for col, width in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(fmt(row.get(col, "")).rjust(width) for col, width in zip(columns, widths)))
+
+def benchmark_quantization(config: ModelConfig, prompt_length: int = 128, new_tokens: int = 32,
+                           eval_sequences: int = 8, repeats: int = 1) -> List[Dict[str, Any]]:
+    """Compare fp32 and dynamic int8 inference on CPU
+    
+    Both variants share the same weights; perplexity is measured on the same
+    sequences so the int8 row shows the drift introduced by quantization.
+    """
+    torch.manual_seed(0)
+    prompt = random_input_ids(config, prompt_length)
+    eval_ids = random_input_ids(config, prompt_length, eval_sequences)
+    prompt_text = " ".join(f"word{i}" for i in range(prompt_length))
+    baseline_rss = process_rss_mb()
+    
+    fp32_model = CareConnectModel(config)
+    fp32_model.eval()
+    weights = fp32_model.state_dict()
+    
+    results = []
+    for mode in ("fp32", "int8"):
+        if mode == "int8":
+            model = CareConnectModel(config)
+            model.load_state_dict(weights)
+            model.quantize("int8")
+            del fp32_model, weights
+        else:
+            model = fp32_model
+        rss = process_rss_mb() - baseline_rss
+        
+        latencies = []
+        throughputs = []
+        for _ in range(repeats):
+            with torch.no_grad():
+                start_time = time.perf_counter()
+                model(prompt)
+                latencies.append(time.perf_counter() - start_time)
+            
+            torch.manual_seed(0)
+            start_time = time.perf_counter()
+            model.generate(prompt_text, max_length=new_tokens, safety_check=False)
+            throughputs.append(new_tokens / (time.perf_counter() - start_time))
+        
+        row = {
+            "mode": mode,
+            "forward_ms": min(latencies) * 1000,
+            "tok_per_s": max(throughputs),
+            "weights_mb": state_dict_size_mb(model),
+            "rss_mb": rss,
+            "perplexity": perplexity(model, eval_ids)
+        }
+        results.append(row)
+        logger.info(f"Quantization benchmark: {row}")
+    
+    fp32_row, int8_row = results
+    fp32_row["ppl_drift_pct"] = 0.0
+    int8_row["ppl_drift_pct"] = (int8_row["perplexity"] / fp32_row["perplexity"] - 1.0) * 100
+    return results
+
+def benchmark_checkpoint(config: ModelConfig, repeats: int = 1) -> List[Dict[str, Any]]:
+    """Compare legacy gzip-pickle and memory-mapped tensor-blob checkpoints"""
+    torch.manual_seed(0)
+    model = CareConnectModel(config)
+    results = []
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        legacy_path = os.path.join(tmp_dir, "legacy.pt")
+        blob_path = os.path.join(tmp_dir, "blob.pt")
+        
+        start_time = time.perf_counter()
+        with gzip.open(legacy_path, "wb") as f:
+            pickle.dump({"model_state_dict": model.state_dict(), "config": model.config}, f)
+        legacy_save = time.perf_counter() - start_time
+        
+        start_time = time.perf_counter()
+        model.save_model(blob_path)
+        blob_save = time.perf_counter() - start_time
+        del model
+        
+        for name, path, save_time, verify in (("gzip_pickle", legacy_path, legacy_save, False),
+                                             ("tensor_blob", blob_path, blob_save, False),
+                                             ("tensor_blob+verify", blob_path, blob_save, True)):
+            target = CareConnectModel(config)
+            load_times = []
+            for _ in range(repeats):
+                baseline_rss = process_rss_mb()
+                start_time = time.perf_counter()
+                target.load_model(path, verify=verify)
+                load_times.append(time.perf_counter() - start_time)
+                rss = process_rss_mb() - baseline_rss
+            
+            start_time = time.perf_counter()
+            hash_state_dict(target.state_dict())
+            hash_time = time.perf_counter() - start_time
+            
+            row = {
+                "format": name,
+                "file_mb": os.path.getsize(path) / (1024 * 1024),
+                "save_s": save_time,
+                "load_s": min(load_times),
+                "load_rss_mb": rss,
+                "hash_s": hash_time
+            }
+            results.append(row)
+            logger.info(f"Checkpoint benchmark: {row}")
+            del target
+    
+    return results
+
+def time_call(fn, repeats: int) -> float:
+    """Best wall time of fn() over repeats, in milliseconds"""
+    timings = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start_time)
+    return min(timings) * 1000
+
+def benchmark_attention(config: ModelConfig, lengths: List[int] = (128, 512, 1024, 2048),
+                        batch_size: int = 1, repeats: int = 3) -> List[Dict[str, Any]]:
+    """Forward latency per sequence length: unfused MHA vs fused SDPA attention
+    
+    The MHA baseline gets an explicit causal mask and returns attention
+    weights, which is the path the previous TransformerBlock took.
+    """
+    torch.manual_seed(0)
+    attention = SelfAttention(config).eval()
+    reference = torch.nn.MultiheadAttention(
+        config.embedding_dim, config.num_heads, dropout=0.0, batch_first=True
+    ).eval()
+    with torch.no_grad():
+        reference.in_proj_weight.copy_(attention.in_proj.weight)
+        reference.in_proj_bias.copy_(attention.in_proj.bias)
+        reference.out_proj.weight.copy_(attention.out_proj.weight)
+        reference.out_proj.bias.copy_(attention.out_proj.bias)
+    model = CareConnectModel(config).eval()
+    
+    results = []
+    for length in lengths:
+        if length > config.max_seq_length:
+            logger.warning(f"Skipping length {length} > max_seq_length {config.max_seq_length}")
+            continue
+        x = torch.randn(batch_size, length, config.embedding_dim)
+        causal_mask = torch.triu(torch.full((length, length), float("-inf")), diagonal=1)
+        input_ids = random_input_ids(config, length, batch_size)
+        
+        with torch.no_grad():
+            mha_ms = time_call(lambda: reference(x, x, x, attn_mask=causal_mask), repeats)
+            sdpa_ms = time_call(lambda: attention(x, is_causal=True), repeats)
+            forward_ms = time_call(lambda: model(input_ids), repeats)
+            max_error = (reference(x, x, x, attn_mask=causal_mask)[0] - attention(x, is_causal=True)[0]).abs().max()
+        
+        row = {
+            "seq_length": length,
+            "mha_ms": mha_ms,
+            "sdpa_ms": sdpa_ms,
+            "speedup": mha_ms / sdpa_ms,
+            "max_abs_error": float(max_error),
+            "model_forward_ms": forward_ms
+        }
+        results.append(row)
+        logger.info(f"Attention benchmark: {row}")
+    
+    return results
+
+def sample_texts(count: int, words_per_text: int = 64) -> List[str]:
+    """Synthetic conversation-like texts with a Zipf-shaped word distribution"""
+    generator = torch.Generator().manual_seed(0)
+    vocabulary = [f"word{i}" for i in range(5000)] + [",", ".", "?", "!"]
+    weights = 1.0 / torch.arange(1, len(vocabulary) + 1, dtype=torch.float)
+    indices = torch.multinomial(weights, count * words_per_text, replacement=True, generator=generator)
+    words = [vocabulary[i] for i in indices.tolist()]
+    return [" ".join(words[i * words_per_text:(i + 1) * words_per_text]) for i in range(count)]
+
+def legacy_hash_encode(texts: List[str], vocab_size: int) -> torch.Tensor:
+    """The previous per-word hash tokenization, padded into one tensor"""
+    sequences = [[hash(word) % vocab_size for word in text.split()] for text in texts]
+    width = max(len(ids) for ids in sequences)
+    return torch.tensor([ids + [0] * (width - len(ids)) for ids in sequences])
+
+def benchmark_tokenizer(config: ModelConfig, batch_sizes: List[int] = (64, 256, 1024, 4096),
+                        words_per_text: int = 64, repeats: int = 3) -> List[Dict[str, Any]]:
+    """Batched encode/decode throughput: legacy hash tokenization vs VocabTokenizer"""
+    tokenizer = VocabTokenizer()
+    tokenizer.train(sample_texts(2000, words_per_text), config.vocab_size)
+    
+    results = []
+    for batch_size in batch_sizes:
+        texts = sample_texts(batch_size, words_per_text)
+        input_ids, attention_mask = tokenizer.encode_batch(texts)
+        num_tokens = int(attention_mask.sum())
+        
+        legacy_ms = time_call(lambda: legacy_hash_encode(texts, config.vocab_size), repeats)
+        encode_ms = time_call(lambda: tokenizer.encode_batch(texts), repeats)
+        decode_ms = time_call(lambda: tokenizer.decode_batch(input_ids, attention_mask), repeats)
+        
+        row = {
+            "batch_size": batch_size,
+            "tokens": num_tokens,
+            "legacy_encode_ms": legacy_ms,
+            "encode_ms": encode_ms,
+            "encode_tok_per_s": num_tokens / (encode_ms / 1000),
+            "decode_ms": decode_ms,
+            "decode_tok_per_s": num_tokens / (decode_ms / 1000),
+            "round_trip_ok": tokenizer.decode_batch(input_ids, attention_mask) == texts
+        }
+        results.append(row)
+        logger.info(f"Tokenizer benchmark: {row}")
+    
+    return results
+
+class SyntheticSequenceDataset(Dataset):
+    """Sequences that follow a fixed random successor table, so next-token loss can fall to near zero"""
+    
+    def __init__(self, vocab_size: int, seq_length: int, num_samples: int, seed: int = 0):
+        generator = torch.Generator().manual_seed(seed)
+        successors = torch.randperm(vocab_size - 4, generator=generator) + 4
+        starts = torch.randint(4, vocab_size, (num_samples,), generator=generator)
+        sequences = [starts]
+        for _ in range(seq_length - 1):
+            sequences.append(successors[sequences[-1] - 4])
+        self.input_ids = torch.stack(sequences, dim=1)
+    
+    def __len__(self) -> int:
+        return self.input_ids.size(0)
+    
+    def __getitem__(self, idx: int) -> Dict[str, torch.Tensor]:
+        input_ids = self.input_ids[idx]
+        return {"input_ids": input_ids, "attention_mask": torch.ones_like(input_ids)}
+
+def benchmark_training(config: ModelConfig, seq_length: int = 64, num_samples: int = 256,
+                       epochs: int = 5) -> List[Dict[str, Any]]:
+    """Train on synthetic sequences with and without bf16 autocast
+    
+    Doubles as a smoke test: each row records whether the training loss
+    went down from the first epoch to the last.
+    """
+    dataset = SyntheticSequenceDataset(config.vocab_size, seq_length, num_samples)
+    
+    results = []
+    for mixed_precision in (False, True):
+        torch.manual_seed(0)
+        manager = ModelManager(replace(config, mixed_precision=mixed_precision, max_epochs=epochs))
+        history = manager.train(dataset, epochs=epochs)
+        
+        row = {
+            "precision": "bf16-autocast" if mixed_precision else "fp32",
+            "batch_size": config.batch_size,
+            "accumulation": config.gradient_accumulation_steps,
+            "first_loss": history[0]["train_loss"],
+            "last_loss": history[-1]["train_loss"],
+            "tok_per_s": max(entry["tokens_per_sec"] for entry in history),
+            "loss_decreased": history[-1]["train_loss"] < history[0]["train_loss"]
+        }
+        results.append(row)
+        logger.info(f"Training benchmark: {row}")
+    
+    return results
+
+class PeakRSSMonitor:
+    """Samples this process's RSS in a background thread and keeps the peak"""
+    
+    def __init__(self, interval: float = 0.002):
+        self.interval = interval
+        self.process = psutil.Process(os.getpid())
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+    
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self.process.memory_info().rss)
+            self._stop.wait(self.interval)
+    
+    def __enter__(self) -> "PeakRSSMonitor":
+        self.peak = self.process.memory_info().rss
+        self._thread.start()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.process.memory_info().rss)
+
+def _checkpointing_step(config: ModelConfig, batch_size: int, seq_length: int, repeats: int) -> Dict[str, float]:
+    """One configuration of the checkpointing benchmark; runs in a fresh process"""
+    torch.manual_seed(0)
+    model = CareConnectModel(config)
+    model.train()
+    batch = {"input_ids": random_input_ids(config, seq_length, batch_size)}
+    
+    def step():
+        loss, _, _ = model.compute_loss(batch)
+        loss.backward()
+        model.zero_grad(set_to_none=True)
+    
+    # Warm up allocator and autograd once before measuring
+    step()
+    baseline_rss = process_rss_mb()
+    with PeakRSSMonitor() as monitor:
+        step_ms = time_call(step, repeats)
+    
+    return {"step_ms": step_ms, "peak_rss_mb": monitor.peak / (1024 * 1024) - baseline_rss}
+
+def benchmark_checkpointing(config: ModelConfig, lengths: List[int] = (256, 512, 1024), batch_size: int = 4,
+                            repeats: int = 1) -> List[Dict[str, Any]]:
+    """Peak RSS and training step time with and without gradient checkpointing
+    
+    Each configuration runs in its own spawned process so memory freed by
+    an earlier run does not hide the next run's peak.
+    """
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for length in lengths:
+        if length > config.max_seq_length:
+            logger.warning(f"Skipping length {length} > max_seq_length {config.max_seq_length}")
+            continue
+        
+        measurements = {}
+        for enabled in (False, True):
+            run_config = replace(config, gradient_checkpointing=enabled)
+            with context.Pool(1) as pool:
+                measurements[enabled] = pool.apply(_checkpointing_step, (run_config, batch_size, length, repeats))
+        
+        baseline, checkpointed = measurements[False], measurements[True]
+        row = {
+            "seq_length": length,
+            "batch_size": batch_size,
+            "peak_rss_mb": baseline["peak_rss_mb"],
+            "ckpt_peak_rss_mb": checkpointed["peak_rss_mb"],
+            "memory_saved_pct": (1 - checkpointed["peak_rss_mb"] / baseline["peak_rss_mb"]) * 100
+            if baseline["peak_rss_mb"] > 0 else 0.0,
+            "step_ms": baseline["step_ms"],
+            "ckpt_step_ms": checkpointed["step_ms"],
+            "slowdown": checkpointed["step_ms"] / baseline["step_ms"]
+        }
+        results.append(row)
+        logger.info(f"Checkpointing benchmark: {row}")
+    
+    return results
+
+def benchmark_compile(config: ModelConfig, prompt_lengths: List[int] = (16, 128), new_tokens: int = 64,
+                      repeats: int = 1, backend: str = "inductor") -> List[Dict[str, Any]]:
+    """Eager vs torch.compile first-token and per-token decode latency on CPU
+    
+    First-token latency is the prompt prefill; per-token latency is the mean
+    cached single-token step after it. compile_s is the one-off warmup cost
+    paid at startup by the compiled model.
+    """
+    torch.manual_seed(0)
+    eager_model = CareConnectModel(config)
+    eager_model.eval()
+    
+    compiled_model = CareConnectModel(config)
+    compiled_model.load_state_dict(eager_model.state_dict())
+    start_time = time.perf_counter()
+    if not compiled_model.compile_for_inference(list(prompt_lengths), backend=backend):
+        logger.warning(f"Compilation unavailable: {compiled_model.compile_stats.get('error')}")
+    compile_seconds = time.perf_counter() - start_time
+    
+    results = []
+    for prompt_length in prompt_lengths:
+        prompt = random_input_ids(config, prompt_length)
+        for mode, model in (("eager", eager_model), ("compiled", compiled_model)):
+            first_token = []
+            per_token = []
+            for _ in range(repeats):
+                with torch.no_grad():
+                    start_time = time.perf_counter()
+                    logits, _, past_key_values = model.decode_step(prompt)
+                    first_token.append(time.perf_counter() - start_time)
+                    
+                    start_time = time.perf_counter()
+                    for _ in range(new_tokens):
+                        logits, _, past_key_values = model.decode_step(
+                            logits.argmax(dim=-1, keepdim=True), past_key_values
+                        )
+                    per_token.append((time.perf_counter() - start_time) / new_tokens)
+            
+            row = {
+                "prompt_length": prompt_length,
+                "mode": model.compile_stats["mode"] if mode == "compiled" else mode,
+                "first_token_ms": min(first_token) * 1000,
+                "per_token_ms": min(per_token) * 1000,
+                "compile_s": compile_seconds if mode == "compiled" else 0.0
+            }
+            results.append(row)
+            logger.info(f"Compile benchmark: {row}")
+    
+    return results
+
+def main():
+    """Main benchmark function"""
+    parser = argparse.ArgumentParser(description="CareConnect AI Engine Inference Benchmarks")
+    parser.add_argument("--vocab-size", type=int, default=50000, help="Vocabulary size")
+    parser.add_argument("--embedding-dim", type=int, default=768, help="Embedding dimension")
+    parser.add_argument("--hidden-dim", type=int, default=1024, help="Feed-forward dimension")
+    parser.add_argument("--layers", type=int, default=12, help="Number of transformer blocks")
+    parser.add_argument("--heads", type=int, default=12, help="Number of attention heads")
+    parser.add_argument("--repeats", type=int, default=1, help="Repetitions per measurement (best is kept)")
+    parser.add_argument("--output", type=str, help="Optional JSON file for results")
+    
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+    
+    quant_parser = subparsers.add_parser("quantize", help="Dynamic int8 quantization vs fp32 on CPU")
+    quant_parser.add_argument("--prompt-length", type=int, default=128, help="Prompt length in tokens")
+    quant_parser.add_argument("--new-tokens", type=int, default=32, help="Generated tokens per run")
+    quant_parser.add_argument("--eval-sequences", type=int, default=8, help="Sequences used for perplexity")
+    
+    attention_parser = subparsers.add_parser("attention", help="Unfused MHA vs fused SDPA forward latency")
+    attention_parser.add_argument("--lengths", type=int, nargs="+", default=[128, 512, 1024, 2048], help="Sequence lengths")
+    attention_parser.add_argument("--batch-size", type=int, default=1, help="Sequences per forward pass")
+    
+    subparsers.add_parser("checkpoint", help="gzip-pickle vs memory-mapped tensor-blob checkpoints")
+    
+    ckpt_parser = subparsers.add_parser("grad-checkpointing", help="Gradient checkpointing memory vs step time")
+    ckpt_parser.add_argument("--lengths", type=int, nargs="+", default=[256, 512, 1024], help="Sequence lengths")
+    ckpt_parser.add_argument("--batch-size", type=int, default=4, help="Sequences per training step")
+    
+    tokenizer_parser = subparsers.add_parser("tokenizer", help="Batched encode/decode throughput")
+    tokenizer_parser.add_argument("--batch-sizes", type=int, nargs="+", default=[64, 256, 1024, 4096], help="Texts per batch")
+    tokenizer_parser.add_argument("--words-per-text", type=int, default=64, help="Words in each text")
+    
+    train_parser = subparsers.add_parser("train", help="Training throughput and loss on synthetic data")
+    train_parser.add_argument("--tiny", action=argparse.BooleanOptionalAction, default=True,
+                              help="Use a tiny model instead of the size flags")
+    train_parser.add_argument("--seq-length", type=int, default=64, help="Tokens per sequence")
+    train_parser.add_argument("--samples", type=int, default=256, help="Synthetic sequences")
+    train_parser.add_argument("--epochs", type=int, default=5, help="Training epochs")
+    train_parser.add_argument("--batch-size", type=int, default=16, help="Micro-batch size")
+    train_parser.add_argument("--accumulation-steps", type=int, default=2, help="Micro-batches per optimizer step")
+    train_parser.add_argument("--learning-rate", type=float, default=3e-3, help="AdamW learning rate")
+    
+    compile_parser = subparsers.add_parser("compile", help="torch.compile decode step vs eager latency")
+    compile_parser.add_argument("--prompt-lengths", type=int, nargs="+", default=[16, 128], help="Prompt lengths in tokens")
+    compile_parser.add_argument("--new-tokens", type=int, default=64, help="Decode steps timed per prompt")
+    compile_parser.add_argument("--backend", type=str, default="inductor", help="torch.compile backend")
+    
+    args = parser.parse_args()
+    
+    config = build_benchmark_config(args)
+    results: Dict[str, Any] = {"torch_threads": torch.get_num_threads()}
+    
+    if args.benchmark == "quantize":
+        rows = benchmark_quantization(config, args.prompt_length, args.new_tokens, args.eval_sequences, args.repeats)
+        print_results("fp32 vs int8 dynamic quantization (CPU)", rows)
+        results["quantize"] = rows
+    
+    if args.benchmark == "attention":
+        rows = benchmark_attention(config, args.lengths, args.batch_size, args.repeats)
+        print_results("Attention forward latency (CPU)", rows)
+        results["attention"] = rows
+    
+    if args.benchmark == "checkpoint":
+        rows = benchmark_checkpoint(config, args.repeats)
+        print_results("Checkpoint save/load", rows)
+        results["checkpoint"] = rows
+    
+    if args.benchmark == "grad-checkpointing":
+        rows = benchmark_checkpointing(config, args.lengths, args.batch_size, args.repeats)
+        print_results("Gradient checkpointing: peak RSS and step time (CPU)", rows)
+        results["grad_checkpointing"] = rows
+    
+    if args.benchmark == "tokenizer":
+        rows = benchmark_tokenizer(config, args.batch_sizes, args.words_per_text, args.repeats)
+        print_results("Tokenizer throughput", rows)
+        results["tokenizer"] = rows
+    
+    if args.benchmark == "train":
+        if args.tiny:
+            config = replace(config, vocab_size=512, embedding_dim=64, hidden_dim=128, num_layers=2, num_heads=4)
+        config = replace(
+            config,
+            max_seq_length=max(args.seq_length, 8),
+            batch_size=args.batch_size,
+            gradient_accumulation_steps=args.accumulation_steps,
+            learning_rate=args.learning_rate
+        )
+        rows = benchmark_training(config, args.seq_length, args.samples, args.epochs)
+        print_results("Training on synthetic sequences", rows)
+        results["train"] = rows
+    
+    if args.benchmark == "compile":
+        rows = benchmark_compile(config, args.prompt_lengths, args.new_tokens, args.repeats, args.backend)
+        print_results("Eager vs compiled decoding latency (CPU)", rows)
+        results["compile"] = rows
+    
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults saved to {args.output}")
+    
+    if "train" in results and not all(row["loss_decreased"] for row in results["train"]):
+        logger.error("Training loss did not decrease")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""
+CareConnect v5.0 - The Steward AI Engine
+Shared pytest fixtures: a predictor over a tiny untrained model
+"""
+
+import json
+
+import pytest
+
+from predict import CareConnectPredictor
+
+TINY_CONFIG = dict(vocab_size=512, embedding_dim=64, hidden_dim=128, num_layers=2, num_heads=4,
+                   max_seq_length=128, device="cpu")
+
+@pytest.fixture
+def predictor(tmp_path):
+    """Predictor over a tiny untrained model, configured through a ModelConfig JSON"""
+    config_path = tmp_path / "model_config.json"
+    config_path.write_text(json.dumps(TINY_CONFIG))
+    predictor = CareConnectPredictor(str(tmp_path / "missing.pt"), str(config_path), intra_op_threads=1,
+                                     max_batch_size=4, max_batch_wait_ms=200.0)
+    yield predictor
+    predictor.stop_background_processing()
+
+@pytest.fixture
+def echo_prompts(predictor):
+    """Make the model answer each prompt with itself; returns the prompts it was asked"""
+    prompts_seen = []
+    
+    def generate_batch(prompts, **kwargs):
+        prompts_seen.extend(prompts)
+        return [f"echo: {prompt}" for prompt in prompts]
+    
+    predictor.model.generate_batch = generate_batch
+    predictor.model.generate = lambda prompt, *args, **kwargs: generate_batch([prompt])[0]
+    return prompts_seen
@@ -0,0 +1,154 @@
+"""
+CareConnect v5.0 - The Steward AI Engine
+Local load test for the prediction server
+
+Fires concurrent requests at /predict or /predict/stream and reports
+latency percentiles, time-to-first-token and throughput. Start the server
+first, e.g. `python predict.py --async-server --port 5001`.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PROMPTS = [
+    "How can I sleep better when I am stressed?",
+    "What should I ask my doctor about my new medication?",
+    "Can you help me plan a calm evening routine?",
+    "I feel lonely after moving to a new city.",
+    "How do I support a friend who is grieving?",
+    "What are some gentle exercises for back pain?"
+]
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of values"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(max(math.ceil(pct / 100.0 * len(ordered)) - 1, 0), len(ordered) - 1)
+    return ordered[index]
+
+async def send_request(session: aiohttp.ClientSession, url: str, stream: bool, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Send one request and time it; for streams also time the first token event"""
+    start_time = time.perf_counter()
+    first_token: Optional[float] = None
+    chunks = 0
+    
+    try:
+        async with session.post(url, json=payload) as response:
+            if response.status != 200:
+                return {"success": False, "status": response.status, "latency": time.perf_counter() - start_time}
+            
+            if not stream:
+                result = await response.json()
+                latency = time.perf_counter() - start_time
+                return {"success": result.get("success", True), "latency": latency, "ttft": latency, "chunks": 1}
+            
+            event = None
+            async for raw_line in response.content:
+                line = raw_line.decode("utf-8").rstrip("\r\n")
+                if line.startswith("event:"):
+                    event = line[len("event:"):].strip()
+                elif line.startswith("data:") and event == "token":
+                    chunks += 1
+                    if first_token is None:
+                        first_token = time.perf_counter() - start_time
+                elif line.startswith("data:") and event == "error":
+                    return {"success": False, "error": json.loads(line[len("data:"):])["error"],
+                            "latency": time.perf_counter() - start_time}
+            
+            latency = time.perf_counter() - start_time
+            return {"success": True, "latency": latency, "ttft": first_token if first_token is not None else latency,
+                    "chunks": chunks}
+    
+    except aiohttp.ClientError as e:
+        return {"success": False, "error": str(e), "latency": time.perf_counter() - start_time}
+
+async def run_load_test(base_url: str, requests: int, concurrency: int, stream: bool, max_length: int,
+                        temperature: float, timeout: float) -> Dict[str, Any]:
+    """Run `requests` requests with at most `concurrency` in flight"""
+    url = f"{base_url.rstrip('/')}/predict/stream" if stream else f"{base_url.rstrip('/')}/predict"
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+        async def worker(index: int) -> Dict[str, Any]:
+            payload = {"text": random.choice(PROMPTS), "max_length": max_length, "temperature": temperature}
+            async with semaphore:
+                return await send_request(session, url, stream, payload)
+        
+        start_time = time.perf_counter()
+        results = await asyncio.gather(*(worker(i) for i in range(requests)))
+        wall_time = time.perf_counter() - start_time
+    
+    succeeded = [result for result in results if result["success"]]
+    latencies = [result["latency"] for result in succeeded]
+    ttfts = [result["ttft"] for result in succeeded]
+    return {
+        "endpoint": url,
+        "requests": requests,
+        "concurrency": concurrency,
+        "succeeded": len(succeeded),
+        "failed": len(results) - len(succeeded),
+        "wall_time_s": wall_time,
+        "requests_per_s": len(succeeded) / wall_time if wall_time else 0.0,
+        "latency_p50_ms": percentile(latencies, 50) * 1000,
+        "latency_p99_ms": percentile(latencies, 99) * 1000,
+        "ttft_p50_ms": percentile(ttfts, 50) * 1000,
+        "ttft_p99_ms": percentile(ttfts, 99) * 1000,
+        "avg_chunks": sum(result["chunks"] for result in succeeded) / len(succeeded) if succeeded else 0.0
+    }
+
+def main():
+    """Main load test function"""
+    parser = argparse.ArgumentParser(description="CareConnect AI prediction server load test")
+    parser.add_argument("--url", type=str, default="http://127.0.0.1:5001", help="Server base URL")
+    parser.add_argument("--requests", type=int, default=200, help="Total requests")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32], help="Requests in flight")
+    parser.add_argument("--stream", action=argparse.BooleanOptionalAction, default=True,
+                        help="Use /predict/stream (SSE) instead of /predict")
+    parser.add_argument("--max-length", type=int, default=64, help="Tokens generated per request")
+    parser.add_argument("--temperature", type=float, default=0.7, help="Sampling temperature")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Per-request timeout in seconds")
+    parser.add_argument("--output", type=str, help="Optional JSON file for results")
+    
+    args = parser.parse_args()
+    random.seed(0)
+    
+    rows = []
+    for concurrency in args.concurrency:
+        row = asyncio.run(run_load_test(args.url, args.requests, concurrency, args.stream, args.max_length,
+                                        args.temperature, args.timeout))
+        rows.append(row)
+        logger.info(f"Load test: {row}")
+    
+    print(f"\nLoad test against {rows[0]['endpoint'] if rows else args.url}")
+    print("-" * 60)
+    columns = ["concurrency", "succeeded", "failed", "requests_per_s", "latency_p50_ms", "latency_p99_ms",
+               "ttft_p50_ms", "ttft_p99_ms"]
+    widths = [max(len(col), *(len(f"{row[col]:.1f}" if isinstance(row[col], float) else str(row[col])) for row in rows))
+              for col in columns]
+    print("  ".join(col.rjust(width) for col, width in zip(columns, widths)))
+    for row in rows:
+        cells = [f"{row[col]:.1f}" if isinstance(row[col], float) else str(row[col]) for col in columns]
+        print("  ".join(cell.rjust(width) for cell, width in zip(cells, widths)))
+    
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(rows, f, indent=2)
+        print(f"\nResults saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
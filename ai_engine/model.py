@@ -14,13 +14,22 @@ import torch
 import torch.nn as nn
 import torch.nn.functional as F
 from torch.utils.data import DataLoader, Dataset
+from torch.utils.checkpoint import checkpoint
 import numpy as np
 import json
 import logging
 import hashlib
 import time
-from typing import Dict, List, Tuple, Optional, Any
-from dataclasses import dataclass
+import mmap
+import os
+import struct
+import tempfile
+import math
+import re
+from collections import Counter, deque
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Tuple, Optional, Any
+from dataclasses import dataclass, asdict, fields
 from pathlib import Path
 import pickle
 import gzip
@@ -59,17 +68,154 @@ class ModelConfig:
     bias_detection: bool = True
     safety_checks: bool = True
     ethical_threshold: float = 0.8
+    neural_safety_interval: int = 8  # tokens between batched hidden-state checks, 0 disables
+    neural_safety_threshold: float = 0.2
     
     # Performance
     device: str = "auto"
     mixed_precision: bool = True
     gradient_clipping: float = 1.0
+    gradient_accumulation_steps: int = 1
+    gradient_checkpointing: bool = False  # recompute block activations during backward to save memory
+    
+    # Low-rank adapters
+    lora_rank: int = 8
+    lora_alpha: float = 16.0
+    lora_dropout: float = 0.0
+    lora_target_modules: Tuple[str, ...] = (
+        "attention.in_proj", "attention.out_proj", "feed_forward.0", "feed_forward.3"
+    )
+    quantize: Optional[str] = None  # "int8" for CPU dynamic quantization
+    compile_inference: bool = False  # torch.compile the decode step at startup
+    compile_warmup_lengths: Tuple[int, ...] = (16, 128, 512)
+    
+    # Tokenizer
+    tokenizer_path: Optional[str] = None  # vocabulary JSON; checkpoints also embed it
     
     # Self-evolving
     adaptive_learning: bool = True
     performance_monitoring: bool = True
     auto_optimization: bool = True
 
+class AhoCorasickAutomaton:
+    """Aho-Corasick automaton for matching many substrings in one pass"""
+    
+    def __init__(self, patterns: List[str]):
+        self.patterns = list(patterns)
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[List[int]] = [[]]
+        
+        # Trie of all patterns
+        for index, pattern in enumerate(self.patterns):
+            state = 0
+            for char in pattern:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                    self.goto[state][char] = next_state
+                state = next_state
+            self.output[state].append(index)
+        
+        # Failure links in breadth-first order; outputs inherit the suffix's matches
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(char, 0)
+                self.fail[next_state] = target if target != next_state else 0
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+    
+    def step(self, state: int, char: str) -> int:
+        """Advance the automaton by one character"""
+        while state and char not in self.goto[state]:
+            state = self.fail[state]
+        return self.goto[state].get(char, 0)
+
+class StreamingSafetyScanner:
+    """Incremental safety check over text that only ever grows
+    
+    Each call consumes only the newly emitted text, so the work per token is
+    proportional to the token's length rather than to everything generated
+    so far. Results match EthicalGuardrails.check_content_safety on the
+    concatenated text.
+    """
+    
+    def __init__(self, guardrails: "EthicalGuardrails"):
+        self.guardrails = guardrails
+        self.automaton = guardrails.automaton
+        self.state = 0
+        self.matched: List[str] = []
+        self.matched_set = set()
+        self._pending: Optional[Tuple[int, List[str]]] = None
+        self._result = guardrails.score_matches([])
+    
+    def feed(self, text: str, commit: bool = True) -> Dict[str, Any]:
+        """Scan new text and return the safety result for everything so far
+        
+        With commit=False the scan is held as pending so a caller can check a
+        candidate token and then either commit() it or feed a replacement.
+        """
+        state = self.state
+        new_terms = []
+        for char in text.lower():
+            state = self.automaton.step(state, char)
+            for index in self.automaton.output[state]:
+                term = self.automaton.patterns[index]
+                if term not in self.matched_set and term not in new_terms:
+                    new_terms.append(term)
+        
+        self._pending = (state, new_terms)
+        # Rescoring is only needed when a term appears for the first time
+        result = self.guardrails.score_matches(self.matched + new_terms) if new_terms else self._result
+        if commit:
+            self.commit()
+        return result
+    
+    def commit(self):
+        """Accept the text from the last feed(commit=False) call"""
+        if self._pending is None:
+            return
+        self.state, new_terms = self._pending
+        if new_terms:
+            self.matched.extend(new_terms)
+            self.matched_set.update(new_terms)
+            self._result = self.guardrails.score_matches(self.matched)
+        self._pending = None
+
+class NeuralSafetyScorer(nn.Module):
+    """Runs the safety classifier and bias detectors over hidden states in one pass
+    
+    The first Linear layer of every head is fused into a single matmul; the
+    small remaining layers run per head on its slice of the output. The
+    fused weight is concatenated from the live head weights on every call,
+    so training, loading or moving the heads is always reflected.
+    """
+    
+    def __init__(self, safety_classifier: nn.Module, bias_detectors: Dict[str, nn.Module]):
+        super().__init__()
+        self.heads = nn.ModuleDict({"safety": safety_classifier, **bias_detectors})
+    
+    def forward(self, hidden_states: torch.Tensor) -> Dict[str, torch.Tensor]:
+        """Score (batch, embedding_dim) hidden states; returns one (batch,) tensor per head"""
+        first_layers = [head[0] for head in self.heads.values()]
+        fused_weight = torch.cat([layer.weight for layer in first_layers])
+        fused_bias = torch.cat([layer.bias for layer in first_layers])
+        first_outputs = F.linear(hidden_states, fused_weight, fused_bias).split(
+            [layer.out_features for layer in first_layers], dim=-1
+        )
+        return {
+            name: head[1:](output).squeeze(-1)
+            for (name, head), output in zip(self.heads.items(), first_outputs)
+        }
+
 class EthicalGuardrails:
     """Ethical guardrails for AI model safety"""
     
@@ -78,6 +224,15 @@ class EthicalGuardrails:
         self.harmful_patterns = self._load_harmful_patterns()
         self.bias_detectors = self._initialize_bias_detectors()
         self.safety_classifier = self._initialize_safety_classifier()
+        self.bias_terms = self._load_bias_terms()
+        self.neural_scorer = NeuralSafetyScorer(self.safety_classifier, self.bias_detectors).eval()
+        
+        # One automaton for harmful patterns and bias words, compiled once
+        self.automaton = AhoCorasickAutomaton(
+            list(dict.fromkeys(self.harmful_patterns + [
+                term for terms, _ in self.bias_terms.values() for term in terms
+            ]))
+        )
         
     def _load_harmful_patterns(self) -> List[str]:
         """Load harmful content patterns"""
@@ -95,6 +250,13 @@ class EthicalGuardrails:
         ]
         return patterns
     
+    def _load_bias_terms(self) -> Dict[str, Tuple[List[str], float]]:
+        """Load bias indicator words and the count that saturates each score"""
+        return {
+            "gender_bias": (["he", "she", "his", "her", "man", "woman"], 10.0),
+            "racial_bias": (["race", "ethnicity", "color", "background"], 5.0)
+        }
+    
     def _initialize_bias_detectors(self) -> Dict[str, Any]:
         """Initialize bias detection models"""
         return {
@@ -107,7 +269,7 @@ class EthicalGuardrails:
     def _create_bias_detector(self, bias_type: str) -> nn.Module:
         """Create a bias detection model"""
         return nn.Sequential(
-            nn.Linear(768, 256),
+            nn.Linear(self.config.embedding_dim, 256),
             nn.ReLU(),
             nn.Dropout(0.1),
             nn.Linear(256, 64),
@@ -119,7 +281,7 @@ class EthicalGuardrails:
     def _initialize_safety_classifier(self) -> nn.Module:
         """Initialize safety classification model"""
         return nn.Sequential(
-            nn.Linear(768, 512),
+            nn.Linear(self.config.embedding_dim, 512),
             nn.ReLU(),
             nn.Dropout(0.1),
             nn.Linear(512, 256),
@@ -132,21 +294,47 @@ class EthicalGuardrails:
             nn.Sigmoid()
         )
     
+    def to(self, device: torch.device) -> "EthicalGuardrails":
+        """Move the neural safety heads to the model's device"""
+        self.neural_scorer.to(device)
+        return self
+    
+    def check_hidden_states(self, hidden_states: torch.Tensor) -> torch.Tensor:
+        """Flag unsafe rows of (batch, embedding_dim) hidden states
+        
+        The classifier's safety probability is discounted for each bias head
+        above 0.7, as in the keyword check. Returns a (batch,) bool tensor on
+        the hidden states' device.
+        """
+        with torch.no_grad():
+            scores = self.neural_scorer(hidden_states)
+            safety_score = scores.pop("safety")
+            biased = sum((score > 0.7).to(safety_score.dtype) for score in scores.values())
+            safety_score = safety_score * torch.pow(0.9, biased)
+        return safety_score < self.config.neural_safety_threshold
+    
     def check_content_safety(self, text: str) -> Dict[str, Any]:
         """Check content for safety violations"""
+        return self.create_scanner().feed(text)
+    
+    def create_scanner(self) -> StreamingSafetyScanner:
+        """Create a scanner for checking text as it is generated"""
+        return StreamingSafetyScanner(self)
+    
+    def score_matches(self, matched_terms: List[str]) -> Dict[str, Any]:
+        """Turn the set of matched terms into a safety result"""
         safety_score = 1.0
         violations = []
+        matched = set(matched_terms)
         
         # Check for harmful patterns
-        text_lower = text.lower()
         for pattern in self.harmful_patterns:
-            if pattern in text_lower:
+            if pattern in matched:
                 safety_score *= 0.8
                 violations.append(f"harmful_pattern: {pattern}")
         
         # Check for bias
-        bias_scores = self._detect_bias(text)
-        for bias_type, score in bias_scores.items():
+        for bias_type, score in self._bias_scores(matched).items():
             if score > 0.7:
                 safety_score *= 0.9
                 violations.append(f"bias_detected: {bias_type}")
@@ -157,22 +345,21 @@ class EthicalGuardrails:
             "is_safe": safety_score > self.config.ethical_threshold
         }
     
+    def _bias_scores(self, matched: set) -> Dict[str, float]:
+        """Bias scores from the bias words present in the text"""
+        return {
+            bias_type: min(sum(1 for term in terms if term in matched) / saturation, 1.0)
+            for bias_type, (terms, saturation) in self.bias_terms.items()
+        }
+    
     def _detect_bias(self, text: str) -> Dict[str, float]:
         """Detect various types of bias in text"""
         # Simplified bias detection - in practice, this would use trained models
-        bias_scores = {}
-        
-        # Gender bias detection
-        gender_words = ["he", "she", "his", "her", "man", "woman"]
-        gender_count = sum(1 for word in gender_words if word in text.lower())
-        bias_scores["gender_bias"] = min(gender_count / 10.0, 1.0)
-        
-        # Racial bias detection
-        racial_indicators = ["race", "ethnicity", "color", "background"]
-        racial_count = sum(1 for word in racial_indicators if word in text.lower())
-        bias_scores["racial_bias"] = min(racial_count / 5.0, 1.0)
-        
-        return bias_scores
+        text_lower = text.lower()
+        matched = {
+            term for terms, _ in self.bias_terms.values() for term in terms if term in text_lower
+        }
+        return self._bias_scores(matched)
 
 class PrivacyLayer(nn.Module):
     """Privacy-preserving layer with differential privacy"""
@@ -190,6 +377,186 @@ class PrivacyLayer(nn.Module):
             x = x + noise
         return x
 
+# Per-layer (key, value) tensors of shape (batch, heads, seq, head_dim)
+KVCache = List[Tuple[torch.Tensor, torch.Tensor]]
+
+def build_attention_mask(batch_size: int, query_length: int, past_length: int,
+                         attention_mask: Optional[torch.Tensor],
+                         device: torch.device) -> Tuple[Optional[torch.Tensor], bool]:
+    """Combine causal and key-padding masks into a boolean SDPA mask
+    
+    attention_mask is (batch, past + query) with 1 for real tokens. Returns
+    (mask, is_causal); the mask is omitted when the fused causal kernel or
+    no masking at all is sufficient.
+    """
+    if attention_mask is None or bool(attention_mask.all()):
+        if query_length == 1:
+            return None, False
+        if past_length == 0:
+            return None, True
+    
+    total_length = past_length + query_length
+    key_positions = torch.arange(total_length, device=device).unsqueeze(0)
+    query_positions = torch.arange(past_length, total_length, device=device).unsqueeze(1)
+    mask = (key_positions <= query_positions).view(1, 1, query_length, total_length)
+    
+    if attention_mask is not None:
+        mask = mask & attention_mask.bool().view(batch_size, 1, 1, total_length)
+        # Padding queries keep their own position so no row is fully masked
+        mask = mask | (key_positions == query_positions).view(1, 1, query_length, total_length)
+    
+    return mask, False
+
+class SelfAttention(nn.Module):
+    """Multi-head self-attention on fused scaled_dot_product_attention
+    
+    Q, K and V come from one packed projection. Checkpoints saved with the
+    previous nn.MultiheadAttention layout are remapped on load.
+    """
+    
+    def __init__(self, config: ModelConfig):
+        super().__init__()
+        self.embed_dim = config.embedding_dim
+        self.num_heads = config.num_heads
+        self.head_dim = config.embedding_dim // config.num_heads
+        self.dropout = config.dropout
+        
+        self.in_proj = nn.Linear(config.embedding_dim, 3 * config.embedding_dim)
+        self.out_proj = nn.Linear(config.embedding_dim, config.embedding_dim)
+    
+    def _load_from_state_dict(self, state_dict, prefix, *args, **kwargs):
+        # nn.MultiheadAttention stored the packed projection as raw parameters
+        for suffix in ("weight", "bias"):
+            legacy_key = f"{prefix}in_proj_{suffix}"
+            if legacy_key in state_dict:
+                state_dict[f"{prefix}in_proj.{suffix}"] = state_dict.pop(legacy_key)
+        super()._load_from_state_dict(state_dict, prefix, *args, **kwargs)
+    
+    def forward(self, x: torch.Tensor, attn_mask: Optional[torch.Tensor] = None, is_causal: bool = False,
+                past_key_value: Optional[Tuple[torch.Tensor, torch.Tensor]] = None,
+                use_cache: bool = False) -> Tuple[torch.Tensor, Optional[Tuple[torch.Tensor, torch.Tensor]]]:
+        """Attend from the new positions in x to cached and new keys"""
+        batch_size, seq_length, _ = x.shape
+        
+        query, key, value = self.in_proj(x).chunk(3, dim=-1)
+        query = query.view(batch_size, seq_length, self.num_heads, self.head_dim).transpose(1, 2)
+        key = key.view(batch_size, seq_length, self.num_heads, self.head_dim).transpose(1, 2)
+        value = value.view(batch_size, seq_length, self.num_heads, self.head_dim).transpose(1, 2)
+        
+        if past_key_value is not None:
+            key = torch.cat([past_key_value[0], key], dim=2)
+            value = torch.cat([past_key_value[1], value], dim=2)
+        present = (key, value) if use_cache else None
+        
+        output = F.scaled_dot_product_attention(
+            query, key, value,
+            attn_mask=attn_mask,
+            dropout_p=self.dropout if self.training else 0.0,
+            is_causal=is_causal
+        )
+        output = output.transpose(1, 2).reshape(batch_size, seq_length, self.embed_dim)
+        return self.out_proj(output), present
+
+def quantize_dynamic_model(model: nn.Module, mode: str = "int8") -> nn.Module:
+    """Apply CPU dynamic quantization to a model in place
+    
+    Linear layers and attention projections get int8 weights with activations
+    quantized on the fly; embeddings get weight-only int8.
+    """
+    if mode != "int8":
+        raise ValueError(f"Unsupported quantization mode: {mode}")
+    
+    from torch.ao.quantization import (
+        quantize_dynamic, default_dynamic_qconfig, float_qparams_weight_only_qconfig
+    )
+    
+    model.to(torch.device("cpu"))
+    model.eval()
+    
+    return quantize_dynamic(
+        model,
+        {nn.Linear: default_dynamic_qconfig, nn.Embedding: float_qparams_weight_only_qconfig},
+        inplace=True
+    )
+
+class LoRALinear(nn.Linear):
+    """nn.Linear with switchable low-rank adapters
+    
+    The base weight and bias keep their nn.Linear names, so base checkpoints
+    load unchanged. Each adapter adds lora_A[name] (rank x in) and
+    lora_B[name] (out x rank); B starts at zero, so a new adapter leaves the
+    output unchanged. The active adapter's update scaling * B @ A is either
+    applied on the fly or merged into the weight for zero-overhead inference.
+    """
+    
+    def __init__(self, in_features: int, out_features: int, bias: bool = True, device=None, dtype=None):
+        super().__init__(in_features, out_features, bias, device, dtype)
+        self.lora_A = nn.ParameterDict()
+        self.lora_B = nn.ParameterDict()
+        self.lora_scaling: Dict[str, float] = {}
+        self.lora_dropout = 0.0
+        self.active_adapter: Optional[str] = None
+        self.merged_adapter: Optional[str] = None
+    
+    @classmethod
+    def from_linear(cls, linear: nn.Linear, dropout: float = 0.0) -> "LoRALinear":
+        """Wrap an existing layer, sharing (not copying) its weight and bias"""
+        layer = cls(linear.in_features, linear.out_features, linear.bias is not None, device="meta")
+        layer.weight = linear.weight
+        layer.bias = linear.bias
+        layer.lora_dropout = dropout
+        return layer
+    
+    def add_adapter(self, name: str, rank: int, alpha: float):
+        """Create a zero-initialized adapter"""
+        lora_A = torch.empty(rank, self.in_features, device=self.weight.device, dtype=self.weight.dtype)
+        nn.init.kaiming_uniform_(lora_A, a=math.sqrt(5))
+        self.lora_A[name] = nn.Parameter(lora_A)
+        self.lora_B[name] = nn.Parameter(
+            torch.zeros(self.out_features, rank, device=self.weight.device, dtype=self.weight.dtype)
+        )
+        self.lora_scaling[name] = alpha / rank
+    
+    def remove_adapter(self, name: str):
+        """Drop an adapter, unmerging or deactivating it first"""
+        if self.merged_adapter == name:
+            self.unmerge()
+        if self.active_adapter == name:
+            self.active_adapter = None
+        del self.lora_A[name], self.lora_B[name]
+        self.lora_scaling.pop(name)
+    
+    def delta_weight(self, name: str) -> torch.Tensor:
+        """The adapter's dense weight update"""
+        return (self.lora_B[name] @ self.lora_A[name]) * self.lora_scaling[name]
+    
+    def merge(self):
+        """Fold the active adapter into the base weight"""
+        if self.active_adapter is None or self.merged_adapter == self.active_adapter:
+            return
+        self.unmerge()
+        with torch.no_grad():
+            self.weight += self.delta_weight(self.active_adapter).to(self.weight.dtype)
+        self.merged_adapter = self.active_adapter
+    
+    def unmerge(self):
+        """Restore the base weight"""
+        if self.merged_adapter is None:
+            return
+        with torch.no_grad():
+            self.weight -= self.delta_weight(self.merged_adapter).to(self.weight.dtype)
+        self.merged_adapter = None
+    
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        output = F.linear(x, self.weight, self.bias)
+        name = self.active_adapter
+        if name is None or name == self.merged_adapter:
+            return output
+        
+        if self.lora_dropout and self.training:
+            x = F.dropout(x, self.lora_dropout)
+        return output + F.linear(F.linear(x, self.lora_A[name]), self.lora_B[name]) * self.lora_scaling[name]
+
 class TransformerBlock(nn.Module):
     """Transformer block with privacy and ethical considerations"""
     
@@ -198,12 +565,7 @@ class TransformerBlock(nn.Module):
         self.config = config
         
         # Multi-head attention
-        self.attention = nn.MultiheadAttention(
-            embed_dim=config.embedding_dim,
-            num_heads=config.num_heads,
-            dropout=config.dropout,
-            batch_first=True
-        )
+        self.attention = SelfAttention(config)
         
         # Feed-forward network
         self.feed_forward = nn.Sequential(
@@ -221,10 +583,12 @@ class TransformerBlock(nn.Module):
         # Privacy layer
         self.privacy_layer = PrivacyLayer(config)
         
-    def forward(self, x: torch.Tensor, mask: Optional[torch.Tensor] = None) -> torch.Tensor:
+    def forward(self, x: torch.Tensor, attn_mask: Optional[torch.Tensor] = None, is_causal: bool = False,
+                past_key_value: Optional[Tuple[torch.Tensor, torch.Tensor]] = None,
+                use_cache: bool = False) -> Tuple[torch.Tensor, Optional[Tuple[torch.Tensor, torch.Tensor]]]:
         """Forward pass with residual connections and privacy"""
         # Self-attention
-        attn_output, _ = self.attention(x, x, x, attn_mask=mask)
+        attn_output, present = self.attention(x, attn_mask, is_causal, past_key_value, use_cache)
         x = self.norm1(x + attn_output)
         x = self.privacy_layer(x)
         
@@ -233,7 +597,339 @@ class TransformerBlock(nn.Module):
         x = self.norm2(x + ff_output)
         x = self.privacy_layer(x)
         
-        return x
+        return x, present
+
+# Tensor-blob checkpoint layout: magic, little-endian u64 header length,
+# JSON header, then raw tensor buffers each aligned to TENSOR_BLOB_ALIGNMENT
+TENSOR_BLOB_MAGIC = b"CCTBLOB1"
+TENSOR_BLOB_ALIGNMENT = 64
+GZIP_MAGIC = b"\x1f\x8b"
+
+_DTYPE_NAMES = {
+    torch.float64: "F64", torch.float32: "F32", torch.float16: "F16", torch.bfloat16: "BF16",
+    torch.int64: "I64", torch.int32: "I32", torch.int16: "I16", torch.int8: "I8",
+    torch.uint8: "U8", torch.bool: "BOOL"
+}
+_NAME_DTYPES = {name: dtype for dtype, name in _DTYPE_NAMES.items()}
+
+def _align(offset: int) -> int:
+    """Round an offset up to the tensor-blob alignment"""
+    return (offset + TENSOR_BLOB_ALIGNMENT - 1) // TENSOR_BLOB_ALIGNMENT * TENSOR_BLOB_ALIGNMENT
+
+def _tensor_bytes(tensor: torch.Tensor) -> memoryview:
+    """Raw bytes of a tensor without copying when it is already contiguous on CPU"""
+    tensor = tensor.detach().cpu()
+    if tensor.is_quantized:
+        tensor = tensor.int_repr()
+    return memoryview(tensor.contiguous().reshape(-1).view(torch.uint8).numpy())
+
+def _update_state_hash(hasher, value: Any):
+    """Feed one state dict value into a hash, recursing into packed params"""
+    if isinstance(value, torch.Tensor):
+        hasher.update(_tensor_bytes(value))
+    elif isinstance(value, (tuple, list)):
+        for item in value:
+            _update_state_hash(hasher, item)
+    else:
+        hasher.update(repr(value).encode("utf-8"))
+
+def hash_state_dict(state_dict: Dict[str, Any]) -> str:
+    """SHA-256 over tensor names, shapes and buffers, streamed one tensor at a time"""
+    hasher = hashlib.sha256()
+    for name in sorted(state_dict):
+        value = state_dict[name]
+        hasher.update(name.encode("utf-8"))
+        if isinstance(value, torch.Tensor):
+            hasher.update(f"{value.dtype}{tuple(value.shape)}".encode("utf-8"))
+        _update_state_hash(hasher, value)
+    return hasher.hexdigest()
+
+def is_plain_state_dict(state_dict: Dict[str, Any]) -> bool:
+    """Whether every entry is a dense tensor the tensor-blob format can store"""
+    return all(
+        isinstance(value, torch.Tensor) and not value.is_quantized and value.dtype in _DTYPE_NAMES
+        for value in state_dict.values()
+    )
+
+@contextmanager
+def replace_on_success(path: str) -> Iterator[str]:
+    """Yield a temporary path next to path and move it over path once written
+    
+    The target is never truncated in place: a checkpoint that is still
+    memory-mapped keeps its old pages, and a failed write leaves it intact.
+    """
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp",
+                                    dir=os.path.dirname(os.path.abspath(path)))
+    os.close(fd)
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def save_tensor_blob(path: str, state_dict: Dict[str, torch.Tensor], metadata: Dict[str, Any]) -> str:
+    """Write a tensor-blob checkpoint and return its SHA-256
+    
+    The hash is computed while the buffers are written and patched into the
+    fixed-size header afterwards, so the tensors are only read once.
+    """
+    names = sorted(state_dict)
+    tensors = {}
+    offset = 0
+    for name in names:
+        tensor = state_dict[name]
+        size = tensor.numel() * tensor.element_size()
+        tensors[name] = {
+            "dtype": _DTYPE_NAMES[tensor.dtype],
+            "shape": list(tensor.shape),
+            "offsets": [offset, offset + size]
+        }
+        offset = _align(offset + size)
+    
+    placeholder = "0" * 64
+    header = {"sha256": placeholder, "__metadata__": metadata, "tensors": tensors}
+    header_bytes = json.dumps(header, default=str).encode("utf-8")
+    prefix_length = len(TENSOR_BLOB_MAGIC) + 8
+    header_bytes += b" " * (_align(prefix_length + len(header_bytes)) - prefix_length - len(header_bytes))
+    data_start = prefix_length + len(header_bytes)
+    
+    hasher = hashlib.sha256()
+    with replace_on_success(path) as tmp_path, open(tmp_path, "wb") as f:
+        f.write(TENSOR_BLOB_MAGIC)
+        f.write(struct.pack("<Q", len(header_bytes)))
+        f.write(header_bytes)
+        
+        for name in names:
+            tensor = state_dict[name]
+            hasher.update(name.encode("utf-8"))
+            hasher.update(f"{tensor.dtype}{tuple(tensor.shape)}".encode("utf-8"))
+            data = _tensor_bytes(tensor)
+            hasher.update(data)
+            
+            f.seek(data_start + tensors[name]["offsets"][0])
+            f.write(data)
+        
+        # Pad the tail so the final buffer is aligned like the others
+        f.truncate(data_start + offset)
+        
+        digest = hasher.hexdigest()
+        f.seek(prefix_length + header_bytes.index(placeholder.encode("utf-8")))
+        f.write(digest.encode("utf-8"))
+    
+    return digest
+
+def load_tensor_blob(path: str, verify: bool = False) -> Tuple[Dict[str, torch.Tensor], Dict[str, Any]]:
+    """Memory-map a tensor-blob checkpoint
+    
+    Tensors are views over a copy-on-write mapping of the file, so loading
+    touches no tensor data and worker processes share the page cache.
+    """
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    
+    if buffer[:len(TENSOR_BLOB_MAGIC)] != TENSOR_BLOB_MAGIC:
+        raise ValueError(f"{path} is not a tensor-blob checkpoint")
+    
+    prefix_length = len(TENSOR_BLOB_MAGIC) + 8
+    (header_length,) = struct.unpack("<Q", buffer[len(TENSOR_BLOB_MAGIC):prefix_length])
+    header = json.loads(buffer[prefix_length:prefix_length + header_length])
+    data_start = prefix_length + header_length
+    
+    state_dict = {}
+    for name, info in header["tensors"].items():
+        dtype = _NAME_DTYPES[info["dtype"]]
+        start, end = info["offsets"]
+        count = (end - start) // torch.empty((), dtype=dtype).element_size()
+        if count == 0:
+            state_dict[name] = torch.empty(info["shape"], dtype=dtype)
+        else:
+            state_dict[name] = torch.frombuffer(
+                buffer, dtype=dtype, count=count, offset=data_start + start
+            ).view(info["shape"])
+    
+    if verify:
+        digest = hash_state_dict(state_dict)
+        if digest != header["sha256"]:
+            raise ValueError(f"Checkpoint hash mismatch for {path}: expected {header['sha256']}, got {digest}")
+    
+    metadata = dict(header.get("__metadata__", {}))
+    metadata["model_hash"] = header["sha256"]
+    return state_dict, metadata
+
+def read_checkpoint(path: str, verify: bool = False) -> Dict[str, Any]:
+    """Read a tensor-blob or legacy gzip-pickle checkpoint into one dict"""
+    with open(path, "rb") as f:
+        magic = f.read(len(TENSOR_BLOB_MAGIC))
+    
+    if magic.startswith(GZIP_MAGIC):
+        with gzip.open(path, "rb") as f:
+            model_data = pickle.load(f)
+        model_data["format"] = "gzip_pickle"
+        return model_data
+    
+    state_dict, metadata = load_tensor_blob(path, verify=verify)
+    config_fields = {field.name for field in fields(ModelConfig)}
+    config_data = metadata.pop("config", None) or {}
+    return {
+        "format": "tensor_blob",
+        "model_state_dict": state_dict,
+        "config": ModelConfig(**{k: v for k, v in config_data.items() if k in config_fields}),
+        "performance_metrics": metadata.pop("performance_metrics", {}),
+        "training_history": metadata.pop("training_history", []),
+        "metadata": metadata
+    }
+
+TOKEN_PATTERN = re.compile(r" ?\w+| ?[^\w\s]+|\s+(?!\S)|\s+")
+
+class VocabTokenizer:
+    """Deterministic, invertible word-piece tokenizer with a persisted vocabulary
+    
+    Text is split into pieces that carry their leading space, so decoding is
+    a plain concatenation. IDs 0-3 are special tokens, the next 256 IDs are
+    byte-fallback tokens for pieces missing from the vocabulary, and the rest
+    are learned pieces. Decoding indexes a numpy table of byte strings by the
+    ID array instead of looking tokens up one at a time.
+    """
+    
+    PAD_TOKEN_ID = 0
+    UNK_TOKEN_ID = 1
+    BOS_TOKEN_ID = 2
+    EOS_TOKEN_ID = 3
+    SPECIAL_TOKENS = ["<pad>", "<unk>", "<bos>", "<eos>"]
+    BYTE_OFFSET = len(SPECIAL_TOKENS)
+    
+    def __init__(self, pieces: Optional[List[str]] = None):
+        self.pieces: List[str] = []
+        self.piece_to_id: Dict[str, int] = {}
+        self._set_pieces(pieces or [])
+    
+    def _set_pieces(self, pieces: List[str]):
+        """Rebuild the lookup tables for a list of learned pieces"""
+        self.pieces = list(pieces)
+        first_piece_id = self.BYTE_OFFSET + 256
+        self.piece_to_id = {piece: first_piece_id + index for index, piece in enumerate(self.pieces)}
+        
+        decode_table = [b""] * len(self.SPECIAL_TOKENS)
+        decode_table += [bytes([byte]) for byte in range(256)]
+        decode_table += [piece.encode("utf-8") for piece in self.pieces]
+        self.decode_table = np.array(decode_table, dtype=object)
+        self._fallback_cache: Dict[str, Tuple[int, ...]] = {}
+    
+    @property
+    def vocab_size(self) -> int:
+        """Number of token IDs, including specials and byte tokens"""
+        return len(self.decode_table)
+    
+    def train(self, texts: List[str], vocab_size: int, min_frequency: int = 2):
+        """Learn the most frequent pieces; ties are broken by the piece itself so results are reproducible"""
+        counts = Counter(piece for text in texts for piece in TOKEN_PATTERN.findall(text))
+        max_pieces = max(vocab_size - self.BYTE_OFFSET - 256, 0)
+        ranked = sorted(
+            (piece for piece, count in counts.items() if count >= min_frequency),
+            key=lambda piece: (-counts[piece], piece)
+        )
+        self._set_pieces(ranked[:max_pieces])
+        logger.info(f"Tokenizer trained with {self.vocab_size} tokens")
+    
+    def _piece_ids(self, piece: str) -> Tuple[int, ...]:
+        """IDs for a piece missing from the vocabulary: one byte token per UTF-8 byte"""
+        ids = self._fallback_cache.get(piece)
+        if ids is None:
+            ids = tuple(self.BYTE_OFFSET + byte for byte in piece.encode("utf-8"))
+            if len(self._fallback_cache) < 100000:
+                self._fallback_cache[piece] = ids
+        return ids
+    
+    def encode(self, text: str, add_special_tokens: bool = False) -> List[int]:
+        """Encode text to token IDs"""
+        piece_to_id = self.piece_to_id
+        ids = [self.BOS_TOKEN_ID] if add_special_tokens else []
+        for piece in TOKEN_PATTERN.findall(text):
+            token_id = piece_to_id.get(piece)
+            if token_id is None:
+                ids.extend(self._piece_ids(piece))
+            else:
+                ids.append(token_id)
+        if add_special_tokens:
+            ids.append(self.EOS_TOKEN_ID)
+        return ids
+    
+    def encode_batch(self, texts: List[str], max_length: Optional[int] = None, padding_side: str = "right",
+                     add_special_tokens: bool = False) -> Tuple[torch.Tensor, torch.Tensor]:
+        """Encode texts into padded (batch, length) input IDs and an attention mask
+        
+        Texts are encoded one at a time with encode, whose cost is dominated
+        by the regex split; only writing the rows into the padded array is a
+        single vectorized assignment. Sequences longer than max_length keep
+        their first tokens with right padding and their last tokens with
+        left padding.
+        """
+        sequences = [self.encode(text, add_special_tokens) for text in texts]
+        if max_length is not None:
+            if padding_side == "left":
+                sequences = [ids[-max_length:] if max_length > 0 else [] for ids in sequences]
+            else:
+                sequences = [ids[:max_length] for ids in sequences]
+        
+        lengths = np.fromiter((len(ids) for ids in sequences), dtype=np.int64, count=len(sequences))
+        width = int(lengths.max()) if len(sequences) else 0
+        positions = np.arange(width)
+        if padding_side == "left":
+            mask = positions >= (width - lengths)[:, None]
+        else:
+            mask = positions < lengths[:, None]
+        
+        input_ids = np.full((len(sequences), width), self.PAD_TOKEN_ID, dtype=np.int64)
+        input_ids[mask] = np.fromiter(
+            (token for ids in sequences for token in ids), dtype=np.int64, count=int(lengths.sum())
+        )
+        return torch.from_numpy(input_ids), torch.from_numpy(mask.astype(np.int64))
+    
+    def decode(self, token_ids, skip_special_tokens: bool = True) -> str:
+        """Decode token IDs to text"""
+        if isinstance(token_ids, torch.Tensor):
+            token_ids = token_ids.cpu().numpy()
+        token_ids = np.asarray(token_ids, dtype=np.int64).reshape(-1)
+        token_ids = token_ids[(token_ids >= 0) & (token_ids < self.vocab_size)]
+        if not skip_special_tokens:
+            pieces = [
+                self.SPECIAL_TOKENS[token].encode("utf-8") if token < self.BYTE_OFFSET else self.decode_table[token]
+                for token in token_ids.tolist()
+            ]
+            return b"".join(pieces).decode("utf-8", errors="replace")
+        return b"".join(self.decode_table[token_ids]).decode("utf-8", errors="replace")
+    
+    def decode_batch(self, token_ids: torch.Tensor, attention_mask: Optional[torch.Tensor] = None) -> List[str]:
+        """Decode a padded (batch, length) ID tensor"""
+        token_ids = token_ids.cpu().numpy()
+        if attention_mask is not None:
+            keep = attention_mask.cpu().numpy().astype(bool)
+            return [self.decode(row[row_mask]) for row, row_mask in zip(token_ids, keep)]
+        return [self.decode(row) for row in token_ids]
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serializable vocabulary"""
+        return {"version": 1, "special_tokens": self.SPECIAL_TOKENS, "pieces": self.pieces}
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "VocabTokenizer":
+        """Rebuild a tokenizer from to_dict() output"""
+        return cls(data.get("pieces", []))
+    
+    def save(self, path: str):
+        """Save the vocabulary as JSON"""
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+        logger.info(f"Tokenizer saved to {path}")
+    
+    @classmethod
+    def load(cls, path: str) -> "VocabTokenizer":
+        """Load a vocabulary saved with save()"""
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
 
 class CareConnectModel(nn.Module):
     """Main CareConnect AI model with ethical guardrails"""
@@ -259,16 +955,52 @@ class CareConnectModel(nn.Module):
         # Ethical guardrails
         self.ethical_guardrails = EthicalGuardrails(config)
         
+        # Tokenizer
+        self.tokenizer = self._load_tokenizer()
+        
         # Performance monitoring
         self.performance_metrics = {}
         self.training_history = []
+        self.quantized: Optional[str] = None
+        
+        # Low-rank adapters loaded over the shared base weights
+        self.adapters: Dict[str, Dict[str, Any]] = {}
+        self.active_adapter: Optional[str] = None
+        
+        # Compiled decode step, set by compile_for_inference
+        self.compiled_decode_step = None
+        self.compile_stats: Dict[str, Any] = {"mode": "eager"}
         
         # Move to device
         self.to(self.device)
+        self.ethical_guardrails.to(self.device)
         
         # Initialize weights
         self._initialize_weights()
         
+        if config.quantize:
+            self.quantize(config.quantize)
+        if config.compile_inference:
+            self.compile_for_inference()
+    
+    def _load_tokenizer(self) -> VocabTokenizer:
+        """Load the configured vocabulary, or start from the byte-level fallback"""
+        path = self.config.tokenizer_path
+        tokenizer = VocabTokenizer.load(path) if path and Path(path).exists() else VocabTokenizer()
+        if tokenizer.vocab_size > self.config.vocab_size:
+            raise ValueError(
+                f"Tokenizer has {tokenizer.vocab_size} tokens but vocab_size is {self.config.vocab_size}"
+            )
+        return tokenizer
+    
+    def set_tokenizer(self, tokenizer: VocabTokenizer):
+        """Use a (trained) tokenizer; it must fit in the embedding table"""
+        if tokenizer.vocab_size > self.config.vocab_size:
+            raise ValueError(
+                f"Tokenizer has {tokenizer.vocab_size} tokens but vocab_size is {self.config.vocab_size}"
+            )
+        self.tokenizer = tokenizer
+    
     def _setup_device(self) -> torch.device:
         """Setup device for model"""
         if self.config.device == "auto":
@@ -285,12 +1017,40 @@ class CareConnectModel(nn.Module):
             elif isinstance(module, nn.Embedding):
                 nn.init.normal_(module.weight, mean=0.0, std=0.02)
     
-    def forward(self, input_ids: torch.Tensor, attention_mask: Optional[torch.Tensor] = None) -> Dict[str, torch.Tensor]:
-        """Forward pass with ethical checks"""
+    def forward(self, input_ids: torch.Tensor, attention_mask: Optional[torch.Tensor] = None,
+                past_key_values: Optional[KVCache] = None, use_cache: bool = False,
+                position_ids: Optional[torch.Tensor] = None) -> Dict[str, torch.Tensor]:
+        """Forward pass with ethical checks
+        
+        attention_mask is (batch, past + seq) with 1 for real tokens. With
+        use_cache the per-layer keys/values are returned as past_key_values
+        so the next call only has to process the new tokens.
+        """
+        hidden_states, attention_mask, presents = self._decode(
+            input_ids, attention_mask, past_key_values, use_cache, position_ids
+        )
+        logits = self.output_projection(hidden_states)
+        
+        outputs = {
+            "logits": logits,
+            "hidden_states": hidden_states,
+            "attention_mask": attention_mask
+        }
+        if use_cache:
+            outputs["past_key_values"] = presents
+        return outputs
+    
+    def _decode(self, input_ids: torch.Tensor, attention_mask: Optional[torch.Tensor],
+                past_key_values: Optional[KVCache], use_cache: bool,
+                position_ids: Optional[torch.Tensor]) -> Tuple[torch.Tensor, torch.Tensor, Optional[KVCache]]:
+        """Normalized hidden states before the vocabulary projection, plus the attention mask and new cache"""
         batch_size, seq_length = input_ids.shape
+        past_length = past_key_values[0][0].size(2) if past_key_values is not None else 0
         
         # Create position indices
-        position_ids = torch.arange(seq_length, device=self.device).unsqueeze(0).expand(batch_size, -1)
+        if position_ids is None:
+            position_ids = torch.arange(past_length, past_length + seq_length, device=input_ids.device)
+            position_ids = position_ids.unsqueeze(0).repeat(batch_size, 1)
         
         # Embeddings
         token_embeddings = self.token_embedding(input_ids)
@@ -299,22 +1059,113 @@ class CareConnectModel(nn.Module):
         
         # Create attention mask
         if attention_mask is None:
-            attention_mask = torch.ones_like(input_ids)
+            attention_mask = torch.ones(batch_size, past_length + seq_length, dtype=torch.long, device=input_ids.device)
+        attn_mask, is_causal = build_attention_mask(
+            batch_size, seq_length, past_length, attention_mask, input_ids.device
+        )
         
-        # Apply transformer blocks
+        # Apply transformer blocks; with gradient checkpointing only each
+        # block's input is kept and its activations are recomputed in backward
         hidden_states = embeddings
-        for transformer_block in self.transformer_blocks:
-            hidden_states = transformer_block(hidden_states, attention_mask)
+        presents = [] if use_cache else None
+        recompute = (self.config.gradient_checkpointing and self.training
+                     and torch.is_grad_enabled() and not use_cache)
+        for i, transformer_block in enumerate(self.transformer_blocks):
+            past = past_key_values[i] if past_key_values is not None else None
+            if recompute:
+                hidden_states, present = checkpoint(
+                    transformer_block, hidden_states, attn_mask, is_causal, None, False, use_reentrant=False
+                )
+            else:
+                hidden_states, present = transformer_block(hidden_states, attn_mask, is_causal, past, use_cache)
+            if use_cache:
+                presents.append(present)
         
-        # Output projection
-        hidden_states = self.output_norm(hidden_states)
-        logits = self.output_projection(hidden_states)
+        return self.output_norm(hidden_states), attention_mask, presents
+    
+    def decode_step(self, input_ids: torch.Tensor, past_key_values: Optional[KVCache] = None,
+                    attention_mask: Optional[torch.Tensor] = None,
+                    position_ids: Optional[torch.Tensor] = None) -> Tuple[torch.Tensor, torch.Tensor, KVCache]:
+        """Run new tokens against the key/value cache
         
-        return {
-            "logits": logits,
-            "hidden_states": hidden_states,
-            "attention_mask": attention_mask
+        Returns the last position's logits and hidden state plus the updated
+        cache. attention_mask and position_ids are only needed for padded
+        batches. Uses the compiled graph after compile_for_inference.
+        """
+        if self.compiled_decode_step is not None and not self.training:
+            return self.compiled_decode_step(input_ids, past_key_values, attention_mask, position_ids)
+        return self._decode_step_eager(input_ids, past_key_values, attention_mask, position_ids)
+    
+    def _decode_step_eager(self, input_ids: torch.Tensor, past_key_values: Optional[KVCache] = None,
+                           attention_mask: Optional[torch.Tensor] = None,
+                           position_ids: Optional[torch.Tensor] = None) -> Tuple[torch.Tensor, torch.Tensor, KVCache]:
+        """Uncompiled decode_step; only the last position is projected to the vocabulary"""
+        hidden_states, _, presents = self._decode(input_ids, attention_mask, past_key_values, True, position_ids)
+        last_hidden = hidden_states[:, -1, :]
+        return self.output_projection(last_hidden), last_hidden, presents
+    
+    def compile_for_inference(self, warmup_lengths: Optional[List[int]] = None, backend: str = "inductor") -> bool:
+        """Compile the prefill and single-token decode step and warm it up
+        
+        The model is frozen (eval mode, no gradients) and decode_step is
+        compiled with dynamic shapes, then run once per warmup length plus a
+        few cached single-token steps so compilation happens at startup
+        rather than on the first request. Falls back to eager and returns
+        False if torch.compile is unavailable or fails.
+        """
+        self.eval()
+        for param in self.parameters():
+            param.requires_grad_(False)
+        warmup_lengths = list(warmup_lengths or self.config.compile_warmup_lengths)
+        
+        if not hasattr(torch, "compile"):
+            logger.warning("torch.compile is not available; using eager decoding")
+            return False
+        
+        start_time = time.perf_counter()
+        try:
+            self.compiled_decode_step = torch.compile(self._decode_step_eager, dynamic=True, backend=backend)
+            self._warmup_decode(warmup_lengths)
+        except Exception as e:
+            logger.warning(f"Compilation failed, falling back to eager decoding: {e}")
+            self.compiled_decode_step = None
+            self.compile_stats = {"mode": "eager", "error": str(e)}
+            return False
+        
+        self.compile_stats = {
+            "mode": f"compiled ({backend})",
+            "warmup_lengths": warmup_lengths,
+            "warmup_seconds": time.perf_counter() - start_time
         }
+        logger.info(f"Decode step compiled in {self.compile_stats['warmup_seconds']:.1f}s")
+        return True
+    
+    def _warmup_decode(self, lengths: List[int], decode_steps: int = 2):
+        """Run representative prefill and decode shapes through decode_step"""
+        max_length = self.config.max_seq_length - decode_steps - 1
+        with torch.no_grad():
+            for length in lengths:
+                length = max(min(length, max_length), 1)
+                input_ids = torch.randint(4, self.config.vocab_size, (1, length), device=self.device)
+                logits, _, past_key_values = self.decode_step(input_ids)
+                for _ in range(decode_steps):
+                    logits, _, past_key_values = self.decode_step(logits.argmax(dim=-1, keepdim=True), past_key_values)
+                
+                # Batched path: left padding mask and explicit positions
+                input_ids = input_ids.repeat(2, 1)
+                attention_mask = torch.ones_like(input_ids)
+                attention_mask[1, 0] = 0
+                position_ids = (attention_mask.cumsum(dim=-1) - 1).clamp(min=0)
+                logits, _, past_key_values = self.decode_step(
+                    input_ids, attention_mask=attention_mask, position_ids=position_ids
+                )
+                for _ in range(decode_steps):
+                    attention_mask = torch.cat([attention_mask, attention_mask.new_ones((2, 1))], dim=1)
+                    position_ids = position_ids[:, -1:] + 1
+                    logits, _, past_key_values = self.decode_step(
+                        logits.argmax(dim=-1, keepdim=True), past_key_values,
+                        attention_mask=attention_mask, position_ids=position_ids
+                    )
     
     def generate(self, 
                 prompt: str, 
@@ -322,100 +1173,403 @@ class CareConnectModel(nn.Module):
                 temperature: float = 0.7,
                 top_p: float = 0.9,
                 safety_check: bool = True) -> str:
-        """Generate text with ethical guardrails"""
+        """Generate text with ethical guardrails
         
-        # Tokenize input
-        tokens = self._tokenize(prompt)
+        Every emitted token goes through the streaming keyword scanner. The
+        hidden state of each step is also kept and, every
+        neural_safety_interval tokens, the buffered states are scored in one
+        batch by the neural safety heads; generation stops before the first
+        flagged step.
+        """
+        generated_tokens = []
+        for tokens in self._generate_tokens(prompt, max_length, temperature, top_p, safety_check):
+            generated_tokens.extend(tokens)
+        return self._detokenize(generated_tokens)
+    
+    def generate_stream(self, 
+                        prompt: str, 
+                        max_length: int = 100, 
+                        temperature: float = 0.7,
+                        top_p: float = 0.9,
+                        safety_check: bool = True) -> Iterator[str]:
+        """Yield the text of generate incrementally
+        
+        Text is only released once the neural safety heads have scored it,
+        so with safety_check it arrives in chunks of up to
+        neural_safety_interval tokens. A multi-byte character split across
+        tokens is held back until it is complete.
+        """
+        generated_tokens = []
+        emitted = ""
+        for tokens in self._generate_tokens(prompt, max_length, temperature, top_p, safety_check):
+            generated_tokens.extend(tokens)
+            text = self._detokenize(generated_tokens).rstrip("\ufffd")
+            if len(text) > len(emitted):
+                yield text[len(emitted):]
+                emitted = text
+        
+        text = self._detokenize(generated_tokens)
+        if len(text) > len(emitted):
+            yield text[len(emitted):]
+    
+    def _generate_tokens(self, prompt: str, max_length: int, temperature: float, top_p: float,
+                         safety_check: bool) -> Iterator[List[int]]:
+        """Token generator behind generate and generate_stream
+        
+        Yields lists of new token IDs as soon as they can no longer be
+        retracted: immediately without neural checks, otherwise after each
+        batched hidden-state check has passed.
+        """
+        start_time = time.perf_counter()
+        safety_time = 0.0
+        
+        # Tokenize input, keeping room in the position table for new tokens
+        tokens = self._tokenize(prompt)[-(self.config.max_seq_length - 1):] or [self._get_safe_token()]
         input_ids = torch.tensor([tokens], device=self.device)
         
         generated_tokens = []
+        released = 0
+        past_key_values = None
+        scanner = self.ethical_guardrails.create_scanner() if safety_check else None
+        neural_interval = self.config.neural_safety_interval if safety_check else 0
+        pending_hidden: List[torch.Tensor] = []
+        pending_steps: List[int] = []
+        neural_checks = 0
+        neural_flagged = False
         
-        for _ in range(max_length):
-            # Forward pass
-            with torch.no_grad():
-                outputs = self.forward(input_ids)
-                logits = outputs["logits"][:, -1, :]
-            
-            # Apply temperature and top-p sampling
-            logits = logits / temperature
-            sorted_logits, sorted_indices = torch.sort(logits, descending=True)
-            cumulative_probs = torch.cumsum(F.softmax(sorted_logits, dim=-1), dim=-1)
+        for step in range(max_length):
+            if len(tokens) + len(generated_tokens) >= self.config.max_seq_length:
+                break
             
-            # Remove tokens with cumulative probability above top_p
-            sorted_indices_to_remove = cumulative_probs > top_p
-            sorted_indices_to_remove[..., 1:] = sorted_indices_to_remove[..., :-1].clone()
-            sorted_indices_to_remove[..., 0] = 0
+            # Forward pass over the new tokens only, reusing cached keys/values
+            with torch.no_grad():
+                logits, last_hidden, past_key_values = self.decode_step(input_ids, past_key_values)
             
-            indices_to_remove = sorted_indices_to_remove.scatter(1, sorted_indices, sorted_indices_to_remove)
-            logits[indices_to_remove] = float('-inf')
+            # Neural safety on hidden states the forward pass already produced
+            if neural_interval:
+                pending_hidden.append(last_hidden)
+                pending_steps.append(step)
+                if len(pending_hidden) >= neural_interval:
+                    check_start = time.perf_counter()
+                    neural_flagged = self._check_pending_hidden(pending_hidden, pending_steps, generated_tokens)
+                    safety_time += time.perf_counter() - check_start
+                    neural_checks += 1
+                    pending_hidden, pending_steps = [], []
+                    if neural_flagged:
+                        break
+                    # Everything sampled so far has now been scored
+                    if len(generated_tokens) > released:
+                        yield generated_tokens[released:]
+                        released = len(generated_tokens)
             
-            # Sample next token
-            probs = F.softmax(logits, dim=-1)
-            next_token = torch.multinomial(probs, num_samples=1)
+            # Apply temperature and top-p sampling
+            next_token = self._sample_next_tokens(logits, temperature, top_p)
             
-            # Safety check
+            # Safety check on the newly emitted text only
             if safety_check:
-                current_text = self._detokenize(generated_tokens + [next_token.item()])
-                safety_result = self.ethical_guardrails.check_content_safety(current_text)
+                check_start = time.perf_counter()
+                safety_result = scanner.feed(self._detokenize_next(generated_tokens, next_token.item()), commit=False)
                 
-                if not safety_result["is_safe"]:
+                if safety_result["is_safe"]:
+                    scanner.commit()
+                else:
                     logger.warning(f"Safety violation detected: {safety_result['violations']}")
                     # Replace with safe token or stop generation
                     next_token = torch.tensor([[self._get_safe_token()]], device=self.device)
+                    scanner.feed(self._detokenize_next(generated_tokens, next_token.item()))
+                safety_time += time.perf_counter() - check_start
             
             generated_tokens.append(next_token.item())
-            input_ids = torch.cat([input_ids, next_token], dim=1)
+            input_ids = next_token
+            if not neural_interval:
+                yield generated_tokens[released:]
+                released = len(generated_tokens)
             
             # Stop if end token
             if next_token.item() == self._get_end_token():
                 break
         
-        return self._detokenize(generated_tokens)
+        # Score whatever is left in the last partial batch
+        if pending_hidden and not neural_flagged:
+            check_start = time.perf_counter()
+            self._check_pending_hidden(pending_hidden, pending_steps, generated_tokens)
+            safety_time += time.perf_counter() - check_start
+            neural_checks += 1
+        
+        if safety_check:
+            self._record_safety_overhead(safety_time, time.perf_counter() - start_time, neural_checks)
+        
+        if len(generated_tokens) > released:
+            yield generated_tokens[released:]
+    
+    def generate_batch(self, prompts: List[str], max_lengths: Optional[List[int]] = None,
+                       temperatures: Optional[List[float]] = None, top_ps: Optional[List[float]] = None,
+                       safety_check: bool = True) -> List[str]:
+        """Generate for several prompts in one left-padded batch
+        
+        Every decode step is a single forward pass over all unfinished rows.
+        A row stops on the end token, its own max_length or a neural safety
+        flag and is then dropped from the batch together with its cache
+        rows. Keyword and neural safety checks apply per row as in generate.
+        """
+        start_time = time.perf_counter()
+        safety_time = 0.0
+        batch_size = len(prompts)
+        max_lengths = list(max_lengths) if max_lengths is not None else [100] * batch_size
+        temperatures = list(temperatures) if temperatures is not None else [0.7] * batch_size
+        top_ps = list(top_ps) if top_ps is not None else [0.9] * batch_size
+        generated_tokens: List[List[int]] = [[] for _ in prompts]
+        
+        rows = [row for row in range(batch_size) if max_lengths[row] > 0]
+        if not rows:
+            return ["" for _ in prompts]
+        
+        # Left-pad so every prompt ends in the last column
+        sequences = [
+            self._tokenize(prompts[row])[-(self.config.max_seq_length - 1):] or [self._get_safe_token()]
+            for row in rows
+        ]
+        width = max(len(tokens) for tokens in sequences)
+        input_ids = torch.full((len(rows), width), VocabTokenizer.PAD_TOKEN_ID, dtype=torch.long)
+        attention_mask = torch.zeros((len(rows), width), dtype=torch.long)
+        for i, tokens in enumerate(sequences):
+            input_ids[i, width - len(tokens):] = torch.tensor(tokens, dtype=torch.long)
+            attention_mask[i, width - len(tokens):] = 1
+        input_ids = input_ids.to(self.device)
+        attention_mask = attention_mask.to(self.device)
+        position_ids = (attention_mask.cumsum(dim=-1) - 1).clamp(min=0)
+        
+        temperature = torch.tensor([temperatures[row] for row in rows], device=self.device).unsqueeze(1)
+        top_p = torch.tensor([top_ps[row] for row in rows], device=self.device).unsqueeze(1)
+        
+        past_key_values = None
+        scanners = {row: self.ethical_guardrails.create_scanner() for row in rows} if safety_check else {}
+        neural_interval = self.config.neural_safety_interval if safety_check else 0
+        pending: List[Tuple[int, List[int], torch.Tensor]] = []
+        neural_checks = 0
+        end_token = self._get_end_token()
+        
+        step = 0
+        while rows and width + step < self.config.max_seq_length:
+            with torch.no_grad():
+                logits, last_hidden, past_key_values = self.decode_step(
+                    input_ids, past_key_values, attention_mask=attention_mask, position_ids=position_ids
+                )
+            
+            # Neural safety on the hidden states of all active rows at once
+            finished = set()
+            if neural_interval:
+                pending.append((step, list(rows), last_hidden))
+                if len(pending) >= neural_interval:
+                    check_start = time.perf_counter()
+                    finished = self._check_pending_hidden_batch(pending, generated_tokens)
+                    safety_time += time.perf_counter() - check_start
+                    neural_checks += 1
+                    pending = []
+            
+            next_tokens = self._sample_next_tokens(logits, temperature, top_p)
+            
+            for i, row in enumerate(rows):
+                if row in finished:
+                    continue
+                token = next_tokens[i, 0].item()
+                
+                if safety_check:
+                    check_start = time.perf_counter()
+                    safety_result = scanners[row].feed(self._detokenize_next(generated_tokens[row], token), commit=False)
+                    if safety_result["is_safe"]:
+                        scanners[row].commit()
+                    else:
+                        logger.warning(f"Safety violation detected: {safety_result['violations']}")
+                        token = self._get_safe_token()
+                        next_tokens[i, 0] = token
+                        scanners[row].feed(self._detokenize_next(generated_tokens[row], token))
+                    safety_time += time.perf_counter() - check_start
+                
+                generated_tokens[row].append(token)
+                if token == end_token or len(generated_tokens[row]) >= max_lengths[row]:
+                    finished.add(row)
+            
+            step += 1
+            input_ids = next_tokens
+            attention_mask = torch.cat([attention_mask, attention_mask.new_ones((len(rows), 1))], dim=1)
+            position_ids = position_ids[:, -1:] + 1
+            
+            # Drop finished rows so they no longer cost compute
+            if finished:
+                keep = [i for i, row in enumerate(rows) if row not in finished]
+                rows = [rows[i] for i in keep]
+                index = torch.tensor(keep, dtype=torch.long, device=self.device)
+                input_ids = input_ids.index_select(0, index)
+                attention_mask = attention_mask.index_select(0, index)
+                position_ids = position_ids.index_select(0, index)
+                temperature = temperature.index_select(0, index)
+                top_p = top_p.index_select(0, index)
+                past_key_values = [(key.index_select(0, index), value.index_select(0, index))
+                                   for key, value in past_key_values]
+        
+        # Score whatever is left in the last partial batch
+        if pending:
+            check_start = time.perf_counter()
+            self._check_pending_hidden_batch(pending, generated_tokens)
+            safety_time += time.perf_counter() - check_start
+            neural_checks += 1
+        
+        if safety_check:
+            self._record_safety_overhead(safety_time, time.perf_counter() - start_time, neural_checks)
+        
+        return [self._detokenize(tokens) for tokens in generated_tokens]
+    
+    def _sample_next_tokens(self, logits: torch.Tensor, temperature, top_p) -> torch.Tensor:
+        """Temperature and nucleus sampling; temperature and top_p are floats or (batch, 1) tensors"""
+        logits = logits / temperature
+        sorted_logits, sorted_indices = torch.sort(logits, descending=True)
+        cumulative_probs = torch.cumsum(F.softmax(sorted_logits, dim=-1), dim=-1)
+        
+        # Remove tokens with cumulative probability above top_p
+        sorted_indices_to_remove = cumulative_probs > top_p
+        sorted_indices_to_remove[..., 1:] = sorted_indices_to_remove[..., :-1].clone()
+        sorted_indices_to_remove[..., 0] = 0
+        
+        indices_to_remove = sorted_indices_to_remove.scatter(1, sorted_indices, sorted_indices_to_remove)
+        logits[indices_to_remove] = float('-inf')
+        
+        # Sample next token
+        probs = F.softmax(logits, dim=-1)
+        return torch.multinomial(probs, num_samples=1)
+    
+    def _check_pending_hidden_batch(self, pending: List[Tuple[int, List[int], torch.Tensor]],
+                                    generated_tokens: List[List[int]]) -> set:
+        """Batched _check_pending_hidden over (step, rows, hidden) entries
+        
+        Each flagged row is truncated at its first flagged step; returns the
+        set of flagged rows.
+        """
+        flagged = self.ethical_guardrails.check_hidden_states(
+            torch.cat([hidden for _, _, hidden in pending], dim=0)
+        ).tolist()
+        
+        flagged_rows = set()
+        offset = 0
+        for step, rows, _ in pending:
+            for row, is_flagged in zip(rows, flagged[offset:offset + len(rows)]):
+                if is_flagged and row not in flagged_rows:
+                    flagged_rows.add(row)
+                    del generated_tokens[row][max(step - 1, 0):]
+                    logger.warning(f"Neural safety check flagged generation step {step} of row {row}")
+                    self.performance_metrics["neural_safety_flags"] = (
+                        self.performance_metrics.get("neural_safety_flags", 0) + 1
+                    )
+            offset += len(rows)
+        return flagged_rows
+    
+    def _check_pending_hidden(self, pending_hidden: List[torch.Tensor], pending_steps: List[int],
+                              generated_tokens: List[int]) -> bool:
+        """Score buffered hidden states and truncate output at the first flagged step
+        
+        The hidden state of step j covers the prompt plus generated_tokens[:j],
+        so a flag at step j drops generated token j - 1 and everything after.
+        """
+        flagged = self.ethical_guardrails.check_hidden_states(torch.cat(pending_hidden, dim=0))
+        flagged_rows = flagged.nonzero()
+        if flagged_rows.numel() == 0:
+            return False
+        
+        step = pending_steps[flagged_rows[0, 0].item()]
+        del generated_tokens[max(step - 1, 0):]
+        logger.warning(f"Neural safety check flagged generation step {step}")
+        self.performance_metrics["neural_safety_flags"] = self.performance_metrics.get("neural_safety_flags", 0) + 1
+        return True
+    
+    def _record_safety_overhead(self, safety_time: float, total_time: float, neural_checks: int):
+        """Track how much of each request's latency is spent on safety checks"""
+        metrics = self.performance_metrics
+        requests = metrics.get("safety_requests", 0) + 1
+        total_safety_ms = metrics.get("total_safety_ms", 0.0) + safety_time * 1000
+        total_generation_ms = metrics.get("total_generation_ms", 0.0) + total_time * 1000
+        
+        metrics.update({
+            "safety_requests": requests,
+            "total_safety_ms": total_safety_ms,
+            "total_generation_ms": total_generation_ms,
+            "last_safety_overhead_ms": safety_time * 1000,
+            "avg_safety_overhead_ms": total_safety_ms / requests,
+            "safety_overhead_pct": 100.0 * total_safety_ms / total_generation_ms if total_generation_ms else 0.0,
+            "neural_safety_checks": metrics.get("neural_safety_checks", 0) + neural_checks
+        })
     
     def _tokenize(self, text: str) -> List[int]:
-        """Simple tokenization - in practice, use proper tokenizer"""
-        # Simplified tokenization
-        words = text.split()
-        tokens = []
-        for word in words:
-            # Simple hash-based tokenization
-            token_id = hash(word) % self.config.vocab_size
-            tokens.append(token_id)
-        return tokens
+        """Tokenize text with the model's vocabulary"""
+        return self.tokenizer.encode(text)
     
     def _detokenize(self, tokens: List[int]) -> str:
-        """Simple detokenization - in practice, use proper tokenizer"""
-        # Simplified detokenization
-        return " ".join([f"token_{token}" for token in tokens])
+        """Decode token IDs back to text"""
+        return self.tokenizer.decode(tokens)
+    
+    def _detokenize_next(self, generated_tokens: List[int], token: int) -> str:
+        """Text that appending token adds to _detokenize(generated_tokens)
+        
+        Pieces carry their own leading space, so this is the token's own
+        text (a byte token that splits a multi-byte character decodes to a
+        replacement character on its own)
+        """
+        return self.tokenizer.decode([token])
     
     def _get_end_token(self) -> int:
         """Get end token ID"""
-        return self.config.vocab_size - 1
+        return VocabTokenizer.EOS_TOKEN_ID
     
     def _get_safe_token(self) -> int:
         """Get safe token ID"""
-        return 0  # Usually represents a safe, neutral token
+        return VocabTokenizer.BOS_TOKEN_ID
     
-    def train_step(self, batch: Dict[str, torch.Tensor]) -> Dict[str, float]:
-        """Single training step with ethical monitoring"""
-        self.train()
+    def autocast_context(self):
+        """Mixed-precision context for forward passes: bf16 autocast on CPU, and on GPUs that support it"""
+        if not self.config.mixed_precision or self.quantized:
+            return torch.autocast(device_type=self.device.type, enabled=False)
+        if self.device.type == "cuda" and not torch.cuda.is_bf16_supported():
+            return torch.autocast(device_type="cuda", enabled=False)
+        return torch.autocast(device_type=self.device.type, dtype=torch.bfloat16)
+    
+    def compute_loss(self, batch: Dict[str, torch.Tensor]) -> Tuple[torch.Tensor, Dict[str, torch.Tensor], int]:
+        """Next-token cross-entropy for a batch
         
+        Position t predicts token t + 1 of "labels" (or of "input_ids" when
+        the batch has no labels). Padding positions from attention_mask and
+        labels of -100 are ignored. Returns the mean loss in fp32, the
+        forward outputs and the number of predicted tokens.
+        """
         input_ids = batch["input_ids"].to(self.device)
-        labels = batch["labels"].to(self.device)
-        attention_mask = batch.get("attention_mask", torch.ones_like(input_ids)).to(self.device)
+        labels = batch.get("labels", input_ids).to(self.device)
+        attention_mask = batch.get("attention_mask")
+        attention_mask = attention_mask.to(self.device) if attention_mask is not None else torch.ones_like(input_ids)
         
-        # Forward pass
-        outputs = self.forward(input_ids, attention_mask)
+        with self.autocast_context():
+            outputs = self.forward(input_ids, attention_mask)
         logits = outputs["logits"]
         
-        # Calculate loss
-        loss = F.cross_entropy(logits.view(-1, logits.size(-1)), labels.view(-1))
+        shift_logits = logits[:, :-1].float()
+        shift_labels = labels[:, 1:].masked_fill(attention_mask[:, 1:] == 0, -100)
+        loss = F.cross_entropy(
+            shift_logits.reshape(-1, shift_logits.size(-1)), shift_labels.reshape(-1), ignore_index=-100
+        )
+        num_tokens = int((shift_labels != -100).sum())
+        return loss, outputs, num_tokens
+    
+    def train_step(self, batch: Dict[str, torch.Tensor]) -> Dict[str, Any]:
+        """Forward pass and loss for one training micro-batch with ethical monitoring
+        
+        The returned "loss" is still attached to the graph; the caller runs
+        backward and the optimizer step.
+        """
+        self.train()
+        loss, outputs, num_tokens = self.compute_loss(batch)
         
         # Ethical monitoring during training
         if self.config.adaptive_learning:
             self._monitor_training_ethics(batch, outputs)
         
-        return {"loss": loss.item()}
+        return {"loss": loss, "num_tokens": num_tokens}
     
     def _monitor_training_ethics(self, batch: Dict[str, torch.Tensor], outputs: Dict[str, torch.Tensor]):
         """Monitor ethical aspects during training"""
@@ -440,45 +1594,257 @@ class CareConnectModel(nn.Module):
         self.performance_metrics["sequence_length"] = batch["input_ids"].size(1)
         self.performance_metrics["last_update"] = time.time()
     
-    def save_model(self, path: str, include_metadata: bool = True):
-        """Save model with metadata"""
-        model_data = {
-            "model_state_dict": self.state_dict(),
-            "config": self.config,
-            "performance_metrics": self.performance_metrics,
-            "training_history": self.training_history
+    def enable_lora(self, target_modules: Optional[List[str]] = None) -> List[LoRALinear]:
+        """Swap the targeted Linear layers of every block for LoRALinear wrappers"""
+        if self.quantized:
+            raise ValueError("LoRA adapters need a dense model; load the model without quantization")
+        
+        target_modules = list(target_modules or self.config.lora_target_modules)
+        for block in self.transformer_blocks:
+            for target in target_modules:
+                parent_name, _, child_name = target.rpartition(".")
+                parent = block.get_submodule(parent_name) if parent_name else block
+                layer = getattr(parent, child_name)
+                if not isinstance(layer, LoRALinear):
+                    setattr(parent, child_name, LoRALinear.from_linear(layer, self.config.lora_dropout))
+        return self.lora_layers()
+    
+    def lora_layers(self) -> List[LoRALinear]:
+        """All LoRA-wrapped layers"""
+        return [module for module in self.modules() if isinstance(module, LoRALinear)]
+    
+    def add_adapter(self, name: str, rank: Optional[int] = None, alpha: Optional[float] = None,
+                    target_modules: Optional[List[str]] = None):
+        """Add a new zero-initialized adapter to every LoRA layer"""
+        if not name or "." in name:
+            raise ValueError(f"Invalid adapter name: {name!r}")
+        if name in self.adapters:
+            raise ValueError(f"Adapter {name} already exists")
+        
+        rank = rank or self.config.lora_rank
+        alpha = alpha or self.config.lora_alpha
+        for layer in self.enable_lora(target_modules):
+            layer.add_adapter(name, rank, alpha)
+        self.adapters[name] = {"rank": rank, "alpha": alpha,
+                               "target_modules": list(target_modules or self.config.lora_target_modules)}
+        logger.info(f"Added adapter {name} (rank {rank}, {self.adapter_parameter_count(name)} parameters)")
+    
+    def remove_adapter(self, name: str):
+        """Remove an adapter from every layer"""
+        for layer in self.lora_layers():
+            if name in layer.lora_A:
+                layer.remove_adapter(name)
+        self.adapters.pop(name)
+        if self.active_adapter == name:
+            self.active_adapter = None
+    
+    def set_adapter(self, name: Optional[str]):
+        """Activate an adapter (None runs the bare base model); any merged adapter is unmerged first"""
+        if name is not None and name not in self.adapters:
+            raise KeyError(f"Unknown adapter: {name}")
+        for layer in self.lora_layers():
+            layer.unmerge()
+            layer.active_adapter = name if name in layer.lora_A else None
+        self.active_adapter = name
+    
+    def merge_adapter(self):
+        """Merge the active adapter into the base weights for inference"""
+        for layer in self.lora_layers():
+            layer.merge()
+    
+    def unmerge_adapter(self):
+        """Undo merge_adapter"""
+        for layer in self.lora_layers():
+            layer.unmerge()
+    
+    def adapter_state_dict(self, name: str) -> Dict[str, torch.Tensor]:
+        """Parameters of one adapter, keyed like the model's state dict"""
+        suffixes = (f".lora_A.{name}", f".lora_B.{name}")
+        return {key: value.detach() for key, value in self.named_parameters() if key.endswith(suffixes)}
+    
+    def adapter_parameter_count(self, name: str) -> int:
+        """Number of trainable values in one adapter"""
+        return sum(value.numel() for value in self.adapter_state_dict(name).values())
+    
+    def freeze_for_adapter(self, name: str) -> List[nn.Parameter]:
+        """Freeze everything except the named adapter and return its parameters"""
+        suffixes = (f".lora_A.{name}", f".lora_B.{name}")
+        trainable = []
+        for key, param in self.named_parameters():
+            param.requires_grad = key.endswith(suffixes)
+            if param.requires_grad:
+                trainable.append(param)
+        return trainable
+    
+    def unfreeze(self):
+        """Make every parameter trainable again"""
+        for param in self.parameters():
+            param.requires_grad = True
+    
+    def save_adapter(self, path: str, name: Optional[str] = None) -> str:
+        """Save one adapter as a small tensor-blob file"""
+        name = name or self.active_adapter
+        if name not in self.adapters:
+            raise KeyError(f"Unknown adapter: {name}")
+        
+        metadata = {
+            "adapter": name,
+            **self.adapters[name],
+            "embedding_dim": self.config.embedding_dim,
+            "hidden_dim": self.config.hidden_dim,
+            "num_layers": self.config.num_layers,
+            "created_at": time.time()
         }
+        state_dict = {key: value.contiguous() for key, value in self.adapter_state_dict(name).items()}
+        adapter_hash = save_tensor_blob(path, state_dict, metadata)
+        logger.info(f"Adapter {name} saved to {path} (sha256 {adapter_hash})")
+        return adapter_hash
+    
+    def load_adapter(self, path: str, name: Optional[str] = None, activate: bool = True) -> str:
+        """Load an adapter saved with save_adapter next to the ones already in memory"""
+        state_dict, metadata = load_tensor_blob(path)
+        for key in ("embedding_dim", "hidden_dim", "num_layers"):
+            if metadata.get(key) != getattr(self.config, key):
+                raise ValueError(f"Adapter {path} was trained for {key}={metadata.get(key)}")
+        
+        saved_name = metadata["adapter"]
+        name = name or saved_name
+        if name in self.adapters:
+            self.remove_adapter(name)
+        self.add_adapter(name, metadata["rank"], metadata["alpha"], metadata["target_modules"])
+        
+        parameters = dict(self.named_parameters())
+        with torch.no_grad():
+            for key, value in state_dict.items():
+                target_key = key[:-len(saved_name)] + name
+                if target_key not in parameters:
+                    raise ValueError(f"Adapter parameter {key} does not match this model")
+                parameters[target_key].copy_(value)
+        
+        if activate:
+            self.set_adapter(name)
+        logger.info(f"Adapter {name} loaded from {path}")
+        return name
+    
+    def base_state_dict(self) -> Dict[str, torch.Tensor]:
+        """State dict without adapter parameters or merged adapter updates"""
+        state_dict = {key: value for key, value in self.state_dict().items() if ".lora_" not in key}
+        for module_name, module in self.named_modules():
+            if isinstance(module, LoRALinear) and module.merged_adapter is not None:
+                key = f"{module_name}.weight"
+                state_dict[key] = state_dict[key] - module.delta_weight(module.merged_adapter).detach()
+        return state_dict
+    
+    def _load_base_state_dict(self, state_dict: Dict[str, torch.Tensor]):
+        """Copy base weights into the existing parameters; adapter parameters already in memory are kept
         
+        Copying (rather than assigning) keeps the Parameter objects that
+        optimizers and compiled graphs hold, and never leaves the model
+        backed by a checkpoint file that may later be overwritten.
+        """
+        self.unmerge_adapter()
+        missing, unexpected = self.load_state_dict(state_dict, strict=False)
+        missing = [key for key in missing if ".lora_" not in key]
+        if missing or unexpected:
+            raise RuntimeError(f"Checkpoint does not match model: missing {missing}, unexpected {unexpected}")
+    
+    def save_model(self, path: str, include_metadata: bool = True):
+        """Save model with metadata
+        
+        Dense models are written as an aligned tensor-blob file that
+        load_model memory-maps; quantized models keep the gzip-pickle format
+        because their packed weights are not plain tensors. Adapters are not
+        included; save them with save_adapter.
+        """
+        state_dict = self.base_state_dict()
+        metadata = {}
         if include_metadata:
-            model_data["metadata"] = {
+            metadata = {
                 "version": "5.0.0",
                 "created_at": time.time(),
                 "ethical_guardrails": True,
-                "privacy_enabled": self.config.encryption_enabled,
-                "model_hash": self._calculate_model_hash()
+                "privacy_enabled": self.config.encryption_enabled
             }
         
+        metadata["tokenizer"] = self.tokenizer.to_dict()
+        
+        if is_plain_state_dict(state_dict):
+            metadata.update({
+                "config": asdict(self.config),
+                "performance_metrics": self.performance_metrics,
+                "training_history": self.training_history
+            })
+            model_hash = save_tensor_blob(path, state_dict, metadata)
+            logger.info(f"Model saved to {path} (sha256 {model_hash})")
+            return
+        
+        model_data = {
+            "model_state_dict": state_dict,
+            "config": self.config,
+            "performance_metrics": self.performance_metrics,
+            "training_history": self.training_history
+        }
+        if include_metadata:
+            metadata["model_hash"] = hash_state_dict(state_dict)
+        model_data["metadata"] = metadata
+        
         # Save with compression
-        with gzip.open(path, 'wb') as f:
+        with replace_on_success(path) as tmp_path, gzip.open(tmp_path, 'wb') as f:
             pickle.dump(model_data, f)
         
         logger.info(f"Model saved to {path}")
     
-    def load_model(self, path: str):
-        """Load model from file"""
-        with gzip.open(path, 'rb') as f:
-            model_data = pickle.load(f)
+    def load_model(self, path: str, quantize: Optional[str] = None, verify: bool = False):
+        """Load model from file, optionally quantizing it for CPU inference
         
-        self.load_state_dict(model_data["model_state_dict"])
+        Tensor-blob checkpoints are memory-mapped and copied straight from the
+        mapping into the existing parameters; pass verify=True to check their
+        SHA-256 (this reads every page twice). Legacy gzip-pickle files are
+        still accepted.
+        """
+        model_data = read_checkpoint(path, verify=verify)
+        
+        # Quantized checkpoints are loaded straight into a quantized model
+        saved_quantize = getattr(model_data.get("config"), "quantize", None)
+        if saved_quantize and not self.quantized:
+            self.quantize(saved_quantize)
+        
+        self._load_base_state_dict(model_data["model_state_dict"])
         self.performance_metrics = model_data.get("performance_metrics", {})
         self.training_history = model_data.get("training_history", [])
         
-        logger.info(f"Model loaded from {path}")
+        # Token IDs are only meaningful with the vocabulary the model was saved with
+        tokenizer_data = (model_data.get("metadata") or {}).get("tokenizer")
+        if tokenizer_data is not None:
+            self.set_tokenizer(VocabTokenizer.from_dict(tokenizer_data))
+        
+        if quantize and not self.quantized:
+            self.quantize(quantize)
+        
+        logger.info(f"Model loaded from {path} ({model_data['format']})")
+    
+    def quantize(self, mode: str = "int8") -> "CareConnectModel":
+        """Convert the model in place for quantized CPU inference"""
+        if self.quantized:
+            raise ValueError(f"Model is already quantized ({self.quantized})")
+        if self.lora_layers():
+            raise ValueError("Quantize the base model without LoRA adapters")
+        
+        quantize_dynamic_model(self, mode)
+        self.quantized = mode
+        self.config.quantize = mode
+        self.device = torch.device("cpu")
+        self.ethical_guardrails.to(self.device)
+        
+        logger.info(f"Model quantized to {mode}")
+        if self.compiled_decode_step is not None:
+            # The compiled graph captured the float modules
+            self.compile_for_inference(self.compile_stats.get("warmup_lengths"))
+        return self
     
     def _calculate_model_hash(self) -> str:
         """Calculate hash of model parameters for integrity checking"""
-        model_bytes = pickle.dumps(self.state_dict())
-        return hashlib.sha256(model_bytes).hexdigest()
+        return hash_state_dict(self.state_dict())
     
     def get_model_info(self) -> Dict[str, Any]:
         """Get comprehensive model information"""
@@ -512,63 +1878,139 @@ class ModelManager:
         self.scheduler = torch.optim.lr_scheduler.CosineAnnealingLR(
             self.optimizer, T_max=config.max_epochs
         )
+    
+    def create_dataloader(self, dataset: Dataset, shuffle: bool = True) -> DataLoader:
+        """DataLoader using the configured batch size"""
+        return DataLoader(dataset, batch_size=self.config.batch_size, shuffle=shuffle)
+    
+    def train_epoch(self, train_loader: DataLoader) -> Dict[str, float]:
+        """One pass over train_loader with gradient accumulation
+        
+        Each micro-batch loss is divided by the number of micro-batches in
+        its accumulation group, gradients are clipped to gradient_clipping
+        and the optimizer steps every gradient_accumulation_steps
+        micro-batches (and once more for a trailing partial group).
+        """
+        self.model.train()
+        accumulation_steps = max(self.config.gradient_accumulation_steps, 1)
+        num_batches = len(train_loader)
+        total_loss, total_tokens, optimizer_steps = 0.0, 0, 0
+        start_time = time.perf_counter()
+        
+        self.optimizer.zero_grad(set_to_none=True)
+        for step, batch in enumerate(train_loader):
+            loss_dict = self.model.train_step(batch)
+            loss = loss_dict["loss"]
+            
+            # Average gradients over the micro-batches of this group
+            group_start = step - step % accumulation_steps
+            group_size = min(accumulation_steps, num_batches - group_start)
+            (loss / group_size).backward()
+            
+            total_loss += loss.item() * loss_dict["num_tokens"]
+            total_tokens += loss_dict["num_tokens"]
+            
+            if step + 1 == group_start + group_size:
+                if self.config.gradient_clipping:
+                    torch.nn.utils.clip_grad_norm_(self.model.parameters(), self.config.gradient_clipping)
+                self.optimizer.step()
+                self.optimizer.zero_grad(set_to_none=True)
+                optimizer_steps += 1
         
-    def train(self, train_loader: DataLoader, val_loader: Optional[DataLoader] = None):
-        """Train the model"""
+        elapsed = time.perf_counter() - start_time
+        return {
+            "loss": total_loss / total_tokens if total_tokens else 0.0,
+            "tokens": total_tokens,
+            "tokens_per_sec": total_tokens / elapsed if elapsed > 0 else 0.0,
+            "optimizer_steps": optimizer_steps
+        }
+    
+    def evaluate_loss(self, data_loader: DataLoader) -> float:
+        """Token-weighted mean next-token loss over a loader"""
+        self.model.eval()
+        total_loss, total_tokens = 0.0, 0
+        with torch.no_grad():
+            for batch in data_loader:
+                loss, _, num_tokens = self.model.compute_loss(batch)
+                total_loss += loss.item() * num_tokens
+                total_tokens += num_tokens
+        return total_loss / total_tokens if total_tokens else 0.0
+    
+    def train(self, train_loader: Any, val_loader: Optional[Any] = None,
+              epochs: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Train the model
+        
+        Datasets are wrapped in DataLoaders with config.batch_size; epochs
+        defaults to config.max_epochs.
+        """
         logger.info("Starting model training...")
+        if not isinstance(train_loader, DataLoader):
+            train_loader = self.create_dataloader(train_loader)
+        if val_loader is not None and not isinstance(val_loader, DataLoader):
+            val_loader = self.create_dataloader(val_loader, shuffle=False)
+        epochs = epochs or self.config.max_epochs
         
-        for epoch in range(self.config.max_epochs):
+        for epoch in range(epochs):
             # Training
-            train_loss = 0.0
-            for batch in train_loader:
-                loss_dict = self.model.train_step(batch)
-                loss = loss_dict["loss"]
-                
-                self.optimizer.zero_grad()
-                loss.backward()
-                
-                # Gradient clipping
-                torch.nn.utils.clip_grad_norm_(self.model.parameters(), self.config.gradient_clipping)
-                
-                self.optimizer.step()
-                train_loss += loss.item()
+            train_stats = self.train_epoch(train_loader)
             
             # Validation
-            val_loss = 0.0
-            if val_loader:
-                self.model.eval()
-                with torch.no_grad():
-                    for batch in val_loader:
-                        loss_dict = self.model.train_step(batch)
-                        val_loss += loss_dict["loss"]
+            val_loss = self.evaluate_loss(val_loader) if val_loader else None
             
             # Update learning rate
             self.scheduler.step()
             
             # Log progress
-            avg_train_loss = train_loss / len(train_loader)
-            avg_val_loss = val_loss / len(val_loader) if val_loader else None
-            
-            logger.info(f"Epoch {epoch+1}/{self.config.max_epochs}")
-            logger.info(f"Train Loss: {avg_train_loss:.4f}")
-            if avg_val_loss:
-                logger.info(f"Val Loss: {avg_val_loss:.4f}")
+            logger.info(f"Epoch {epoch+1}/{epochs}")
+            logger.info(f"Train Loss: {train_stats['loss']:.4f} ({train_stats['tokens_per_sec']:.0f} tokens/sec)")
+            if val_loss is not None:
+                logger.info(f"Val Loss: {val_loss:.4f}")
             
             # Save training history
             self.model.training_history.append({
                 "epoch": epoch + 1,
-                "train_loss": avg_train_loss,
-                "val_loss": avg_val_loss,
+                "train_loss": train_stats["loss"],
+                "val_loss": val_loss,
+                "tokens_per_sec": train_stats["tokens_per_sec"],
+                "optimizer_steps": train_stats["optimizer_steps"],
                 "learning_rate": self.scheduler.get_last_lr()[0]
             })
+            self.model.performance_metrics["train_tokens_per_sec"] = train_stats["tokens_per_sec"]
+        
+        return self.model.training_history
+    
+    def train_adapter(self, name: str, train_loader: Any, val_loader: Optional[Any] = None,
+                      epochs: Optional[int] = None, rank: Optional[int] = None,
+                      alpha: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Fine-tune only a low-rank adapter; the base weights stay frozen and shared
+        
+        The adapter is created if needed and left active afterwards. A
+        separate AdamW optimizer over the adapter parameters is used, so the
+        full-model optimizer state is untouched.
+        """
+        if name not in self.model.adapters:
+            self.model.add_adapter(name, rank, alpha)
+        self.model.set_adapter(name)
+        trainable = self.model.freeze_for_adapter(name)
+        
+        optimizer, scheduler = self.optimizer, self.scheduler
+        self.optimizer = torch.optim.AdamW(trainable, lr=self.config.learning_rate, weight_decay=0.0)
+        self.scheduler = torch.optim.lr_scheduler.CosineAnnealingLR(
+            self.optimizer, T_max=epochs or self.config.max_epochs
+        )
+        try:
+            return self.train(train_loader, val_loader, epochs)
+        finally:
+            self.optimizer, self.scheduler = optimizer, scheduler
+            self.model.unfreeze()
     
     def save_model(self, path: str):
         """Save the model"""
         self.model.save_model(path)
     
-    def load_model(self, path: str):
+    def load_model(self, path: str, quantize: Optional[str] = None):
         """Load the model"""
-        self.model.load_model(path)
+        self.model.load_model(path, quantize=quantize)
     
     def generate_text(self, prompt: str, **kwargs) -> str:
         """Generate text with the model"""
@@ -9,36 +9,103 @@ import json
 import os
 import logging
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple, Any
+from dataclasses import fields
+from typing import Dict, Iterator, List, Optional, Tuple, Any, AsyncIterator
 import numpy as np
 from pathlib import Path
 import argparse
+import asyncio
 import time
 import threading
-from queue import Queue
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor, CancelledError, TimeoutError as FutureTimeoutError
+import math
+import itertools
+from queue import PriorityQueue, Empty, Full
+from collections import Counter, deque
 import signal
 import sys
 
-from model import CareConnectModel, CareConnectConfig, CareConnectAI
+from model import CareConnectModel, ModelConfig, read_checkpoint
+from resources import configure_worker_resources
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class AdmissionRejected(Exception):
+    """Request refused by admission control; retry after retry_after seconds"""
+    
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"Request rejected ({reason}); retry after {retry_after:.0f}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+def parse_admission_fields(data: Any) -> Tuple[int, Optional[float]]:
+    """Priority and deadline_ms of a /predict body; raises ValueError with a message for the client"""
+    if not isinstance(data, dict):
+        raise ValueError("Request body must be a JSON object")
+    
+    priority = data.get('priority', 1)
+    if isinstance(priority, float) and priority.is_integer():
+        priority = int(priority)
+    if isinstance(priority, bool) or not isinstance(priority, int):
+        raise ValueError("priority must be an integer")
+    
+    deadline_ms = data.get('deadline_ms')
+    if deadline_ms is not None:
+        if isinstance(deadline_ms, bool) or not isinstance(deadline_ms, (int, float)):
+            raise ValueError("deadline_ms must be a number")
+        if not math.isfinite(deadline_ms) or deadline_ms <= 0:
+            raise ValueError("deadline_ms must be a positive finite number")
+    
+    return priority, deadline_ms
+
 class CareConnectPredictor:
     """Real-time prediction interface for CareConnect AI"""
     
-    def __init__(self, model_path: str = "checkpoints/steward-v5.pt", config_path: str = "config/model_config.json"):
+    def __init__(self, model_path: str = "checkpoints/steward-v5.pt", config_path: str = "config/model_config.json",
+                 intra_op_threads: Optional[int] = None, inter_op_threads: Optional[int] = 1,
+                 cpu_affinity: Optional[str] = None, max_batch_size: int = 8, max_batch_wait_ms: float = 10.0,
+                 max_queue_size: int = 256, default_deadline_ms: float = 30000.0):
         self.model_path = model_path
-        self.config = CareConnectConfig(config_path)
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         
-        # Initialize AI system
-        self.ai = CareConnectAI(model_path, config_path)
+        # Size thread pools before the model does any work, so several
+        # predictors on one host do not each claim every core
+        self.worker_resources = configure_worker_resources(intra_op_threads, inter_op_threads, cpu_affinity)
+        
+        # Initialize model; without a checkpoint it starts from fresh weights
+        self.config = self._load_config(model_path, config_path)
+        self.model = CareConnectModel(self.config)
+        if os.path.exists(model_path):
+            self.model.load_model(model_path)
+        else:
+            logger.warning(f"No checkpoint at {model_path}, using untrained weights")
+        self.model.eval()
+        self.device = self.model.device
+        
+        # Prediction queue for batch processing; a batch closes when it is
+        # full or max_batch_wait_ms after its first request arrived
+        self.max_batch_size = max(int(max_batch_size), 1)
+        self.max_batch_wait = max_batch_wait_ms / 1000.0
+        self.batch_size_histogram = Counter()
+        
+        # Admission control: a bounded queue ordered by (priority, deadline),
+        # early rejection when the estimated wait exceeds a request's
+        # deadline, and expired requests dropped before generation
+        self.prediction_queue = PriorityQueue(maxsize=max(int(max_queue_size), 1))
+        self.default_deadline = default_deadline_ms / 1000.0
+        self.request_sequence = itertools.count()
+        self.batch_time_ema = 0.0
+        self.shed_counts = Counter()
+        self.queue_waits = deque(maxlen=1000)
+        
+        # One future per async request, resolved by the batch worker
+        self.pending_futures: Dict[str, Future] = {}
+        self.futures_lock = threading.Lock()
         
-        # Prediction queue for batch processing
-        self.prediction_queue = Queue()
-        self.results_queue = Queue()
+        # Stats are updated from the batch worker and server threads
+        self.stats_lock = threading.Lock()
         
         # Performance tracking
         self.performance_stats = {
@@ -48,6 +115,7 @@ class CareConnectPredictor:
             "average_response_time": 0.0,
             "total_response_time": 0.0
         }
+        self._start_time = time.time()
         
         # Threading for background processing
         self.processing_thread = None
@@ -55,6 +123,20 @@ class CareConnectPredictor:
         
         logger.info(f"Predictor initialized on device: {self.device}")
     
+    @staticmethod
+    def _load_config(model_path: str, config_path: str) -> ModelConfig:
+        """Model config saved with the checkpoint, else from a JSON file of ModelConfig fields, else defaults"""
+        if os.path.exists(model_path):
+            return read_checkpoint(model_path)["config"]
+        
+        if config_path and os.path.exists(config_path):
+            with open(config_path, "r") as f:
+                config_data = json.load(f)
+            config_fields = {field.name for field in fields(ModelConfig)}
+            return ModelConfig(**{k: v for k, v in config_data.items() if k in config_fields})
+        
+        return ModelConfig()
+    
     def start_background_processing(self):
         """Start background processing thread"""
         if not self.running:
@@ -69,36 +151,133 @@ class CareConnectPredictor:
         if self.processing_thread:
             self.processing_thread.join()
             logger.info("Background processing stopped")
+        
+        # Wake anyone still waiting on a request that will never run
+        with self.futures_lock:
+            for future in self.pending_futures.values():
+                future.cancel()
     
     def _process_queue(self):
         """Background thread for processing prediction queue"""
         while self.running:
+            batch_requests = []
             try:
-                # Get batch of requests
-                batch_requests = []
-                batch_start_time = time.time()
-                
-                # Collect requests for batch processing
-                while len(batch_requests) < 10 and time.time() - batch_start_time < 0.1:
-                    try:
-                        request = self.prediction_queue.get(timeout=0.01)
-                        batch_requests.append(request)
-                    except:
-                        break
+                # Cancelled requests are skipped; the rest can no longer be cancelled
+                batch_requests = [
+                    request for request in self._collect_batch()
+                    if request['future'].set_running_or_notify_cancel()
+                ]
                 
                 if batch_requests:
                     # Process batch
+                    batch_start = time.time()
                     batch_results = self._process_batch(batch_requests)
+                    batch_time = time.time() - batch_start
+                    self.batch_time_ema = (
+                        batch_time if self.batch_time_ema == 0 else 0.8 * self.batch_time_ema + 0.2 * batch_time
+                    )
                     
-                    # Return results
+                    # Resolve each request's future so its waiter wakes immediately
                     for request, result in zip(batch_requests, batch_results):
-                        self.results_queue.put((request['id'], result))
+                        request['future'].set_result(result)
                 
             except Exception as e:
                 logger.error(f"Error in background processing: {e}")
+                for request in batch_requests:
+                    if not request['future'].done():
+                        request['future'].set_result({
+                            'success': False,
+                            'error': str(e),
+                            'response_time': 0,
+                            'timestamp': datetime.now().isoformat()
+                        })
+    
+    def _collect_batch(self) -> List[Dict]:
+        """Wait for a first request, then gather more until the batch is full or the wait expires
+        
+        Requests whose deadline has already passed are resolved as expired
+        here and never reach _process_batch.
+        """
+        batch_requests = []
+        close_time = None
+        while len(batch_requests) < self.max_batch_size:
+            if close_time is None:
+                timeout = 0.1
+            else:
+                timeout = close_time - time.time()
+            try:
+                _, _, _, request = (
+                    self.prediction_queue.get(timeout=timeout) if timeout > 0 else self.prediction_queue.get_nowait()
+                )
+            except Empty:
+                break
+            
+            now = time.time()
+            if request['deadline'] < now:
+                self._expire_request(request)
+                continue
+            
+            self.queue_waits.append(now - request['enqueued_at'])
+            batch_requests.append(request)
+            if close_time is None:
+                close_time = now + self.max_batch_wait
+        
+        if batch_requests:
+            self.batch_size_histogram[len(batch_requests)] += 1
+        return batch_requests
+    
+    def _expire_request(self, request: Dict):
+        """Resolve a request whose client deadline passed while it was queued"""
+        self.shed_counts['expired'] += 1
+        if request['future'].set_running_or_notify_cancel():
+            request['future'].set_result({
+                'success': False,
+                'error': "Deadline exceeded while queued",
+                'expired': True,
+                'response_time': 0,
+                'timestamp': datetime.now().isoformat()
+            })
+    
+    def estimate_queue_wait(self) -> float:
+        """Rough seconds until a newly queued request completes
+        
+        Batches ahead of it (including its own) times the moving average
+        batch time; zero until the first batch has been timed.
+        """
+        return (self.prediction_queue.qsize() // self.max_batch_size + 1) * self.batch_time_ema
     
     def _process_batch(self, requests: List[Dict]) -> List[Dict]:
-        """Process a batch of prediction requests"""
+        """Process a batch of prediction requests with one batched generate"""
+        if len(requests) == 1:
+            return self._process_sequential(requests)
+        
+        try:
+            start_time = time.time()
+            responses = self.model.generate_batch(
+                [request.get('text', '') for request in requests],
+                max_lengths=[request.get('max_length', 100) for request in requests],
+                temperatures=[request.get('temperature', 0.7) for request in requests]
+            )
+            response_time = time.time() - start_time
+        except Exception as e:
+            # One bad request should not fail the others
+            logger.error(f"Batched generation failed, retrying requests one by one: {e}")
+            return self._process_sequential(requests)
+        
+        results = []
+        for response in responses:
+            self._update_performance_stats(response_time, True)
+            results.append({
+                'success': True,
+                'response': response,
+                'response_time': response_time,
+                'batch_size': len(requests),
+                'timestamp': datetime.now().isoformat()
+            })
+        return results
+    
+    def _process_sequential(self, requests: List[Dict]) -> List[Dict]:
+        """Process requests one at a time"""
         results = []
         
         for request in requests:
@@ -139,23 +318,24 @@ class CareConnectPredictor:
         temperature = request.get('temperature', 0.7)
         
         # Generate response
-        response = self.ai.process_text(input_text, max_length, temperature)
+        response = self.model.generate(input_text, max_length, temperature)
         
         return response
     
     def _update_performance_stats(self, response_time: float, success: bool):
         """Update performance statistics"""
-        self.performance_stats['total_requests'] += 1
-        
-        if success:
-            self.performance_stats['successful_requests'] += 1
-            self.performance_stats['total_response_time'] += response_time
-            self.performance_stats['average_response_time'] = (
-                self.performance_stats['total_response_time'] / 
-                self.performance_stats['successful_requests']
-            )
-        else:
-            self.performance_stats['failed_requests'] += 1
+        with self.stats_lock:
+            self.performance_stats['total_requests'] += 1
+            
+            if success:
+                self.performance_stats['successful_requests'] += 1
+                self.performance_stats['total_response_time'] += response_time
+                self.performance_stats['average_response_time'] = (
+                    self.performance_stats['total_response_time'] / 
+                    self.performance_stats['successful_requests']
+                )
+            else:
+                self.performance_stats['failed_requests'] += 1
     
     def predict(self, text: str, max_length: int = 100, temperature: float = 0.7, 
                request_id: Optional[str] = None) -> Dict:
@@ -164,7 +344,7 @@ class CareConnectPredictor:
             start_time = time.time()
             
             # Generate response
-            response = self.ai.process_text(text, max_length, temperature)
+            response = self.model.generate(text, max_length, temperature)
             
             # Calculate response time
             response_time = time.time() - start_time
@@ -194,46 +374,129 @@ class CareConnectPredictor:
                 'timestamp': datetime.now().isoformat()
             }
     
-    def predict_async(self, text: str, max_length: int = 100, temperature: float = 0.7) -> str:
-        """Make a prediction asynchronously"""
-        request_id = f"req_{int(time.time() * 1000)}"
+    def predict_stream(self, text: str, max_length: int = 100, temperature: float = 0.7) -> Iterator[str]:
+        """Yield the response text while it is generated"""
+        start_time = time.time()
+        try:
+            yield from self.model.generate_stream(text, max_length, temperature)
+        except Exception:
+            self._update_performance_stats(0, False)
+            raise
+        self._update_performance_stats(time.time() - start_time, True)
+    
+    def predict_async(self, text: str, max_length: int = 100, temperature: float = 0.7, priority: int = 1,
+                      deadline_ms: Optional[float] = None) -> str:
+        """Make a prediction asynchronously; returns a request ID for get_async_result
+        
+        Lower priority values are served first, then earlier deadlines.
+        Raises AdmissionRejected when the queue is full or the estimated
+        wait already exceeds the deadline.
+        """
+        now = time.time()
+        priority = int(priority)
+        budget = deadline_ms / 1000.0 if deadline_ms is not None else self.default_deadline
+        
+        estimated_wait = self.estimate_queue_wait()
+        if estimated_wait > budget:
+            self.shed_counts['rejected_deadline'] += 1
+            raise AdmissionRejected("estimated wait exceeds deadline", max(estimated_wait - budget, 1.0))
+        
+        request_id = f"req_{uuid.uuid4().hex}"
+        future = Future()
         
         request = {
             'id': request_id,
             'text': text,
             'max_length': max_length,
-            'temperature': temperature
+            'temperature': temperature,
+            'priority': priority,
+            'enqueued_at': now,
+            'deadline': now + budget,
+            'future': future
         }
         
-        # Add to queue
-        self.prediction_queue.put(request)
+        with self.futures_lock:
+            self.pending_futures[request_id] = future
+        
+        # Add to queue; the sequence number keeps FIFO order among equal keys
+        try:
+            self.prediction_queue.put_nowait((priority, request['deadline'], next(self.request_sequence), request))
+        except Full:
+            with self.futures_lock:
+                del self.pending_futures[request_id]
+            self.shed_counts['rejected_full'] += 1
+            raise AdmissionRejected("queue full", max(self.estimate_queue_wait(), 1.0))
         
         return request_id
     
+    def predict_queued(self, text: str, max_length: int = 100, temperature: float = 0.7, priority: int = 1,
+                       deadline_ms: Optional[float] = None) -> Dict:
+        """Predict through the batch queue and wait up to the deadline
+        
+        Raises AdmissionRejected like predict_async.
+        """
+        request_id = self.predict_async(text, max_length, temperature, priority, deadline_ms)
+        timeout = deadline_ms / 1000.0 if deadline_ms is not None else self.default_deadline
+        result = self.get_async_result(request_id, timeout=timeout)
+        if result is None:
+            # Not done in time; a request still queued is dropped by the worker
+            self.discard_async(request_id)
+            result = {'success': False, 'error': "Deadline exceeded", 'response_time': timeout}
+        result['request_id'] = request_id
+        return result
+    
+    def get_future(self, request_id: str) -> Optional[Future]:
+        """Future of a pending async request, e.g. for add_done_callback"""
+        with self.futures_lock:
+            return self.pending_futures.get(request_id)
+    
     def get_async_result(self, request_id: str, timeout: float = 30.0) -> Optional[Dict]:
-        """Get result from async prediction"""
-        start_time = time.time()
+        """Wait for an async prediction
         
-        while time.time() - start_time < timeout:
-            try:
-                # Check if result is available
-                while not self.results_queue.empty():
-                    result_id, result = self.results_queue.get_nowait()
-                    if result_id == request_id:
-                        return result
-                
-                time.sleep(0.01)  # Small delay
-                
-            except Exception as e:
-                logger.error(f"Error getting async result: {e}")
-                break
+        Returns None if the request is unknown, was cancelled, or is not done
+        within timeout; a timed-out request stays pending and can be waited
+        on again.
+        """
+        future = self.get_future(request_id)
+        if future is None:
+            return None
+        
+        try:
+            result = future.result(timeout=timeout)
+        except FutureTimeoutError:
+            return None
+        except CancelledError:
+            result = None
         
-        return None
+        with self.futures_lock:
+            self.pending_futures.pop(request_id, None)
+        return result
+    
+    def cancel_async(self, request_id: str) -> bool:
+        """Cancel an async request that has not started generating yet"""
+        with self.futures_lock:
+            future = self.pending_futures.get(request_id)
+            if future is None or not future.cancel():
+                return False
+            del self.pending_futures[request_id]
+        return True
+    
+    def discard_async(self, request_id: str):
+        """Forget a request whose result is no longer wanted, cancelling it if it has not started"""
+        with self.futures_lock:
+            future = self.pending_futures.pop(request_id, None)
+        if future is not None:
+            future.cancel()
     
     def get_suggestions(self, context: str, num_suggestions: int = 3) -> List[str]:
-        """Get conversation suggestions"""
+        """Get conversation suggestions, sampled together as one batch"""
         try:
-            return self.ai.get_suggestions(context, num_suggestions)
+            suggestions = self.model.generate_batch(
+                [context] * num_suggestions, max_lengths=[32] * num_suggestions,
+                temperatures=[0.9] * num_suggestions
+            )
+            # Keep distinct, non-empty suggestions in sampled order
+            return list(dict.fromkeys(s.strip() for s in suggestions if s.strip())) or ["How can I help you today?"]
         except Exception as e:
             logger.error(f"Error getting suggestions: {e}")
             return ["How can I help you today?"]
@@ -249,6 +512,26 @@ class CareConnectPredictor:
         stats['requests_per_minute'] = (
             stats['total_requests'] / max((time.time() - self._start_time), 1) * 60
         )
+        stats['worker_resources'] = self.worker_resources
+        
+        # Size of each batch closed by the background batcher
+        histogram = dict(sorted(self.batch_size_histogram.items()))
+        batches = sum(histogram.values())
+        stats['batch_size_histogram'] = histogram
+        stats['batches_processed'] = batches
+        stats['average_batch_size'] = (
+            sum(size * count for size, count in histogram.items()) / batches if batches else 0.0
+        )
+        
+        # Admission control
+        queue_waits = list(self.queue_waits)
+        stats['queue_depth'] = self.prediction_queue.qsize()
+        stats['estimated_queue_wait_ms'] = self.estimate_queue_wait() * 1000
+        stats['shed_counts'] = {
+            reason: self.shed_counts[reason] for reason in ('rejected_full', 'rejected_deadline', 'expired')
+        }
+        for pct in (50, 95, 99):
+            stats[f'queue_wait_p{pct}_ms'] = float(np.percentile(queue_waits, pct)) * 1000 if queue_waits else 0.0
         
         return stats
     
@@ -262,6 +545,9 @@ class CareConnectPredictor:
             "total_response_time": 0.0
         }
         self._start_time = time.time()
+        self.batch_size_histogram = Counter()
+        self.shed_counts = Counter()
+        self.queue_waits.clear()
     
     def health_check(self) -> Dict:
         """Perform health check on the predictor"""
@@ -273,6 +559,7 @@ class CareConnectPredictor:
                 'status': 'healthy' if test_result['success'] else 'unhealthy',
                 'model_loaded': True,
                 'device': str(self.device),
+                'worker_resources': self.worker_resources,
                 'memory_usage': 0.0,
                 'last_test': datetime.now().isoformat(),
                 'test_result': test_result
@@ -300,50 +587,67 @@ class PredictionServer:
         self.port = port
         self.running = False
         
-    def start(self):
-        """Start the prediction server"""
-        try:
-            from flask import Flask, request, jsonify
-            
-            app = Flask(__name__)
+    def create_app(self):
+        """Build the Flask application"""
+        from flask import Flask, request, jsonify
+        
+        app = Flask(__name__)
+        
+        @app.route('/predict', methods=['POST'])
+        def predict():
+            data = request.get_json(silent=True)
+            try:
+                priority, deadline_ms = parse_admission_fields(data)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
             
-            @app.route('/predict', methods=['POST'])
-            def predict():
-                try:
-                    data = request.get_json()
-                    text = data.get('text', '')
-                    max_length = data.get('max_length', 100)
-                    temperature = data.get('temperature', 0.7)
-                    
+            try:
+                text = data.get('text', '')
+                max_length = data.get('max_length', 100)
+                temperature = data.get('temperature', 0.7)
+                
+                # Through the admission-controlled batch queue when it is running
+                if self.predictor.running:
+                    result = self.predictor.predict_queued(text, max_length, temperature, priority, deadline_ms)
+                else:
                     result = self.predictor.predict(text, max_length, temperature)
-                    return jsonify(result)
-                    
-                except Exception as e:
-                    return jsonify({'error': str(e)}), 500
+                return jsonify(result)
             
-            @app.route('/suggestions', methods=['POST'])
-            def suggestions():
-                try:
-                    data = request.get_json()
-                    context = data.get('context', '')
-                    num_suggestions = data.get('num_suggestions', 3)
-                    
-                    suggestions = self.predictor.get_suggestions(context, num_suggestions)
-                    return jsonify({'suggestions': suggestions})
-                    
-                except Exception as e:
-                    return jsonify({'error': str(e)}), 500
-            
-            @app.route('/health', methods=['GET'])
-            def health():
-                health_status = self.predictor.health_check()
-                return jsonify(health_status)
-            
-            @app.route('/stats', methods=['GET'])
-            def stats():
-                stats = self.predictor.get_performance_stats()
-                return jsonify(stats)
+            except AdmissionRejected as e:
+                response = jsonify({'error': str(e), 'reason': e.reason, 'retry_after': e.retry_after})
+                return response, 429, {'Retry-After': str(math.ceil(e.retry_after))}
+            except Exception as e:
+                return jsonify({'error': str(e)}), 500
+        
+        @app.route('/suggestions', methods=['POST'])
+        def suggestions():
+            try:
+                data = request.get_json()
+                context = data.get('context', '')
+                num_suggestions = data.get('num_suggestions', 3)
+                
+                suggestions = self.predictor.get_suggestions(context, num_suggestions)
+                return jsonify({'suggestions': suggestions})
             
+            except Exception as e:
+                return jsonify({'error': str(e)}), 500
+        
+        @app.route('/health', methods=['GET'])
+        def health():
+            health_status = self.predictor.health_check()
+            return jsonify(health_status)
+        
+        @app.route('/stats', methods=['GET'])
+        def stats():
+            stats = self.predictor.get_performance_stats()
+            return jsonify(stats)
+        
+        return app
+    
+    def start(self):
+        """Start the prediction server"""
+        try:
+            app = self.create_app()
             self.running = True
             logger.info(f"Prediction server starting on port {self.port}")
             app.run(host='0.0.0.0', port=self.port)
@@ -358,6 +662,187 @@ class PredictionServer:
         self.running = False
         logger.info("Prediction server stopped")
 
+class AsyncPredictionServer:
+    """ASGI prediction server with server-sent-event streaming
+    
+    Serves the same routes as PredictionServer plus /predict/stream. The
+    event loop never runs the model: /predict goes through the predictor's
+    batch queue when background processing is running, and everything
+    else runs on a bounded thread pool.
+    """
+    
+    def __init__(self, predictor: CareConnectPredictor, port: int = 5001, executor_workers: int = 2):
+        self.predictor = predictor
+        self.port = port
+        self.executor = ThreadPoolExecutor(max_workers=max(int(executor_workers), 1),
+                                           thread_name_prefix="prediction")
+        self.running = False
+    
+    def create_app(self):
+        """Build the FastAPI application"""
+        from fastapi import FastAPI, Request
+        from fastapi.responses import JSONResponse, StreamingResponse
+        
+        app = FastAPI(title="CareConnect AI Prediction Server")
+        
+        @app.post("/predict")
+        async def predict(request: Request):
+            try:
+                data = await request.json()
+                priority, deadline_ms = parse_admission_fields(data)
+            except ValueError as e:
+                # Also covers a body that is not valid JSON
+                return JSONResponse({'error': str(e)}, status_code=400)
+            
+            try:
+                result = await self._predict(
+                    data.get('text', ''), data.get('max_length', 100), data.get('temperature', 0.7),
+                    priority, deadline_ms
+                )
+                return JSONResponse(result)
+            except AdmissionRejected as e:
+                return JSONResponse(
+                    {'error': str(e), 'reason': e.reason, 'retry_after': e.retry_after},
+                    status_code=429, headers={'Retry-After': str(math.ceil(e.retry_after))}
+                )
+            except Exception as e:
+                return JSONResponse({'error': str(e)}, status_code=500)
+        
+        @app.post("/predict/stream")
+        async def predict_stream(request: Request):
+            data = await request.json()
+            events = self._stream_events(
+                data.get('text', ''), data.get('max_length', 100), data.get('temperature', 0.7)
+            )
+            return StreamingResponse(events, media_type="text/event-stream",
+                                     headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+        
+        @app.post("/suggestions")
+        async def suggestions(request: Request):
+            try:
+                data = await request.json()
+                suggestions = await self._run(
+                    self.predictor.get_suggestions, data.get('context', ''), data.get('num_suggestions', 3)
+                )
+                return JSONResponse({'suggestions': suggestions})
+            except Exception as e:
+                return JSONResponse({'error': str(e)}, status_code=500)
+        
+        @app.get("/health")
+        async def health():
+            return JSONResponse(await self._run(self.predictor.health_check))
+        
+        @app.get("/stats")
+        async def stats():
+            return JSONResponse(self.predictor.get_performance_stats())
+        
+        return app
+    
+    async def _run(self, fn, *args):
+        """Run a blocking call on the bounded executor"""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+    
+    async def _predict(self, text: str, max_length: int, temperature: float, priority: int = 1,
+                       deadline_ms: Optional[float] = None) -> Dict:
+        """Predict via the batch queue when it is running, else on the executor
+        
+        Raises AdmissionRejected when the queue sheds the request.
+        """
+        if not self.predictor.running:
+            return await self._run(self.predictor.predict, text, max_length, temperature)
+        
+        request_id = self.predictor.predict_async(text, max_length, temperature, priority, deadline_ms)
+        future = self.predictor.get_future(request_id)
+        timeout = deadline_ms / 1000.0 if deadline_ms is not None else self.predictor.default_deadline
+        try:
+            # asyncio.wait only raises when this task is cancelled; a cancelled
+            # request future (e.g. stop_background_processing) just completes it
+            done, _ = await asyncio.wait({asyncio.wrap_future(future)}, timeout=timeout)
+        except asyncio.CancelledError:
+            # Client went away; drop the request if it has not started
+            self.predictor.discard_async(request_id)
+            raise
+        if not done:
+            self.predictor.discard_async(request_id)
+            return {'success': False, 'error': "Deadline exceeded", 'response_time': timeout,
+                    'request_id': request_id}
+        result = self.predictor.get_async_result(request_id, timeout=0)
+        if result is None:
+            result = {'success': False, 'error': "Request was cancelled", 'response_time': 0}
+        result['request_id'] = request_id
+        return result
+    
+    async def _stream_events(self, text: str, max_length: int, temperature: float) -> AsyncIterator[str]:
+        """Server-sent events: one 'token' event per chunk, then 'done' or 'error'"""
+        loop = asyncio.get_running_loop()
+        chunks: asyncio.Queue = asyncio.Queue()
+        disconnected = threading.Event()
+        
+        def post(event: str, data: Any):
+            try:
+                loop.call_soon_threadsafe(chunks.put_nowait, (event, data))
+            except RuntimeError:
+                disconnected.set()  # event loop already closed
+        
+        def produce():
+            try:
+                for chunk in self.predictor.predict_stream(text, max_length, temperature):
+                    if disconnected.is_set():
+                        break
+                    post("token", chunk)
+            except Exception as e:
+                logger.error(f"Error in streaming prediction: {e}")
+                post("error", str(e))
+            finally:
+                post(None, None)
+        
+        start_time = time.time()
+        loop.run_in_executor(self.executor, produce)
+        response = []
+        try:
+            while True:
+                event, data = await chunks.get()
+                if event is None:
+                    break
+                if event == "error":
+                    yield f"event: error\ndata: {json.dumps({'error': data})}\n\n"
+                    return
+                response.append(data)
+                yield f"event: token\ndata: {json.dumps({'text': data})}\n\n"
+            
+            done = {
+                'response': "".join(response),
+                'response_time': time.time() - start_time,
+                'timestamp': datetime.now().isoformat()
+            }
+            yield f"event: done\ndata: {json.dumps(done)}\n\n"
+        finally:
+            # Stops generation early when the client disconnects
+            disconnected.set()
+    
+    def start(self):
+        """Start the async prediction server"""
+        try:
+            import uvicorn
+            
+            app = self.create_app()
+            self.running = True
+            logger.info(f"Async prediction server starting on port {self.port}")
+            uvicorn.run(app, host="0.0.0.0", port=self.port, log_level="info")
+        
+        except ImportError:
+            logger.error("FastAPI/uvicorn not available. Install with: pip install fastapi uvicorn")
+        except Exception as e:
+            logger.error(f"Error starting async prediction server: {e}")
+        finally:
+            self.stop()
+    
+    def stop(self):
+        """Stop the async prediction server"""
+        self.running = False
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        logger.info("Async prediction server stopped")
+
 def signal_handler(signum, frame):
     """Handle shutdown signals"""
     logger.info("Received shutdown signal")
@@ -367,10 +852,21 @@ def main():
     """Main prediction function"""
     parser = argparse.ArgumentParser(description="CareConnect AI Prediction Interface")
     parser.add_argument("--model", type=str, default="checkpoints/steward-v5.pt", help="Model path")
-    parser.add_argument("--config", type=str, default="config/model_config.json", help="Config path")
+    parser.add_argument("--config", type=str, default="config/model_config.json",
+                        help="ModelConfig JSON, used when --model does not exist yet")
     parser.add_argument("--server", action="store_true", help="Start prediction server")
+    parser.add_argument("--async-server", action="store_true", help="Serve with the async ASGI server (SSE streaming)")
+    parser.add_argument("--executor-workers", type=int, default=2, help="Generation threads for the async server")
     parser.add_argument("--port", type=int, default=5001, help="Server port")
     parser.add_argument("--interactive", action="store_true", help="Interactive mode")
+    parser.add_argument("--intra-op-threads", type=int, help="PyTorch intra-op threads (default: pinned CPUs or all cores)")
+    parser.add_argument("--inter-op-threads", type=int, default=1, help="PyTorch inter-op threads")
+    parser.add_argument("--cpu-affinity", type=str, help="CPUs to pin this worker to, e.g. '0-3,8'")
+    parser.add_argument("--max-batch-size", type=int, default=8, help="Requests generated together")
+    parser.add_argument("--max-batch-wait-ms", type=float, default=10.0, help="Longest wait to fill a batch")
+    parser.add_argument("--max-queue-size", type=int, default=256, help="Queued requests before rejecting with 429")
+    parser.add_argument("--default-deadline-ms", type=float, default=30000.0,
+                        help="Deadline for requests that do not set deadline_ms")
     
     args = parser.parse_args()
     
@@ -379,13 +875,20 @@ def main():
     signal.signal(signal.SIGTERM, signal_handler)
     
     # Initialize predictor
-    predictor = CareConnectPredictor(args.model, args.config)
+    predictor = CareConnectPredictor(args.model, args.config, args.intra_op_threads, args.inter_op_threads,
+                                     args.cpu_affinity, args.max_batch_size, args.max_batch_wait_ms,
+                                     args.max_queue_size, args.default_deadline_ms)
     
     # Start background processing
     predictor.start_background_processing()
     
     try:
-        if args.server:
+        if args.async_server:
+            # Async server with streaming; generation runs off the event loop
+            server = AsyncPredictionServer(predictor, args.port, args.executor_workers)
+            server.start()
+        
+        elif args.server:
             # Start prediction server
             server = PredictionServer(predictor, args.port)
             server.start()
@@ -0,0 +1,90 @@
+"""
+CareConnect v5.0 - The Steward AI Engine
+CPU worker resources
+
+Thread pool sizing and CPU pinning for inference worker processes, so
+several workers on one host do not each claim every core.
+"""
+
+import os
+import logging
+from typing import Any, Dict, List, Optional
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+def parse_cpu_list(spec) -> List[int]:
+    """Parse a "0-3,8" style CPU list (or an iterable of CPU ids) into sorted ids"""
+    if not isinstance(spec, str):
+        return sorted({int(cpu) for cpu in spec})
+    
+    cpus = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            start, end = part.split("-", 1)
+            cpus.update(range(int(start), int(end) + 1))
+        else:
+            cpus.add(int(part))
+    return sorted(cpus)
+
+def available_cpus() -> List[int]:
+    """CPUs this process is allowed to run on"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+def configure_worker_resources(intra_op_threads: Optional[int] = None, inter_op_threads: Optional[int] = None,
+                               cpu_affinity=None) -> Dict[str, Any]:
+    """Size PyTorch's thread pools and optionally pin this process to CPUs
+    
+    Pinning is applied first, so an unset intra_op_threads defaults to the
+    number of pinned CPUs instead of every core on the host. The inter-op
+    pool can only be resized before PyTorch first uses it; later requests
+    are logged and ignored. Returns the effective settings.
+    """
+    requested = {
+        "intra_op_threads": intra_op_threads,
+        "inter_op_threads": inter_op_threads,
+        "cpu_affinity": cpu_affinity if cpu_affinity is None or isinstance(cpu_affinity, str) else list(cpu_affinity)
+    }
+    
+    if cpu_affinity:
+        cpus = parse_cpu_list(cpu_affinity)
+        if not hasattr(os, "sched_setaffinity"):
+            logger.warning("CPU affinity is not supported on this platform")
+        else:
+            try:
+                os.sched_setaffinity(0, cpus)
+            except OSError as e:
+                logger.warning(f"Could not pin process to CPUs {cpus}: {e}")
+        if intra_op_threads is None:
+            intra_op_threads = len(available_cpus())
+    
+    if intra_op_threads:
+        torch.set_num_threads(int(intra_op_threads))
+    
+    if inter_op_threads:
+        try:
+            torch.set_num_interop_threads(int(inter_op_threads))
+        except RuntimeError as e:
+            if torch.get_num_interop_threads() != int(inter_op_threads):
+                logger.warning(f"Inter-op threads left at {torch.get_num_interop_threads()}: {e}")
+    
+    settings = worker_resource_settings()
+    settings["requested"] = requested
+    logger.info(f"Worker resources: intra-op {settings['intra_op_threads']}, "
+                f"inter-op {settings['inter_op_threads']}, CPUs {settings['cpu_affinity']}")
+    return settings
+
+def worker_resource_settings() -> Dict[str, Any]:
+    """Thread pool sizes and CPU set currently in effect for this process"""
+    return {
+        "intra_op_threads": torch.get_num_threads(),
+        "inter_op_threads": torch.get_num_interop_threads(),
+        "cpu_affinity": available_cpus(),
+        "host_cpus": os.cpu_count()
+    }
@@ -27,7 +27,7 @@ import gzip
 from concurrent.futures import ThreadPoolExecutor
 import threading
 
-from .model import CareConnectModel, ModelConfig, ModelManager
+from model import CareConnectModel, ModelConfig, ModelManager
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -56,6 +56,9 @@ class UpdateConfig:
     performance_tracking: bool = True
     error_monitoring: bool = True
     resource_monitoring: bool = True
+    
+    # LoRA adapter versions written by update_adapter
+    adapter_dir: str = "adapters"
 
 class PerformanceMonitor:
     """Monitor model performance and identify improvement opportunities"""
@@ -283,6 +286,8 @@ class SelfUpdateManager:
         # Create backup directory
         self.backup_dir = Path("backups")
         self.backup_dir.mkdir(exist_ok=True)
+        self.adapter_dir = Path(config.adapter_dir)
+        self.adapter_dir.mkdir(exist_ok=True)
     
     def start_monitoring(self):
         """Start continuous performance monitoring"""
@@ -450,7 +455,9 @@ class SelfUpdateManager:
         """Create backup of current model"""
         try:
             timestamp = int(time.time())
-            backup_path = self.backup_dir / f"model_backup_{timestamp}.pkl.gz"
+            # save_model writes a tensor blob, or gzip-pickle for quantized models
+            suffix = ".pkl.gz" if self.model_manager.model.quantized else ".blob"
+            backup_path = self.backup_dir / f"model_backup_{timestamp}{suffix}"
             
             self.model_manager.save_model(str(backup_path))
             logger.info(f"Backup created: {backup_path}")
@@ -462,7 +469,7 @@ class SelfUpdateManager:
         """Rollback to previous model version"""
         try:
             # Find most recent backup
-            backup_files = list(self.backup_dir.glob("model_backup_*.pkl.gz"))
+            backup_files = list(self.backup_dir.glob("model_backup_*"))
             if not backup_files:
                 logger.error("No backup files found for rollback")
                 return
@@ -476,6 +483,70 @@ class SelfUpdateManager:
         except Exception as e:
             logger.error(f"Error during rollback: {e}")
     
+    def _backup_adapter(self, name: str) -> Optional[Path]:
+        """Save the current weights of adapter name before it is retrained"""
+        try:
+            backup_path = self.backup_dir / f"adapter_backup_{name}_{time.time_ns()}.blob"
+            self.model_manager.model.save_adapter(str(backup_path), name)
+            logger.info(f"Adapter backup created: {backup_path}")
+            return backup_path
+        except Exception as e:
+            logger.error(f"Error creating adapter backup: {e}")
+            return None
+    
+    def _restore_adapter(self, name: str, backup_path: Path) -> bool:
+        """Reload adapter name from a backup written by _backup_adapter"""
+        try:
+            self.model_manager.model.load_adapter(str(backup_path), name)
+            logger.info(f"Rolled back adapter {name} to: {backup_path}")
+            return True
+        except Exception as e:
+            logger.error(f"Error restoring adapter {name}: {e}")
+            return False
+    
+    def update_adapter(self, name: str, train_data: Any, val_data: Optional[Any] = None, epochs: int = 1) -> bool:
+        """Fine-tune a LoRA adapter for this deployment and save it as a new version
+        
+        Only the adapter is trained, backed up and written to adapter_dir as
+        {name}_{time_ns}.blob, so earlier versions are kept; the base weights
+        are never modified. A failed validation restores
+        the previous adapter version (or drops a newly created adapter).
+        """
+        with self.update_lock:
+            model = self.model_manager.model
+            is_new = name not in model.adapters
+            backup_path = None
+            if not is_new:
+                backup_path = self._backup_adapter(name)
+                if backup_path is None:
+                    return False
+            
+            try:
+                history = self.model_manager.train_adapter(name, train_data, val_data, epochs)
+                success = not self.config.validation_required or self._validate_update()
+            except Exception as e:
+                logger.error(f"Error during adapter update: {e}")
+                history, success = [], False
+            
+            if success:
+                adapter_path = self.adapter_dir / f"{name}_{time.time_ns()}.blob"
+                model.save_adapter(str(adapter_path), name)
+                self.update_history.append({
+                    "timestamp": time.time(),
+                    "reasons": {"adapter_update": name},
+                    "adapter_path": str(adapter_path),
+                    "train_loss": history[-1]["train_loss"] if history else None,
+                    "success": True
+                })
+                logger.info(f"Adapter {name} updated")
+            elif is_new:
+                model.remove_adapter(name)
+                logger.error(f"Adapter {name} update failed, adapter removed")
+            else:
+                self._restore_adapter(name, backup_path)
+                logger.error(f"Adapter {name} update failed, rolled back")
+            return success
+    
     def get_update_status(self) -> Dict[str, Any]:
         """Get current update status"""
         return {
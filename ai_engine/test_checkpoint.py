@@ -0,0 +1,40 @@
+"""
+CareConnect v5.0 - The Steward AI Engine
+Tests for tensor-blob checkpoints: reloading, overwriting and training after a load
+"""
+
+import torch
+
+from conftest import TINY_CONFIG
+from model import CareConnectModel, ModelConfig, ModelManager
+
+def test_save_over_loaded_checkpoint(tmp_path):
+    path = str(tmp_path / "model.blob")
+    model = CareConnectModel(ModelConfig(**TINY_CONFIG))
+    model.save_model(path)
+    
+    model.load_model(path)
+    with torch.no_grad():
+        model.output_projection.bias.add_(1.0)
+    model.save_model(path)
+    
+    reloaded = CareConnectModel(ModelConfig(**TINY_CONFIG))
+    reloaded.load_model(path, verify=True)
+    assert torch.equal(reloaded.output_projection.bias, model.output_projection.bias)
+    assert list(tmp_path.iterdir()) == [tmp_path / "model.blob"]
+
+def test_training_after_load_updates_weights(tmp_path):
+    torch.manual_seed(0)
+    path = str(tmp_path / "model.blob")
+    manager = ModelManager(ModelConfig(**TINY_CONFIG, batch_size=2, adaptive_learning=False))
+    manager.save_model(path)
+    manager.load_model(path)
+    
+    parameters = list(manager.model.parameters())
+    tracked = {id(p) for group in manager.optimizer.param_groups for p in group["params"]}
+    assert all(id(p) in tracked for p in parameters)
+    
+    before = [p.detach().clone() for p in parameters]
+    manager.train([{"input_ids": torch.randint(4, 200, (16,))} for _ in range(2)], epochs=1)
+    changed = sum(not torch.equal(p, b) for p, b in zip(parameters, before))
+    assert changed > len(parameters) // 2
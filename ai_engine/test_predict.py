@@ -0,0 +1,77 @@
+"""
+CareConnect v5.0 - The Steward AI Engine
+Tests for the batched prediction queue, run with `python -m pytest ai_engine`
+"""
+
+import threading
+import time
+
+from conftest import TINY_CONFIG
+from model import ModelConfig
+
+def test_config_comes_from_json(predictor):
+    assert isinstance(predictor.config, ModelConfig)
+    assert predictor.model.config.embedding_dim == TINY_CONFIG["embedding_dim"]
+
+def test_queued_requests_share_one_generate_batch(predictor):
+    calls = []
+    generate_batch = predictor.model.generate_batch
+    
+    def recording_generate_batch(prompts, **kwargs):
+        calls.append(len(prompts))
+        return generate_batch(prompts, **kwargs)
+    
+    predictor.model.generate_batch = recording_generate_batch
+    
+    # Queue everything before the worker starts so it closes one full batch
+    request_ids = [predictor.predict_async(f"prompt {i}", max_length=4) for i in range(4)]
+    predictor.start_background_processing()
+    results = [predictor.get_async_result(request_id, timeout=60) for request_id in request_ids]
+    
+    assert calls == [4]
+    assert all(result["success"] and result["batch_size"] == 4 for result in results)
+    assert predictor.get_performance_stats()["batch_size_histogram"] == {4: 1}
+
+def test_concurrent_callers_get_their_own_result(predictor, echo_prompts):
+    predictor.start_background_processing()
+    
+    results = {}
+    
+    def caller(i):
+        results[i] = predictor.predict_queued(f"prompt {i}", max_length=4)
+    
+    threads = [threading.Thread(target=caller, args=(i,)) for i in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=60)
+    
+    assert len(results) == 16
+    for i, result in results.items():
+        assert result["success"]
+        assert result["response"] == f"echo: prompt {i}"
+    assert len({result["request_id"] for result in results.values()}) == 16
+    assert not predictor.pending_futures
+
+def test_cancel_async_skips_queued_request(predictor, echo_prompts):
+    kept = predictor.predict_async("kept", max_length=4)
+    cancelled = predictor.predict_async("cancelled", max_length=4)
+    assert predictor.cancel_async(cancelled)
+    assert not predictor.cancel_async(cancelled)
+    
+    predictor.start_background_processing()
+    assert predictor.get_async_result(kept, timeout=60)["response"] == "echo: kept"
+    assert predictor.get_async_result(cancelled, timeout=0) is None
+    assert echo_prompts == ["kept"]
+
+def test_expired_requests_never_reach_the_model(predictor, echo_prompts):
+    expired = predictor.predict_async("expired", max_length=4, deadline_ms=50)
+    urgent = predictor.predict_async("urgent", max_length=4, priority=0)
+    time.sleep(0.1)
+    
+    predictor.start_background_processing()
+    assert predictor.get_async_result(urgent, timeout=60)["response"] == "echo: urgent"
+    result = predictor.get_async_result(expired, timeout=60)
+    assert result["success"] is False and result["expired"]
+    assert echo_prompts == ["urgent"]
+    assert predictor.get_performance_stats()["shed_counts"]["expired"] == 1
@@ -0,0 +1,26 @@
+"""
+CareConnect v5.0 - The Steward AI Engine
+Tests for int8 dynamic quantization on batched inputs
+"""
+
+import math
+
+import torch
+
+from benchmark import perplexity
+from conftest import TINY_CONFIG
+from model import CareConnectModel, ModelConfig
+
+def test_quantized_model_runs_batched_perplexity():
+    torch.manual_seed(0)
+    model = CareConnectModel(ModelConfig(**TINY_CONFIG))
+    model.eval()
+    input_ids = torch.randint(4, TINY_CONFIG["vocab_size"], (3, 12))
+    fp32_ppl = perplexity(model, input_ids)
+    
+    model.quantize("int8")
+    logits = model(input_ids)["logits"]
+    assert logits.shape == (3, 12, TINY_CONFIG["vocab_size"])
+    int8_ppl = perplexity(model, input_ids)
+    assert math.isfinite(int8_ppl)
+    assert abs(int8_ppl / fp32_ppl - 1.0) < 0.05
@@ -0,0 +1,85 @@
+"""
+CareConnect v5.0 - The Steward AI Engine
+Tests for full-model and adapter backups in SelfUpdateManager
+"""
+
+import pytest
+import torch
+
+from conftest import TINY_CONFIG
+from model import ModelConfig, ModelManager
+from self_update import SelfUpdateManager, UpdateConfig
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    """SelfUpdateManager over a tiny model with one trained-looking adapter active"""
+    monkeypatch.chdir(tmp_path)
+    model_manager = ModelManager(ModelConfig(**TINY_CONFIG))
+    model_manager.model.add_adapter("site", rank=4)
+    model_manager.model.set_adapter("site")
+    with torch.no_grad():
+        for layer in model_manager.model.lora_layers():
+            layer.lora_B["site"].normal_()
+    return SelfUpdateManager(model_manager, UpdateConfig(adapter_dir=str(tmp_path / "adapters")))
+
+def snapshot(tensors):
+    return {key: value.detach().clone() for key, value in tensors.items()}
+
+def test_full_update_rollback_restores_base_weights_with_adapter_active(manager):
+    model = manager.model_manager.model
+    base = snapshot({k: v for k, v in model.state_dict().items() if "lora_" not in k})
+    
+    manager._create_backup()
+    assert list(manager.backup_dir.glob("model_backup_*.blob"))
+    assert not list(manager.backup_dir.glob("adapter_backup_*"))
+    
+    with torch.no_grad():
+        model.output_projection.weight.add_(1.0)
+    manager._rollback()
+    
+    for key, value in model.state_dict().items():
+        if key in base:
+            assert torch.equal(value, base[key]), key
+
+def test_failed_adapter_update_restores_that_adapter(manager, monkeypatch):
+    model = manager.model_manager.model
+    before = snapshot(model.adapter_state_dict("site"))
+    
+    def corrupt_adapter(name, *args, **kwargs):
+        with torch.no_grad():
+            for layer in model.lora_layers():
+                layer.lora_B[name].add_(1.0)
+        return [{"train_loss": 1.0}]
+    
+    monkeypatch.setattr(manager.model_manager, "train_adapter", corrupt_adapter)
+    monkeypatch.setattr(manager, "_validate_update", lambda: False)
+    
+    assert manager.update_adapter("site", train_data=None) is False
+    after = model.adapter_state_dict("site")
+    assert after.keys() == before.keys()
+    assert all(torch.equal(after[key], before[key]) for key in before)
+    assert not list(manager.backup_dir.glob("model_backup_*"))
+
+def test_failed_new_adapter_is_removed(manager, monkeypatch):
+    model = manager.model_manager.model
+    monkeypatch.setattr(manager.model_manager, "train_adapter",
+                        lambda name, *args, **kwargs: model.add_adapter(name, rank=4) or [])
+    monkeypatch.setattr(manager, "_validate_update", lambda: False)
+    
+    assert manager.update_adapter("fresh", train_data=None) is False
+    assert "fresh" not in manager.model_manager.model.adapters
+
+def test_adapter_updates_are_saved_as_new_versions(manager, monkeypatch):
+    model = manager.model_manager.model
+    monkeypatch.setattr(manager.model_manager, "train_adapter", lambda name, *args, **kwargs: [])
+    monkeypatch.setattr(manager, "_validate_update", lambda: True)
+    
+    assert manager.update_adapter("site", train_data=None)
+    assert manager.update_adapter("site", train_data=None)
+    versions = sorted(manager.adapter_dir.glob("site_*.blob"))
+    assert len(versions) == 2
+    assert [entry["adapter_path"] for entry in manager.update_history] == [str(path) for path in versions]
+    
+    before = snapshot(model.adapter_state_dict("site"))
+    model.load_adapter(str(versions[0]), "site")
+    assert all(torch.equal(model.adapter_state_dict("site")[key], before[key]) for key in before)
@@ -0,0 +1,180 @@
+"""
+CareConnect v5.0 - The Steward AI Engine
+Tests for the async prediction server, its SSE stream and the load test
+"""
+
+import asyncio
+import json
+import socket
+import threading
+import time
+
+import pytest
+import uvicorn
+from fastapi.testclient import TestClient
+
+from queue import PriorityQueue
+
+from load_test import run_load_test
+from predict import AsyncPredictionServer, PredictionServer
+
+def sse_events(body: str):
+    """Parse a server-sent-event body into (event, data) pairs"""
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+@pytest.fixture
+def server(predictor):
+    server = AsyncPredictionServer(predictor, executor_workers=2)
+    yield server
+    server.stop()
+
+@pytest.fixture(params=["flask", "asgi"])
+def post_predict(request, predictor, server):
+    """POST a body to /predict on either server; returns (status, json, headers)"""
+    if request.param == "flask":
+        client = PredictionServer(predictor).create_app().test_client()
+        
+        def post(body):
+            response = client.post("/predict", data=json.dumps(body), content_type="application/json")
+            return response.status_code, response.get_json(), response.headers
+    else:
+        client = TestClient(server.create_app())
+        
+        def post(body):
+            response = client.post("/predict", content=json.dumps(body), headers={"content-type": "application/json"})
+            return response.status_code, response.json(), response.headers
+    
+    return post
+
+@pytest.mark.parametrize("body", [
+    {"text": "hi", "priority": "high"},
+    {"text": "hi", "priority": 1.5},
+    {"text": "hi", "priority": None},
+    {"text": "hi", "deadline_ms": "soon"},
+    {"text": "hi", "deadline_ms": -5},
+    {"text": "hi", "deadline_ms": True},
+    ["not", "an", "object"]
+])
+def test_predict_rejects_bad_admission_fields(predictor, post_predict, body):
+    predictor.running = True
+    status, data, _ = post_predict(body)
+    assert status == 400
+    assert data["error"]
+    assert predictor.prediction_queue.qsize() == 0
+
+def test_predict_sheds_when_queue_is_full(predictor, post_predict):
+    # No worker drains the queue
+    predictor.running = True
+    predictor.prediction_queue = PriorityQueue(maxsize=1)
+    predictor.predict_async("first")
+    
+    status, data, headers = post_predict({"text": "second", "priority": 0})
+    assert status == 429
+    assert data["reason"] == "queue full"
+    assert int(headers["Retry-After"]) >= 1
+    assert predictor.get_performance_stats()["shed_counts"]["rejected_full"] == 1
+
+def test_predict_sheds_when_wait_exceeds_deadline(predictor, post_predict):
+    predictor.running = True
+    predictor.batch_time_ema = 5.0
+    
+    status, data, _ = post_predict({"text": "hi", "deadline_ms": 100})
+    assert status == 429
+    assert data["reason"] == "estimated wait exceeds deadline"
+    assert predictor.prediction_queue.qsize() == 0
+
+def test_predict_serves_valid_admission_fields(predictor, echo_prompts, post_predict):
+    predictor.start_background_processing()
+    status, data, _ = post_predict({"text": "hi", "priority": 0, "deadline_ms": 10000})
+    assert status == 200
+    assert data["response"] == "echo: hi"
+
+def test_predict_goes_through_batch_queue(predictor, echo_prompts, server):
+    predictor.start_background_processing()
+    with TestClient(server.create_app()) as client:
+        response = client.post("/predict", json={"text": "hello", "max_length": 4})
+    
+    assert response.status_code == 200
+    assert response.json()["response"] == "echo: hello"
+    assert response.json()["request_id"].startswith("req_")
+    assert echo_prompts == ["hello"]
+
+def test_stream_sends_tokens_then_done(predictor, server):
+    predictor.model.generate_stream = lambda *args, **kwargs: iter(["Hel", "lo", " there"])
+    with TestClient(server.create_app()) as client:
+        response = client.post("/predict/stream", json={"text": "hello", "max_length": 6})
+    
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = sse_events(response.text)
+    assert events[:-1] == [("token", {"text": "Hel"}), ("token", {"text": "lo"}), ("token", {"text": " there"})]
+    assert events[-1][0] == "done" and events[-1][1]["response"] == "Hello there"
+
+def test_stream_reports_errors(predictor, server):
+    def failing_stream(*args, **kwargs):
+        raise RuntimeError("model unavailable")
+        yield  # pragma: no cover
+    
+    predictor.model.generate_stream = failing_stream
+    with TestClient(server.create_app()) as client:
+        response = client.post("/predict/stream", json={"text": "hello"})
+    
+    assert sse_events(response.text) == [("error", {"error": "model unavailable"})]
+
+def test_predict_reports_request_cancelled_by_predictor(predictor, server):
+    # Queue accepts requests but no worker runs them
+    predictor.running = True
+    
+    async def scenario():
+        task = asyncio.create_task(server._predict("hello", 4, 0.7, deadline_ms=10000))
+        await asyncio.sleep(0.1)
+        predictor.stop_background_processing()
+        return await task
+    
+    result = asyncio.run(scenario())
+    assert result["success"] is False
+    assert result["error"] == "Request was cancelled"
+
+def test_client_cancellation_discards_queued_request(predictor, server):
+    predictor.running = True
+    
+    async def scenario():
+        task = asyncio.create_task(server._predict("hello", 4, 0.7, deadline_ms=10000))
+        await asyncio.sleep(0.1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    
+    asyncio.run(scenario())
+    assert not predictor.pending_futures
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_load_test_against_running_server(predictor, server, stream):
+    predictor.start_background_processing()
+    port = free_port()
+    uvicorn_server = uvicorn.Server(uvicorn.Config(server.create_app(), host="127.0.0.1", port=port,
+                                                   log_level="warning"))
+    thread = threading.Thread(target=uvicorn_server.run, daemon=True)
+    thread.start()
+    try:
+        deadline = time.time() + 30
+        while not uvicorn_server.started and time.time() < deadline:
+            time.sleep(0.05)
+        
+        row = asyncio.run(run_load_test(f"http://127.0.0.1:{port}", requests=8, concurrency=4, stream=stream,
+                                        max_length=4, temperature=0.7, timeout=120))
+    finally:
+        uvicorn_server.should_exit = True
+        thread.join(timeout=30)
+    
+    assert row["succeeded"] == 8 and row["failed"] == 0
+    assert 0 < row["ttft_p50_ms"] <= row["latency_p99_ms"]